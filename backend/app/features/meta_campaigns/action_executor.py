@@ -2,8 +2,8 @@ import requests
 import logging
 import time
 from typing import Dict, List
-from app.features.meta_campaigns.rate_limit_tracker import check_rate_limit_headers
-from app.features.meta_campaigns.facebook_api_client import WRITE_DELAY
+from urllib.parse import urlencode
+from app.features.meta_campaigns.graph_batch import build_relative_url, execute_batch
 
 logger = logging.getLogger(__name__)
 
@@ -101,162 +101,174 @@ def send_slack_notification(webhook_url: str, rule_name: str, action_type: str,
         return False
 
 
+def _mark_failed(result: Dict, error_msg: str):
+    result["success"] = False
+    result["error"] = error_msg
+    result["message"] = f"Failed to execute action: {error_msg}"
+
+
+def _execute_set_status(account_id: str, access_token: str, rule_level: str, items: List[Dict], action: Dict, results: List[Dict]):
+    """Set status on all items, packing the POSTs into Graph API batch calls"""
+    status = action.get("status", "PAUSED")
+    sub_requests = [
+        {"method": "POST", "relative_url": build_relative_url(str(item.get("id"))), "body": urlencode({"status": status})}
+        for item in items
+    ]
+    batch_results = execute_batch(access_token, sub_requests, account_id=account_id, api_type="write")
+
+    for result, batch_result in zip(results, batch_results):
+        if batch_result["success"]:
+            result["success"] = True
+            result["message"] = f"Status set to {status}"
+            logger.info(f"Successfully set status to {status} for {rule_level} {result['item_id']}")
+        else:
+            _mark_failed(result, batch_result["error"])
+            logger.error(f"Error executing action set_status on {rule_level} {result['item_id']}: {batch_result['error']}")
+
+
+def _execute_adjust_daily_budget(account_id: str, access_token: str, items: List[Dict], action: Dict, results: List[Dict]):
+    """
+    Adjust daily budgets of ad sets.
+
+    Current budgets are read with one batched GET round, then all updates that pass the
+    min/max caps are written with one batched POST round.
+    """
+    # Fetch current adsets to get daily_budget
+    get_requests = [
+        {"method": "GET", "relative_url": build_relative_url(str(item.get("id")), {"fields": "daily_budget"})}
+        for item in items
+    ]
+    get_results = execute_batch(access_token, get_requests, account_id=account_id, api_type="read")
+
+    direction = action.get("direction", "increase")
+    min_cap = action.get("min_cap")
+    max_cap = action.get("max_cap")
+
+    updates = []  # (result, current_budget, new_budget)
+    for result, get_result in zip(results, get_results):
+        item_id = result["item_id"]
+        if not get_result["success"]:
+            _mark_failed(result, get_result["error"])
+            logger.error(f"Error executing action adjust_daily_budget on ad_set {item_id}: {get_result['error']}")
+            continue
+
+        try:
+            adset_data = get_result["body"] or {}
+            current_budget = float(adset_data.get("daily_budget", 0)) / 100  # Convert cents to dollars
+
+            # Calculate new budget
+            percent = float(action.get("percent", 0))
+
+            if direction == "increase":
+                new_budget = current_budget * (1 + percent / 100)
+                # Check if increase would exceed max cap - if so, skip the action
+                if max_cap is not None and new_budget > float(max_cap):
+                    result["success"] = False
+                    result["message"] = f"Budget increase would exceed max cap (${max_cap:.2f}). Current: ${current_budget:.2f}, Would be: ${new_budget:.2f}. Action skipped."
+                    result["old_budget"] = current_budget
+                    result["new_budget"] = current_budget
+                    logger.info(f"Skipping budget increase for adset {item_id}: would exceed max cap ${max_cap:.2f} (current: ${current_budget:.2f}, would be: ${new_budget:.2f})")
+                    continue
+            else:  # decrease
+                new_budget = current_budget * (1 - percent / 100)
+                # Check if decrease would go below min cap - if so, skip the action
+                if min_cap is not None and new_budget < float(min_cap):
+                    result["success"] = False
+                    result["message"] = f"Budget decrease would go below min cap (${min_cap:.2f}). Current: ${current_budget:.2f}, Would be: ${new_budget:.2f}. Action skipped."
+                    result["old_budget"] = current_budget
+                    result["new_budget"] = current_budget
+                    logger.info(f"Skipping budget decrease for adset {item_id}: would go below min cap ${min_cap:.2f} (current: ${current_budget:.2f}, would be: ${new_budget:.2f})")
+                    continue
+        except Exception as e:
+            result["success"] = False
+            result["error"] = str(e)
+            result["message"] = f"Unexpected error: {str(e)}"
+            logger.error(f"Unexpected error executing action adjust_daily_budget on ad_set {item_id}: {str(e)}", exc_info=True)
+            continue
+
+        updates.append((result, current_budget, new_budget))
+
+    if not updates:
+        return
+
+    # Update budgets (in cents)
+    post_requests = [
+        {"method": "POST", "relative_url": build_relative_url(str(result["item_id"])), "body": urlencode({"daily_budget": int(new_budget * 100)})}
+        for result, _current_budget, new_budget in updates
+    ]
+    post_results = execute_batch(access_token, post_requests, account_id=account_id, api_type="write")
+
+    for (result, current_budget, new_budget), post_result in zip(updates, post_results):
+        if post_result["success"]:
+            result["success"] = True
+            result["message"] = f"Budget adjusted from ${current_budget:.2f} to ${new_budget:.2f}"
+            result["old_budget"] = current_budget
+            result["new_budget"] = new_budget
+            logger.info(f"Successfully adjusted budget for adset {result['item_id']}: ${current_budget:.2f} -> ${new_budget:.2f}")
+        else:
+            _mark_failed(result, post_result["error"])
+            logger.error(f"Error executing action adjust_daily_budget on ad_set {result['item_id']}: {post_result['error']}")
+
+
 def execute_action(account_id: str, access_token: str, rule_level: str, items: List[Dict], action: Dict, slack_webhook_url: str = None, rule_name: str = None) -> List[Dict]:
     """
     Execute an action on items via Meta API.
-    Returns a list of action results with success/failure status.
+    Writes are sent through Graph API batch calls (up to 50 items per round trip).
+    Returns a list of action results with success/failure status, in the same order as `items`.
     """
     action_type = action.get("type")
-    results = []
-    base_url = "https://graph.facebook.com/v21.0"
-
-    for index, item in enumerate(items):
-        item_id = item.get("id")
-        item_name = item.get("name", "Unknown")
-        result = {
-            "item_id": item_id,
-            "item_name": item_name,
+    results = [
+        {
+            "item_id": item.get("id"),
+            "item_name": item.get("name", "Unknown"),
             "action_type": action_type,
             "success": False,
             "message": "",
             "error": None
         }
+        for item in items
+    ]
 
-        try:
-            if action_type == "set_status":
-                status = action.get("status", "PAUSED")
-                url = f"{base_url}/{item_id}"
-                params = {
-                    "status": status,
-                    "access_token": access_token
-                }
-                response = requests.post(url, params=params, timeout=30)
-                response.raise_for_status()
-                check_rate_limit_headers(response, "write", account_id=account_id)
-                result["success"] = True
-                result["message"] = f"Status set to {status}"
-                logger.info(f"Successfully set status to {status} for {rule_level} {item_id}")
-
-            elif action_type == "adjust_daily_budget":
-                # Get current budget first
-                if rule_level == "ad_set":
-                    # Fetch current adset to get daily_budget
-                    url = f"{base_url}/{item_id}"
-                    params = {"fields": "daily_budget", "access_token": access_token}
-                    get_response = requests.get(url, params=params, timeout=30)
-                    get_response.raise_for_status()
-                    check_rate_limit_headers(get_response, "read", account_id=account_id)
-                    adset_data = get_response.json()
-                    current_budget = float(adset_data.get("daily_budget", 0)) / 100  # Convert cents to dollars
-
-                    # Calculate new budget
-                    direction = action.get("direction", "increase")
-                    percent = float(action.get("percent", 0))
-                    min_cap = action.get("min_cap")
-                    max_cap = action.get("max_cap")
-
-                    if direction == "increase":
-                        new_budget = current_budget * (1 + percent / 100)
-                        # Check if increase would exceed max cap - if so, skip the action
-                        if max_cap is not None and new_budget > float(max_cap):
-                            result["success"] = False
-                            result["message"] = f"Budget increase would exceed max cap (${max_cap:.2f}). Current: ${current_budget:.2f}, Would be: ${new_budget:.2f}. Action skipped."
-                            result["old_budget"] = current_budget
-                            result["new_budget"] = current_budget
-                            logger.info(f"Skipping budget increase for adset {item_id}: would exceed max cap ${max_cap:.2f} (current: ${current_budget:.2f}, would be: ${new_budget:.2f})")
-                        else:
-                            # Update budget (in cents)
-                            url = f"{base_url}/{item_id}"
-                            params = {
-                                "daily_budget": int(new_budget * 100),
-                                "access_token": access_token
-                            }
-                            response = requests.post(url, params=params, timeout=30)
-                            response.raise_for_status()
-                            check_rate_limit_headers(response, "write")
-                            result["success"] = True
-                            result["message"] = f"Budget adjusted from ${current_budget:.2f} to ${new_budget:.2f}"
-                            result["old_budget"] = current_budget
-                            result["new_budget"] = new_budget
-                            logger.info(f"Successfully adjusted budget for adset {item_id}: ${current_budget:.2f} -> ${new_budget:.2f}")
-                    else:  # decrease
-                        new_budget = current_budget * (1 - percent / 100)
-                        # Check if decrease would go below min cap - if so, skip the action
-                        if min_cap is not None and new_budget < float(min_cap):
-                            result["success"] = False
-                            result["message"] = f"Budget decrease would go below min cap (${min_cap:.2f}). Current: ${current_budget:.2f}, Would be: ${new_budget:.2f}. Action skipped."
-                            result["old_budget"] = current_budget
-                            result["new_budget"] = current_budget
-                            logger.info(f"Skipping budget decrease for adset {item_id}: would go below min cap ${min_cap:.2f} (current: ${current_budget:.2f}, would be: ${new_budget:.2f})")
-                        else:
-                            # Update budget (in cents)
-                            url = f"{base_url}/{item_id}"
-                            params = {
-                                "daily_budget": int(new_budget * 100),
-                                "access_token": access_token
-                            }
-                            response = requests.post(url, params=params, timeout=30)
-                            response.raise_for_status()
-                            check_rate_limit_headers(response, "write")
-                            result["success"] = True
-                            result["message"] = f"Budget adjusted from ${current_budget:.2f} to ${new_budget:.2f}"
-                            result["old_budget"] = current_budget
-                            result["new_budget"] = new_budget
-                            logger.info(f"Successfully adjusted budget for adset {item_id}: ${current_budget:.2f} -> ${new_budget:.2f}")
-                else:
+    if items:
+        if action_type == "set_status":
+            _execute_set_status(account_id, access_token, rule_level, items, action, results)
+
+        elif action_type == "adjust_daily_budget":
+            # Get current budget first
+            if rule_level == "ad_set":
+                _execute_adjust_daily_budget(account_id, access_token, items, action, results)
+            else:
+                for result in results:
                     result["success"] = False
                     result["message"] = "Budget adjustment only available for ad sets"
                     result["error"] = "Invalid rule level for budget adjustment"
-                    logger.warning(f"Budget adjustment attempted on {rule_level} {item_id}, but only ad sets support budget adjustment")
+                    logger.warning(f"Budget adjustment attempted on {rule_level} {result['item_id']}, but only ad sets support budget adjustment")
 
-            elif action_type == "send_notification":
-                # Send notification action - no API call, just notification
+        elif action_type == "send_notification":
+            # Send notification action - no API call, just notification
+            for result in results:
                 result["success"] = True
                 result["message"] = "Notification sent (no changes made)"
-                logger.info(f"Send notification action for {rule_level} {item_id}: {item_name}")
+                logger.info(f"Send notification action for {rule_level} {result['item_id']}: {result['item_name']}")
 
-            else:
+        else:
+            for result in results:
                 result["success"] = False
                 result["message"] = f"Unknown action type: {action_type}"
                 result["error"] = f"Unsupported action type: {action_type}"
-                logger.warning(f"Unknown action type: {action_type}")
+            logger.warning(f"Unknown action type: {action_type}")
 
-        except requests.exceptions.RequestException as e:
-            result["success"] = False
-            error_msg = str(e)
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_data = e.response.json()
-                    error_msg = error_data.get("error", {}).get("message", error_msg)
-                except:
-                    error_msg = e.response.text or error_msg
-            result["error"] = error_msg
-            result["message"] = f"Failed to execute action: {error_msg}"
-            logger.error(f"Error executing action {action_type} on {rule_level} {item_id}: {error_msg}")
-        except Exception as e:
-            result["success"] = False
-            result["error"] = str(e)
-            result["message"] = f"Unexpected error: {str(e)}"
-            logger.error(f"Unexpected error executing action {action_type} on {rule_level} {item_id}: {str(e)}", exc_info=True)
-
-        results.append(result)
-
-        # Send Slack notification if enabled and webhook URL is provided
-        send_notification = action.get("send_slack_notification", True)  # Default to True if not specified
-        if send_notification and slack_webhook_url and rule_name:
+    # Send Slack notification if enabled and webhook URL is provided
+    send_notification = action.get("send_slack_notification", True)  # Default to True if not specified
+    if send_notification and slack_webhook_url and rule_name:
+        for result in results:
             # For send_notification action, customize the message
             if action_type == "send_notification":
                 # Create a custom result for notification-only actions
                 notification_result = result.copy()
-                notification_result["message"] = f"Rule conditions met for {item_name}"
+                notification_result["message"] = f"Rule conditions met for {result['item_name']}"
                 send_slack_notification(slack_webhook_url, rule_name, action_type, notification_result)
             else:
                 send_slack_notification(slack_webhook_url, rule_name, action_type, result)
 
-        # Add delay between API calls to avoid rate limiting (except after the last item)
-        if index < len(items) - 1:
-            time.sleep(WRITE_DELAY)
-            logger.debug(f"Waiting {WRITE_DELAY}s before processing next item to avoid rate limiting")
-
     return results
-
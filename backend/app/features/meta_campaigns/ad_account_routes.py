@@ -5,6 +5,7 @@ from app.dependencies import get_current_active_user
 from app.auth.models import User
 from app.features.meta_campaigns import ad_account_schemas, ad_account_service
 from app.features.meta_campaigns import campaign_service, campaign_schemas
+from app.features.meta_campaigns.scheduler_service import unschedule_insights_backfill
 
 router = APIRouter(prefix="/ad-accounts", tags=["ad-accounts"])
 
@@ -77,6 +78,7 @@ def delete_ad_account(
     success = ad_account_service.delete_ad_account(db, account_id)
     if not success:
         raise HTTPException(status_code=404, detail="Ad account not found")
+    unschedule_insights_backfill(account_id, only_if_unused=False)
     return {"message": "Ad account deleted successfully"}
 
 
@@ -110,7 +112,7 @@ def get_campaign_ad_sets(
         if not account.meta_account_id or not account.meta_access_token:
             raise HTTPException(status_code=400, detail="Ad account credentials not configured")
 
-        result = campaign_service.fetch_ad_sets_from_meta(
+        result = campaign_service.get_ad_sets_for_campaign(
             ad_account_id=account.meta_account_id,
             access_token=account.meta_access_token,
             campaign_id=campaign_id
@@ -137,7 +139,7 @@ def get_ad_set_ads(
         if not account.meta_account_id or not account.meta_access_token:
             raise HTTPException(status_code=400, detail="Ad account credentials not configured")
 
-        result = campaign_service.fetch_ads_from_meta(
+        result = campaign_service.get_ads_for_ad_set(
             ad_account_id=account.meta_account_id,
             access_token=account.meta_access_token,
             ad_set_id=adset_id
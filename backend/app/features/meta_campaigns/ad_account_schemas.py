@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
 
@@ -9,6 +9,7 @@ class AdAccountBase(BaseModel):
     meta_account_id: Optional[str] = None
     meta_access_token: Optional[str] = None
     slack_webhook_url: Optional[str] = None
+    insights_concurrency: Optional[int] = Field(default=None, ge=1, le=10)
     is_default: bool = False
 
 
@@ -22,6 +23,7 @@ class AdAccountUpdate(BaseModel):
     meta_account_id: Optional[str] = None
     meta_access_token: Optional[str] = None
     slack_webhook_url: Optional[str] = None
+    insights_concurrency: Optional[int] = Field(default=None, ge=1, le=10)
     is_default: Optional[bool] = None
 
 
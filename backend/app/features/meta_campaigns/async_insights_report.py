@@ -0,0 +1,165 @@
+import logging
+import math
+import time
+from datetime import datetime
+from typing import Dict, List, Any
+from app.features.meta_campaigns.graph_api_transport import GRAPH_API_BASE_URL, graph_get, graph_post
+
+logger = logging.getLogger(__name__)
+
+# Polling backoff for report runs
+ASYNC_POLL_INITIAL_DELAY = 2.0  # First wait after creating the report run (seconds)
+ASYNC_POLL_BACKOFF = 1.5  # Multiplier applied to the wait after every poll
+ASYNC_POLL_MAX_DELAY = 30.0  # Upper bound for a single wait (seconds)
+ASYNC_POLL_TIMEOUT = 900  # Give up on a report run after 15 minutes
+
+ASYNC_RESULT_PAGE_LIMIT = 500  # Rows per page when reading a finished report
+
+# Mode selection: the synchronous /insights endpoint starts timing out (or answering
+# "Please reduce the amount of data") once a request covers roughly this many result rows.
+ASYNC_MIN_ESTIMATED_ROWS = 20000
+
+
+class AsyncInsightsReportError(Exception):
+    """Raised when an async insights report run fails, is skipped, or does not finish in time"""
+    pass
+
+
+def estimate_time_range_days(time_range: Dict[str, Any]) -> int:
+    """
+    Estimate how many calendar days a rule time range covers.
+
+    Mirrors build_time_range_string: Meta date ranges are inclusive, so "3 days" is 3 days,
+    while minutes/hours ranges can cross midnight and touch one extra day.
+    """
+    if (time_range or {}).get("since") and (time_range or {}).get("until"):
+        since = datetime.strptime(time_range["since"], "%Y-%m-%d")
+        until = datetime.strptime(time_range["until"], "%Y-%m-%d")
+        return max(1, (until - since).days + 1)
+
+    unit = (time_range or {}).get("unit", "days")
+    amount = (time_range or {}).get("amount", 1) or 1
+    try:
+        amount = float(amount)
+    except (ValueError, TypeError):
+        amount = 1
+
+    if unit == "today":
+        return 1
+    if unit == "minutes":
+        return 1 + int(math.ceil(amount / 1440))
+    if unit == "hours":
+        return 1 + int(math.ceil(amount / 24))
+    return max(1, int(math.ceil(amount)))
+
+
+def estimate_insights_rows(item_count: int, time_range: Dict[str, Any], daily: bool = False) -> int:
+    """
+    Estimate the number of result rows Meta has to compute for an insights request.
+
+    One row per item for an aggregate request, one row per item per day for a daily
+    (time_increment=1) request. Longer aggregate ranges are also slower to compute,
+    so they are weighted by week.
+    """
+    days = estimate_time_range_days(time_range)
+    if daily:
+        return item_count * days
+    return item_count * max(1, int(math.ceil(days / 7)))
+
+
+def should_use_async_insights(item_count: int, time_range: Dict[str, Any] | List[Dict[str, Any]], daily: bool = False) -> bool:
+    """
+    Decide whether an insights fetch should use an async report run instead of synchronous slices.
+
+    Args:
+        item_count: Number of objects insights are requested for
+        time_range: Rule time range dict (unit/amount/exclude_today), or a list of them for a
+            multi-window (time_ranges) request, whose rows add up
+        daily: True for daily breakdowns
+    """
+    time_ranges = time_range if isinstance(time_range, list) else [time_range]
+    days = max((estimate_time_range_days(tr) for tr in time_ranges), default=1)
+    estimated_rows = sum(estimate_insights_rows(item_count, tr, daily=daily) for tr in time_ranges)
+    use_async = estimated_rows >= ASYNC_MIN_ESTIMATED_ROWS
+    logger.info(
+        f"[ASYNC_INSIGHTS] Mode selection: items={item_count}, days={days}, daily={daily}, "
+        f"estimated_rows={estimated_rows} -> {'async report' if use_async else 'sync'}"
+    )
+    return use_async
+
+
+def run_async_insights_report(account_id: str, access_token: str, params: Dict[str, Any]) -> List[Dict]:
+    """
+    Run an account-level async insights report and return all of its rows.
+
+    Creates a report run (POST /act_X/insights), polls it with exponential backoff until
+    Meta reports "Job Completed", then pages through /{report_run_id}/insights.
+
+    Args:
+        account_id: Meta Ad Account ID with 'act_' prefix
+        access_token: Meta Access Token
+        params: Insights parameters (level, fields, time_range, time_increment, ...), without access_token
+
+    Returns:
+        List of insights rows
+
+    Raises:
+        AsyncInsightsReportError: if the run fails, is skipped, or times out
+        requests.exceptions.RequestException: on HTTP errors
+    """
+    start_time = time.time()
+
+    create_params = dict(params)
+    create_params["access_token"] = access_token
+    response = graph_post(f"{GRAPH_API_BASE_URL}/{account_id}/insights", params=create_params, timeout=60, api_type="insights", account_id=account_id)
+    response.raise_for_status()
+    report_run_id = response.json().get("report_run_id")
+    if not report_run_id:
+        raise AsyncInsightsReportError(f"Meta did not return a report_run_id: {response.text[:500]}")
+    logger.info(f"[ASYNC_INSIGHTS] Created report run {report_run_id} for account {account_id} (level={params.get('level')}, time_range={params.get('time_range')})")
+
+    # Poll until the job completes
+    delay = ASYNC_POLL_INITIAL_DELAY
+    poll_count = 0
+    while True:
+        time.sleep(delay)
+        poll_count += 1
+        response = graph_get(
+            f"{GRAPH_API_BASE_URL}/{report_run_id}",
+            params={"fields": "async_status,async_percent_completion", "access_token": access_token},
+            timeout=30,
+            api_type="insights",
+            account_id=account_id,
+        )
+        response.raise_for_status()
+        status_data = response.json()
+        async_status = status_data.get("async_status")
+        percent = status_data.get("async_percent_completion")
+        logger.info(f"[ASYNC_INSIGHTS] Report run {report_run_id} poll {poll_count}: status={async_status}, completion={percent}%")
+
+        if async_status == "Job Completed":
+            break
+        if async_status in ("Job Failed", "Job Skipped"):
+            raise AsyncInsightsReportError(f"Report run {report_run_id} ended with status '{async_status}'")
+        if time.time() - start_time > ASYNC_POLL_TIMEOUT:
+            raise AsyncInsightsReportError(f"Report run {report_run_id} did not complete within {ASYNC_POLL_TIMEOUT}s (last status: {async_status}, {percent}%)")
+
+        delay = min(delay * ASYNC_POLL_BACKOFF, ASYNC_POLL_MAX_DELAY)
+
+    # Page through the finished report
+    rows = []
+    url = f"{GRAPH_API_BASE_URL}/{report_run_id}/insights"
+    page_params = {"limit": ASYNC_RESULT_PAGE_LIMIT, "access_token": access_token}
+    page_count = 0
+    while url:
+        page_count += 1
+        response = graph_get(url, params=page_params, timeout=60, api_type="insights", account_id=account_id)
+        response.raise_for_status()
+        page = response.json()
+        rows.extend(page.get("data", []))
+        url = (page.get("paging") or {}).get("next")
+        # paging.next already carries limit/after/access_token
+        page_params = None
+
+    logger.info(f"[ASYNC_INSIGHTS] Report run {report_run_id} returned {len(rows)} rows across {page_count} page(s) in {time.time() - start_time:.2f}s")
+    return rows
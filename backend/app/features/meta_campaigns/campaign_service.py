@@ -1,86 +1,17 @@
 import requests
 from typing import List
 from app.features.meta_campaigns import campaign_schemas, models
+from app.features.meta_campaigns.graph_api_transport import graph_get
+from app.features.meta_campaigns.entity_snapshot import get_snapshot_entities
 from sqlalchemy.orm import Session
 import logging
-import time
-import json
 
 logger = logging.getLogger(__name__)
 
-# API call delays to prevent rate limiting
-READ_DELAY = 0.3  # Delay between read API calls (300ms)
-
-
-def check_rate_limit_headers(response: requests.Response, api_type: str = "read"):
-    """
-    Check and log Meta API rate limiting headers to monitor usage.
-
-    Meta API provides these headers:
-    - X-App-Usage: App-level rate limiting
-    - X-Ad-Account-Usage: Ad account-level rate limiting
-    - X-Business-Use-Case-Usage: Business use case rate limiting
-
-    Each header contains JSON like: {"call_count": 100, "total_time": 20, "total_cputime": 20}
-
-    Args:
-        response: requests.Response object from Meta API
-        api_type: Type of API call ("read", "write", "insights")
-    """
-    rate_limit_headers = {
-        "X-App-Usage": response.headers.get("X-App-Usage"),
-        "X-Ad-Account-Usage": response.headers.get("X-Ad-Account-Usage"),
-        "X-Business-Use-Case-Usage": response.headers.get("X-Business-Use-Case-Usage")
-    }
-
-    # Only log if we have rate limit headers
-    if any(rate_limit_headers.values()):
-        usage_info = {}
-        for header_name, header_value in rate_limit_headers.items():
-            if header_value:
-                try:
-                    usage_data = json.loads(header_value)
-                    usage_info[header_name] = usage_data
-                except (json.JSONDecodeError, ValueError):
-                    usage_info[header_name] = header_value
-
-        # Check if we're getting close to limits (usually 80%+ is concerning)
-        warnings = []
-        for header_name, usage_data in usage_info.items():
-            if isinstance(usage_data, dict):
-                # Meta API typically uses call_count and total_time
-                call_count = usage_data.get("call_count", 0)
-                total_time = usage_data.get("total_time", 0)
-
-                # Check for acc_id_util_pct in X-Ad-Account-Usage (percentage usage, 0-100)
-                util_pct = usage_data.get("acc_id_util_pct", 0)
-
-                # Handle X-Business-Use-Case-Usage which has nested structure
-                if header_name == "X-Business-Use-Case-Usage" and isinstance(usage_data, dict):
-                    # This header has account IDs as keys, with arrays of usage data
-                    for account_id, usage_list in usage_data.items():
-                        if isinstance(usage_list, list) and len(usage_list) > 0:
-                            for usage_item in usage_list:
-                                if isinstance(usage_item, dict):
-                                    bc_call_count = usage_item.get("call_count", 0)
-                                    bc_total_time = usage_item.get("total_time", 0)
-
-                                    # Warn if usage is high
-                                    if bc_call_count > 80 or bc_total_time > 80:
-                                        warnings.append(f"{header_name} ({account_id}): call_count={bc_call_count}, total_time={bc_total_time}")
-
-                # Warn if usage seems high
-                # Meta API typically has limits around 100 for call_count/total_time
-                # For acc_id_util_pct, 80%+ is concerning
-                if util_pct > 0 and util_pct >= 80:
-                    warnings.append(f"{header_name}: acc_id_util_pct={util_pct}%")
-                elif call_count > 80 or total_time > 80:
-                    warnings.append(f"{header_name}: call_count={call_count}, total_time={total_time}")
-
-        if warnings:
-            logger.warning(f"[RATE_LIMIT] ⚠️ HIGH USAGE WARNING ({api_type}): {'; '.join(warnings)}")
-
-    return rate_limit_headers
+# Fields the browse endpoints return (same as the live Meta fetches below)
+CAMPAIGN_BROWSE_FIELDS = ["id", "name", "status", "effective_status"]
+AD_SET_BROWSE_FIELDS = ["id", "name", "campaign_id", "status", "effective_status", "daily_budget", "lifetime_budget"]
+AD_BROWSE_FIELDS = ["id", "name", "adset_id", "campaign_id", "status", "effective_status"]
 
 
 def test_meta_connection(ad_account_id: str, access_token: str) -> bool:
@@ -108,9 +39,8 @@ def test_meta_connection(ad_account_id: str, access_token: str) -> bool:
     }
 
     try:
-        response = requests.get(url, params=params, timeout=30)
+        response = graph_get(url, params=params, timeout=30, api_type="read", account_id=ad_account_id)
         response.raise_for_status()
-        check_rate_limit_headers(response, "read")
         data = response.json()
         campaigns = data.get("data", [])
         logger.info(f"Connection test successful: fetched {len(campaigns)} campaigns (first page only)")
@@ -160,12 +90,11 @@ def fetch_campaigns_from_meta(
             logger.info(f"Fetching campaigns page {page_count}...")
 
             if using_next_url:
-                response = requests.get(url, timeout=30)
+                response = graph_get(url, timeout=30, api_type="read", account_id=ad_account_id)
             else:
-                response = requests.get(url, params=params, timeout=30)
+                response = graph_get(url, params=params, timeout=30, api_type="read", account_id=ad_account_id)
 
             response.raise_for_status()
-            check_rate_limit_headers(response, "read")
             data = response.json()
             page_campaigns = data.get("data", [])
             all_campaigns.extend(page_campaigns)
@@ -178,8 +107,6 @@ def fetch_campaigns_from_meta(
 
             url = next_url
             using_next_url = True
-            time.sleep(READ_DELAY)
-            logger.debug(f"Waiting {READ_DELAY}s before fetching next page to avoid rate limiting")
 
         logger.info(f"Fetched all campaigns: {len(all_campaigns)} total across {page_count} page(s)")
         return campaign_schemas.CampaignsResponse(data=all_campaigns, paging=None)
@@ -218,12 +145,58 @@ def get_campaigns_for_ad_account(
     if not account.meta_access_token:
         raise ValueError("Ad account does not have a Meta Access Token configured")
 
+    # Serve from the entity snapshot (synced incrementally) when available
+    snapshot_campaigns = get_snapshot_entities(account.meta_account_id, account.meta_access_token, "campaign")
+    if snapshot_campaigns is not None:
+        return campaign_schemas.CampaignsResponse(
+            data=[{field: campaign.get(field) for field in CAMPAIGN_BROWSE_FIELDS} for campaign in snapshot_campaigns],
+            paging=None,
+        )
+
     return fetch_campaigns_from_meta(
         ad_account_id=account.meta_account_id,
         access_token=account.meta_access_token
     )
 
 
+def get_ad_sets_for_campaign(ad_account_id: str, access_token: str, campaign_id: str) -> dict:
+    """
+    Get a campaign's ad sets, from the ad set snapshot if one is already loaded, else from Meta.
+
+    Browsing one campaign does not trigger a full load of the account's ad sets.
+    """
+    snapshot_ad_sets = get_snapshot_entities(ad_account_id, access_token, "ad_set", load_if_missing=False)
+    if snapshot_ad_sets is not None:
+        return {
+            "data": [
+                {field: ad_set.get(field) for field in AD_SET_BROWSE_FIELDS if field in ad_set}
+                for ad_set in snapshot_ad_sets
+                if str(ad_set.get("campaign_id")) == str(campaign_id)
+            ],
+            "paging": None,
+        }
+    return fetch_ad_sets_from_meta(ad_account_id=ad_account_id, access_token=access_token, campaign_id=campaign_id)
+
+
+def get_ads_for_ad_set(ad_account_id: str, access_token: str, ad_set_id: str) -> dict:
+    """
+    Get an ad set's ads, from the ad snapshot if one is already loaded, else from Meta.
+
+    Browsing one ad set does not trigger a full load of the account's ads.
+    """
+    snapshot_ads = get_snapshot_entities(ad_account_id, access_token, "ad", load_if_missing=False)
+    if snapshot_ads is not None:
+        return {
+            "data": [
+                {field: ad.get(field) for field in AD_BROWSE_FIELDS if field in ad}
+                for ad in snapshot_ads
+                if str(ad.get("adset_id")) == str(ad_set_id)
+            ],
+            "paging": None,
+        }
+    return fetch_ads_from_meta(ad_account_id=ad_account_id, access_token=access_token, ad_set_id=ad_set_id)
+
+
 def fetch_ad_sets_from_meta(
     ad_account_id: str,
     access_token: str,
@@ -262,12 +235,11 @@ def fetch_ad_sets_from_meta(
             logger.info(f"Fetching ad sets page {page_count} for campaign {campaign_id}...")
 
             if using_next_url:
-                response = requests.get(url, timeout=30)
+                response = graph_get(url, timeout=30, api_type="read", account_id=ad_account_id)
             else:
-                response = requests.get(url, params=params, timeout=30)
+                response = graph_get(url, params=params, timeout=30, api_type="read", account_id=ad_account_id)
 
             response.raise_for_status()
-            check_rate_limit_headers(response, "read")
             data = response.json()
             page_ad_sets = data.get("data", [])
             all_ad_sets.extend(page_ad_sets)
@@ -280,8 +252,6 @@ def fetch_ad_sets_from_meta(
 
             url = next_url
             using_next_url = True
-            time.sleep(READ_DELAY)
-            logger.debug(f"Waiting {READ_DELAY}s before fetching next page to avoid rate limiting")
 
         logger.info(f"Fetched all ad sets: {len(all_ad_sets)} total across {page_count} page(s)")
         return {"data": all_ad_sets, "paging": None}
@@ -328,12 +298,11 @@ def fetch_ads_from_meta(
             logger.info(f"Fetching ads page {page_count} for ad set {ad_set_id}...")
 
             if using_next_url:
-                response = requests.get(url, timeout=30)
+                response = graph_get(url, timeout=30, api_type="read", account_id=ad_account_id)
             else:
-                response = requests.get(url, params=params, timeout=30)
+                response = graph_get(url, params=params, timeout=30, api_type="read", account_id=ad_account_id)
 
             response.raise_for_status()
-            check_rate_limit_headers(response, "read")
             data = response.json()
             page_ads = data.get("data", [])
             all_ads.extend(page_ads)
@@ -346,8 +315,6 @@ def fetch_ads_from_meta(
 
             url = next_url
             using_next_url = True
-            time.sleep(READ_DELAY)
-            logger.debug(f"Waiting {READ_DELAY}s before fetching next page to avoid rate limiting")
 
         logger.info(f"Fetched all ads: {len(all_ads)} total across {page_count} page(s)")
         return {"data": all_ads, "paging": None}
@@ -0,0 +1,268 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+from app.features.meta_campaigns.condition_evaluator import (
+    COST_DAILY_INPUTS,
+    InsightsMetrics,
+    get_campaign_status,
+    is_special_value_token,
+    normalize_insights,
+    parse_value_scale,
+)
+
+# NumPy is optional: without it every rule uses the per-item evaluation in service._evaluate_item
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Rules with fewer filtered items are evaluated item by item; below this the column setup costs more than it saves
+COLUMNAR_MIN_ITEMS = 1000
+
+# With columnar evaluation, full per-item evaluation records are logged for every item meeting the
+# conditions and for this many of the others (in entity order); the rest are only counted
+COLUMNAR_LOGGED_FAILING_ITEMS = 200
+
+# Fields computed per item from other data in service.py (daily rows), never evaluated as columns
+_UNSUPPORTED_FIELDS = {"cpp_winning_days"}
+
+# Metrics of an item without insights
+_EMPTY_METRICS = normalize_insights({})
+
+# Special value tokens that can be turned into a column (unknown tokens log per item, so they are not)
+_COLUMN_TOKENS = {"__daily_budget__", "__lifetime_budget__", "__current_spend__"}
+
+
+class _Unsupported(Exception):
+    """A condition or value the columnar engine cannot reproduce exactly; the rule is evaluated per item"""
+
+
+_NUMERIC_OPERATORS = {
+    ">": lambda actual, expected: actual > expected,
+    ">=": lambda actual, expected: actual >= expected,
+    "<": lambda actual, expected: actual < expected,
+    "<=": lambda actual, expected: actual <= expected,
+}
+
+
+def _numeric_mask(operator_name: str, actual, expected, tolerant: bool):
+    """Compare a float column with an expected scalar or column, like the per-item operator functions"""
+    if operator_name in _NUMERIC_OPERATORS:
+        return _NUMERIC_OPERATORS[operator_name](actual, expected)
+    if operator_name == "=":
+        return np.abs(actual - expected) < 0.01 if tolerant else actual == expected
+    if operator_name == "!=":
+        return np.abs(actual - expected) >= 0.01 if tolerant else actual != expected
+    return np.zeros(len(actual), dtype=bool)
+
+
+class _Columns:
+    """Per-item values for one rule run, extracted once per column and shared by all conditions"""
+
+    def __init__(self, items: List[Dict], active_ad_counts: Dict[str, Dict], rule_level: str):
+        self.items = items
+        self.ids = [item.get("id") for item in items]
+        self.active_ad_counts = active_ad_counts
+        self.rule_level = rule_level
+        self._cache: Dict[Any, Any] = {}
+
+    def _cached(self, key, build: Callable):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def metric(self, field: str, metrics_by_id: Dict[str, InsightsMetrics]):
+        """Insights metric per item, as evaluate_condition reads it from normalize_insights()"""
+        def build():
+            values = []
+            for item_id in self.ids:
+                metrics = metrics_by_id.get(item_id) or _EMPTY_METRICS
+                if field == "media_margin_volume":
+                    # evaluate_condition reports the value from its calculation details
+                    values.append(metrics.purchase_values[0] - metrics.details_spend)
+                else:
+                    values.append(metrics.metric(field))
+            return np.array(values, dtype=float)
+        return self._cached(("metric", field, id(metrics_by_id)), build)
+
+    def daily_budget(self):
+        """(daily budget in dollars, True where the item has one)"""
+        def build():
+            raw = [item.get("daily_budget") for item in self.items]
+            valid = np.array([value is not None for value in raw], dtype=bool)
+            try:
+                values = np.array([float(value) / 100 if value is not None else np.nan for value in raw], dtype=float)
+            except (ValueError, TypeError):
+                raise _Unsupported("non-numeric daily_budget")
+            return values, valid
+        return self._cached("daily_budget", build)
+
+    def token(self, token: str, metrics_by_id: Dict[str, InsightsMetrics]):
+        """Column for a special value token, resolved like condition_evaluator._resolve_special_value_token"""
+        if token == "__current_spend__":
+            return self.metric("spend", metrics_by_id)
+
+        budget_field = "daily_budget" if token == "__daily_budget__" else "lifetime_budget"
+
+        def build():
+            try:
+                return np.array([float(item.get(budget_field, 0)) / 100 for item in self.items], dtype=float)
+            except (ValueError, TypeError):
+                raise _Unsupported(f"non-numeric {budget_field}")
+        return self._cached(("token", token), build)
+
+    def active_ads(self):
+        def build():
+            counts = []
+            for item in self.items:
+                parent_id = item.get("adset_id") if self.rule_level == "ad" else item.get("id")
+                count = self.active_ad_counts.get(parent_id, {"active": 0, "total": 0})["active"]
+                counts.append(0 if count is None else count)
+            return np.array(counts, dtype=float)
+        return self._cached("active_ads", build)
+
+    def lower_names(self):
+        """Lowercased item names (for name_contains); raises _Unsupported if an item has no name"""
+        def build():
+            names = [item.get("name", "") for item in self.items]
+            if not all(isinstance(name, str) for name in names):
+                raise _Unsupported("item without a name")
+            return np.char.lower(np.array(names, dtype=str))
+        return self._cached("names_lower", build)
+
+    def strings(self, key: str, values: Callable[[Dict], Any]):
+        """(str(value) per item, True where the value is not None)"""
+        def build():
+            raw = [values(item) for item in self.items]
+            valid = np.array([value is not None for value in raw], dtype=bool)
+            return np.array([str(value) for value in raw], dtype=str), valid
+        return self._cached(key, build)
+
+
+def _expected_column(condition: Dict, columns: _Columns, metrics_by_id: Dict[str, InsightsMetrics]):
+    """Expected value of a numeric condition as a float scalar or per-item column"""
+    expected_raw = condition.get("value")
+    if isinstance(expected_raw, dict) and "base" in expected_raw:
+        base = expected_raw.get("base")
+        mul_f, add_f = parse_value_scale(expected_raw)
+        if is_special_value_token(base):
+            if base not in _COLUMN_TOKENS:
+                raise _Unsupported(f"special value {base}")
+            return (columns.token(base, metrics_by_id) * mul_f) + add_f
+        try:
+            base_val = float(base) if base is not None and base != "" else 0.0
+        except (ValueError, TypeError):
+            base_val = 0.0
+        return (base_val * mul_f) + add_f
+
+    if is_special_value_token(expected_raw):
+        if expected_raw not in _COLUMN_TOKENS:
+            raise _Unsupported(f"special value {expected_raw}")
+        return columns.token(expected_raw, metrics_by_id)
+
+    try:
+        return float(expected_raw)
+    except (ValueError, TypeError):
+        # evaluate_condition raises for such values; let it do so
+        raise _Unsupported(f"non-numeric value {expected_raw!r}")
+
+
+def _constant_string(condition: Dict) -> str:
+    """Expected value of a status/name condition; per-item values are left to the per-item evaluation"""
+    expected_raw = condition.get("value")
+    if (isinstance(expected_raw, dict) and "base" in expected_raw) or is_special_value_token(expected_raw):
+        raise _Unsupported("computed value in a text condition")
+    return str(expected_raw)
+
+
+def _condition_mask(condition: Dict, columns: _Columns, metrics_by_id: Dict[str, InsightsMetrics]):
+    field = condition.get("field")
+    operator_name = condition.get("operator")
+    if field in _UNSUPPORTED_FIELDS:
+        raise _Unsupported(field)
+
+    if field in ("status", "campaign_status"):
+        if field == "status":
+            actual, _ = columns.strings("status", lambda item: item.get("status") or item.get("effective_status"))
+            # A missing status compares as "None", like str(None) in evaluate_condition
+            valid = np.ones(len(actual), dtype=bool)
+        else:
+            # A missing campaign status fails the condition
+            actual, valid = columns.strings("campaign_status", get_campaign_status)
+        expected = _constant_string(condition)
+        if operator_name == "=":
+            return valid & (actual == expected)
+        if operator_name == "!=":
+            return valid & (actual != expected)
+        return np.zeros(len(actual), dtype=bool)
+
+    if field == "name_contains":
+        if operator_name not in ("=", "!="):
+            return np.zeros(len(columns.items), dtype=bool)
+        contains = np.char.find(columns.lower_names(), _constant_string(condition).lower()) >= 0
+        return contains if operator_name == "=" else ~contains
+
+    if field == "daily_budget":
+        actual, valid = columns.daily_budget()
+        expected = _expected_column(condition, columns, metrics_by_id)
+        return valid & _numeric_mask(operator_name, actual, expected, tolerant=False)
+
+    if field == "amount_of_active_ads":
+        actual = columns.active_ads()
+    else:
+        actual = columns.metric(field, metrics_by_id)
+    expected = _expected_column(condition, columns, metrics_by_id)
+    return _numeric_mask(operator_name, actual, expected, tolerant=True)
+
+
+def evaluate_columnar(
+    items: List[Dict],
+    condition_specs: List[Dict],
+    failed_item_ids: Set[str],
+    active_ad_counts: Dict[str, Dict],
+    rule_level: str,
+    failed_insights_ids: Set[str] = frozenset(),
+) -> Optional[List[bool]]:
+    """
+    Evaluate a rule's ANDed conditions for all items at once with NumPy column arrays.
+
+    Metrics, budgets and statuses are extracted once per column into arrays, and each condition
+    becomes one boolean mask over the whole batch. The result matches the all_conditions_met of
+    the per-item evaluation; building evaluation records is left to the caller, for the items
+    it logs.
+
+    Args:
+        items: Filtered items, in entity order
+        condition_specs: Per condition: {"condition", "metrics" ({item_id: InsightsMetrics} for its
+            time range), "item_only" (see is_item_only_condition), "cost" (see condition_cost)}
+        failed_item_ids: Items that already failed an item-only condition (their insights were not fetched)
+        active_ad_counts: {parent_id: {"active", "total"}} for amount_of_active_ads
+        rule_level: Rule level ("ad", "ad_set", "campaign")
+        failed_insights_ids: Items that already failed a condition on aggregate insights (their daily
+            insights and active ad counts were not fetched)
+
+    Returns:
+        True/False per item, or None if NumPy is not installed or a condition needs the per-item evaluation
+    """
+    if np is None or not items:
+        return None
+
+    columns = _Columns(items, active_ad_counts, rule_level)
+    early_failed = np.array([item_id in failed_item_ids for item_id in columns.ids], dtype=bool)
+    insights_failed = np.array([item_id in failed_insights_ids for item_id in columns.ids], dtype=bool)
+    passed = np.ones(len(items), dtype=bool)
+    try:
+        for spec in condition_specs:
+            mask = _condition_mask(spec["condition"], columns, spec["metrics"])
+            if not spec["item_only"]:
+                # Conditions needing insights are skipped (and fail) for items that failed early
+                mask = mask & ~early_failed
+            if spec["cost"] == COST_DAILY_INPUTS:
+                # Likewise for daily inputs of items that failed a condition on aggregate insights
+                mask = mask & ~insights_failed
+            passed &= mask
+    except _Unsupported as e:
+        logger.info(f"[COLUMNAR] Falling back to per-item evaluation ({e})")
+        return None
+    return passed.tolist()
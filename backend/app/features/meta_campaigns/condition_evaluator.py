@@ -1,9 +1,105 @@
 import logging
-from typing import Dict, Tuple, Any
-from app.features.meta_campaigns.facebook_api_client import _safe_float_any, _pick_canonical_purchase_action_value
+import operator
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from app.features.meta_campaigns.facebook_api_client import _pick_canonical_purchase_action_value, safe_float_any
 
 logger = logging.getLogger(__name__)
 
+# Insights fields each metric in calculate_metric_from_insights() reads, so insights requests can
+# ask Meta only for what a rule's conditions need. Keep in sync when adding or changing a metric.
+METRIC_INSIGHTS_FIELDS = {
+    # cost_per_action_type first, falling back to spend / purchase actions
+    "cpp": {"cost_per_action_type", "spend", "actions"},
+    "spend": {"spend"},
+    "conversions": {"actions"},
+    "purchase_count": {"actions"},
+    "purchase_value": {"action_values"},
+    "ctr": {"ctr"},
+    "cpc": {"cpc"},
+    "cpm": {"cpm"},
+    "roas": {"spend", "action_values"},
+    # evaluate_condition() also logs purchase count and CPP in the calculation details
+    "media_margin_volume": {"spend", "action_values", "actions", "cost_per_action_type"},
+}
+
+# Every insights metric field, requested for condition fields the mapping above does not know
+ALL_INSIGHTS_METRIC_FIELDS = {"spend", "impressions", "clicks", "cpc", "cpm", "ctr", "actions", "action_values", "cost_per_action_type"}
+
+# Special value tokens (see evaluate_condition) and what they read: insights fields or entity fields
+SPECIAL_VALUE_INSIGHTS_FIELDS = {"__current_spend__": {"spend"}}
+SPECIAL_VALUE_ITEM_FIELDS = {"__daily_budget__": {"daily_budget"}, "__lifetime_budget__": {"lifetime_budget"}}
+
+# Condition fields that only read the entity itself (no insights, no extra API calls).
+# They can be checked on each page of entities as soon as it arrives.
+# campaign_status reads the campaign{status,effective_status} expansion fetched with the entity.
+ITEM_FIELD_CONDITIONS = {"status", "campaign_status", "name_contains", "daily_budget"}
+
+# Data cost of a condition's inputs, cheapest first (see condition_cost). Conditions are ANDed, so
+# each costlier input is only fetched for items that passed every cheaper condition.
+COST_ITEM_FIELDS = 0         # Entity fields, checked per page as it arrives
+COST_AGGREGATE_INSIGHTS = 1  # Aggregate insights, prefetched while entity pages stream in
+COST_DAILY_INPUTS = 2        # Daily insights (cpp_winning_days) and active ad counts (amount_of_active_ads)
+
+# Condition fields computed in service.py from daily rows or active ad counts
+DAILY_INPUT_CONDITIONS = {"cpp_winning_days", "amount_of_active_ads"}
+
+
+def _safe_float(value, default=0):
+    """Safely convert to float, handling strings and None"""
+    if value is None or value == "":
+        return default
+    try:
+        return float(str(value).replace(",", ""))  # Remove commas from formatted numbers
+    except (ValueError, TypeError):
+        return default
+
+
+def _reported_cost_per_purchase(insights: Dict) -> Optional[float]:
+    """Cost per purchase as Meta reports it (cost_per_action_type, then cost_per_result), or None if it does not"""
+    # Try to extract cost_per_purchase from cost_per_action_type array first
+    cost_per_action_type = insights.get("cost_per_action_type", [])
+    logger.debug(f"cost_per_action_type for cpp: {cost_per_action_type}, type: {type(cost_per_action_type)}")
+
+    if cost_per_action_type:
+        # Find the purchase action in the array
+        # Facebook API can return various purchase action types: "purchase", "offsite_conversion.fb_pixel_purchase",
+        # "onsite_web_purchase", "omni_purchase", "web_in_store_purchase", etc.
+        purchase_action_types = ["purchase", "offsite_conversion.fb_pixel_purchase", "onsite_web_purchase",
+                               "omni_purchase", "web_in_store_purchase", "web_app_in_store_purchase"]
+        for action_cost in cost_per_action_type:
+            if isinstance(action_cost, dict):
+                action_type = action_cost.get("action_type", "")
+                logger.debug(f"Checking action_type: {action_type}, action_cost: {action_cost}")
+                # Check for any purchase action type
+                if action_type in purchase_action_types or "purchase" in action_type.lower():
+                    cpp_value = action_cost.get("value")
+                    logger.debug(f"Found purchase action ({action_type}), value: {cpp_value}")
+                    if cpp_value:
+                        # cost_per_action_type value might come as a string with currency or as a number
+                        cpp_str = str(cpp_value).replace("$", "").replace(",", "")
+                        result = _safe_float(cpp_str, 0)
+                        logger.debug(f"Calculated CPP from cost_per_action_type: {result}")
+                        return result
+
+    # Fallback: Try cost_per_result if available (for purchase-optimized campaigns)
+    cost_per_result = insights.get("cost_per_result", [])
+    if cost_per_result and isinstance(cost_per_result, list):
+        for result_item in cost_per_result:
+            if isinstance(result_item, dict):
+                indicator = result_item.get("indicator", "")
+                # Check if it's a purchase-related result
+                if "purchase" in indicator.lower():
+                    values = result_item.get("values", [])
+                    if values and isinstance(values, list) and len(values) > 0:
+                        cpp_value = values[0].get("value")
+                        if cpp_value:
+                            cpp_str = str(cpp_value).replace("$", "").replace(",", "")
+                            result = _safe_float(cpp_str, 0)
+                            logger.debug(f"Calculated CPP from cost_per_result: {result}")
+                            return result
+
+    return None
+
 
 def calculate_metric_from_insights(insights: Dict, field: str) -> float:
     """Calculate a metric value from insights data
@@ -16,61 +112,14 @@ def calculate_metric_from_insights(insights: Dict, field: str) -> float:
         logger.debug(f"No insights data available for field '{field}'")
         return 0
 
-    # Helper to safely convert to float, handling strings and None
-    def safe_float(value, default=0):
-        if value is None or value == "":
-            return default
-        try:
-            return float(str(value).replace(",", ""))  # Remove commas from formatted numbers
-        except (ValueError, TypeError):
-            return default
-
     if field == "cpp":
-        # Try to extract cost_per_purchase from cost_per_action_type array first
-        cost_per_action_type = insights.get("cost_per_action_type", [])
-        logger.debug(f"cost_per_action_type for cpp: {cost_per_action_type}, type: {type(cost_per_action_type)}")
-
-        if cost_per_action_type:
-            # Find the purchase action in the array
-            # Facebook API can return various purchase action types: "purchase", "offsite_conversion.fb_pixel_purchase",
-            # "onsite_web_purchase", "omni_purchase", "web_in_store_purchase", etc.
-            purchase_action_types = ["purchase", "offsite_conversion.fb_pixel_purchase", "onsite_web_purchase",
-                                   "omni_purchase", "web_in_store_purchase", "web_app_in_store_purchase"]
-            for action_cost in cost_per_action_type:
-                if isinstance(action_cost, dict):
-                    action_type = action_cost.get("action_type", "")
-                    logger.debug(f"Checking action_type: {action_type}, action_cost: {action_cost}")
-                    # Check for any purchase action type
-                    if action_type in purchase_action_types or "purchase" in action_type.lower():
-                        cpp_value = action_cost.get("value")
-                        logger.debug(f"Found purchase action ({action_type}), value: {cpp_value}")
-                        if cpp_value:
-                            # cost_per_action_type value might come as a string with currency or as a number
-                            cpp_str = str(cpp_value).replace("$", "").replace(",", "")
-                            result = safe_float(cpp_str, 0)
-                            logger.debug(f"Calculated CPP from cost_per_action_type: {result}")
-                            return result
-
-        # Fallback: Try cost_per_result if available (for purchase-optimized campaigns)
-        cost_per_result = insights.get("cost_per_result", [])
-        if cost_per_result and isinstance(cost_per_result, list):
-            for result_item in cost_per_result:
-                if isinstance(result_item, dict):
-                    indicator = result_item.get("indicator", "")
-                    # Check if it's a purchase-related result
-                    if "purchase" in indicator.lower():
-                        values = result_item.get("values", [])
-                        if values and isinstance(values, list) and len(values) > 0:
-                            cpp_value = values[0].get("value")
-                            if cpp_value:
-                                cpp_str = str(cpp_value).replace("$", "").replace(",", "")
-                                result = safe_float(cpp_str, 0)
-                                logger.debug(f"Calculated CPP from cost_per_result: {result}")
-                                return result
+        reported_cpp = _reported_cost_per_purchase(insights)
+        if reported_cpp is not None:
+            return reported_cpp
 
         # Fallback: Calculate from spend and purchase count if cost_per_action_type is not available
         logger.debug(f"cost_per_action_type not available, falling back to calculation from spend and actions")
-        spend = safe_float(insights.get("spend"), 0)
+        spend = _safe_float(insights.get("spend"), 0)
         purchases = calculate_metric_from_insights(insights, "purchase_count")
 
         if purchases > 0:
@@ -81,14 +130,14 @@ def calculate_metric_from_insights(insights: Dict, field: str) -> float:
             logger.debug(f"No purchases found. spend={spend}, actions={insights.get('actions')}")
             return 0
     elif field == "spend":
-        return safe_float(insights.get("spend"), 0)
+        return _safe_float(insights.get("spend"), 0)
     elif field == "conversions":
         actions = insights.get("actions", [])
         conversions = 0
         if actions:
             for action in actions:
                 if isinstance(action, dict) and action.get("action_type") in ["purchase", "complete_registration", "lead"]:
-                    conversions += safe_float(action.get("value"), 0)
+                    conversions += _safe_float(action.get("value"), 0)
         return conversions
     elif field == "purchase_count":
         # Purchase count only (needed for Media Margin Volume / AOV calculations)
@@ -124,14 +173,14 @@ def calculate_metric_from_insights(insights: Dict, field: str) -> float:
         if ctr_value:
             # CTR might come as percentage string like "1.23%" or as decimal
             ctr_str = str(ctr_value).replace("%", "")
-            return safe_float(ctr_str, 0)
+            return _safe_float(ctr_str, 0)
         return 0
     elif field == "cpc":
-        return safe_float(insights.get("cpc"), 0)
+        return _safe_float(insights.get("cpc"), 0)
     elif field == "cpm":
-        return safe_float(insights.get("cpm"), 0)
+        return _safe_float(insights.get("cpm"), 0)
     elif field == "roas":
-        spend = safe_float(insights.get("spend"), 0)
+        spend = _safe_float(insights.get("spend"), 0)
         if spend == 0:
             return 0
 
@@ -153,7 +202,7 @@ def calculate_metric_from_insights(insights: Dict, field: str) -> float:
         (when value & spend refer to the same time range and attribution settings)
         """
         purchase_value = calculate_metric_from_insights(insights, "purchase_value")
-        spend = safe_float(insights.get("spend"), 0)
+        spend = _safe_float(insights.get("spend"), 0)
         return purchase_value - spend
     elif field == "daily_budget":
         # This comes from the object data, not insights
@@ -161,307 +210,500 @@ def calculate_metric_from_insights(insights: Dict, field: str) -> float:
     return 0
 
 
-def evaluate_condition(item: Dict, insights: Dict, condition: Dict, campaign_status_cache: Dict[str, str] = None) -> Tuple[bool, Dict]:
-    """Evaluate a single condition against an item
+class InsightsMetrics(NamedTuple):
+    """Every metric a condition can read from one item's insights, derived once (see normalize_insights)"""
+    spend: float
+    cpp: float
+    conversions: float
+    purchase_count: float
+    purchase_value: float
+    ctr: float
+    cpc: float
+    cpm: float
+    roas: float
+    media_margin_volume: float
+    # Inputs of the Media Margin Volume calculation details attached to evaluations
+    details_spend: float  # spend with "$" and "," stripped
+    purchase_counts: Tuple[float, str, Dict[str, float]]  # _pick_canonical_purchase_action_value(actions)
+    purchase_values: Tuple[float, str, Dict[str, float]]  # _pick_canonical_purchase_action_value(action_values)
+
+    def metric(self, field: str) -> float:
+        """Value of a metric condition field, like calculate_metric_from_insights(insights, field) (0 for unknown fields)"""
+        if field in _NORMALIZED_METRICS:
+            return getattr(self, field)
+        return 0
+
+
+_NORMALIZED_METRICS = {
+    "spend", "cpp", "conversions", "purchase_count", "purchase_value", "ctr", "cpc", "cpm", "roas", "media_margin_volume",
+}
+
+
+def normalize_insights(insights: Dict) -> InsightsMetrics:
+    """
+    Derive every metric from one item's insights in a single pass.
+
+    spend and the other numeric fields are parsed once and the actions / action_values /
+    cost_per_action_type lists are scanned once, instead of once per condition and special value.
+    Values equal what calculate_metric_from_insights returns for each field.
 
     Args:
-        item: The item (ad, adset, or campaign) to evaluate
-        insights: Insights data for the item
-        condition: The condition to evaluate
+        insights: Insights data from Facebook API (may be empty)
+
+    Returns:
+        InsightsMetrics for the item
+    """
+    insights = insights or {}
+    purchase_counts = _pick_canonical_purchase_action_value(insights.get("actions", []), _PREFERRED_PURCHASE_TYPES)
+    purchase_values = _pick_canonical_purchase_action_value(insights.get("action_values", []), _PREFERRED_PURCHASE_TYPES)
+    details_spend = safe_float_any(insights.get("spend"), 0.0)
+    if not insights:
+        return InsightsMetrics(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, details_spend, purchase_counts, purchase_values)
+
+    spend = _safe_float(insights.get("spend"), 0)
+    purchase_count = purchase_counts[0]
+    purchase_value = purchase_values[0]
+
+    cpp = _reported_cost_per_purchase(insights)
+    if cpp is None:
+        cpp = spend / purchase_count if purchase_count > 0 else 0
+
+    conversions = 0
+    for action in insights.get("actions", []) or []:
+        if isinstance(action, dict) and action.get("action_type") in ["purchase", "complete_registration", "lead"]:
+            conversions += _safe_float(action.get("value"), 0)
+
+    ctr_value = insights.get("ctr")
+    ctr = _safe_float(str(ctr_value).replace("%", ""), 0) if ctr_value else 0
+
+    roas = 0
+    if spend != 0 and purchase_value > 0:
+        roas = purchase_value / spend
+
+    return InsightsMetrics(
+        spend=spend,
+        cpp=cpp,
+        conversions=conversions,
+        purchase_count=purchase_count,
+        purchase_value=purchase_value,
+        ctr=ctr,
+        cpc=_safe_float(insights.get("cpc"), 0),
+        cpm=_safe_float(insights.get("cpm"), 0),
+        roas=roas,
+        media_margin_volume=purchase_value - spend,
+        details_spend=details_spend,
+        purchase_counts=purchase_counts,
+        purchase_values=purchase_values,
+    )
+
+
+def get_campaign_status(item: Dict, campaign_status_cache: Dict[str, str] = None) -> Any:
+    """Return the status of an ad's or ad set's campaign, or None if it is not known
+
+    Args:
+        item: The ad or ad set, fetched with campaign{status,effective_status} (see field_planner)
         campaign_status_cache: Optional dict mapping campaign_id to campaign status
     """
-    field = condition.get("field")
-    operator = condition.get("operator")
-    expected_raw = condition.get("value")
-    expected_value = expected_raw
-
-    # Support structured expected values, e.g. { "base": "__daily_budget__", "mul": 1.2, "add": 0 }
-    # This lets the UI express comparisons like DailyBudget * 1.2 without adding many special tokens.
-    def _resolve_special_value_token(token: str) -> float:
-        if token == "__daily_budget__":
-            return float(item.get("daily_budget", 0)) / 100
-        if token == "__lifetime_budget__":
-            return float(item.get("lifetime_budget", 0)) / 100
-        if token == "__current_spend__":
-            return calculate_metric_from_insights(insights, "spend")
-        logger.warning(f"Unknown special value: {token}")
-        return 0
+    campaign = item.get("campaign")
+    if isinstance(campaign, dict):
+        status = campaign.get("status") or campaign.get("effective_status")
+        if status:
+            return status
+    campaign_id = item.get("campaign_id")
+    if campaign_id and campaign_status_cache:
+        return campaign_status_cache.get(str(campaign_id))
+    return None
+
+
+# Operator functions for compiled conditions. Budgets compare exactly; metrics and counts treat
+# values within 0.01 as equal (float comparison); status fields compare as strings.
+_EXACT_OPERATORS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "=": operator.eq,
+    "!=": operator.ne,
+}
+_TOLERANT_OPERATORS: Dict[str, Callable[[float, float], bool]] = dict(
+    _EXACT_OPERATORS,
+    **{
+        "=": lambda actual, expected: abs(actual - expected) < 0.01,
+        "!=": lambda actual, expected: abs(actual - expected) >= 0.01,
+    },
+)
+_STATUS_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": lambda actual, expected: str(actual) == str(expected),
+    "!=": lambda actual, expected: str(actual) != str(expected),
+}
+_NAME_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    "=": lambda actual, expected: str(expected).lower() in actual.lower(),
+    "!=": lambda actual, expected: str(expected).lower() not in actual.lower(),
+}
+
+# Purchase action types in the order media_margin_volume picks them (first one present wins)
+_PREFERRED_PURCHASE_TYPES = [
+    "omni_purchase",
+    "purchase",
+    "offsite_conversion.fb_pixel_purchase",
+    "onsite_web_purchase",
+    "onsite_web_app_purchase",
+    "web_in_store_purchase",
+    "web_app_in_store_purchase",
+]
+
+# A compiled condition: (item, insights, campaign_status_cache=None, metrics=None) -> (passed, evaluation)
+CompiledCondition = Callable[..., Tuple[bool, Dict]]
+
+
+def is_special_value_token(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith("__") and value.endswith("__")
+
+
+def _resolve_special_value_token(token: str, item: Dict, insights: Dict, metrics: Optional[InsightsMetrics] = None) -> float:
+    if token == "__daily_budget__":
+        return float(item.get("daily_budget", 0)) / 100
+    if token == "__lifetime_budget__":
+        return float(item.get("lifetime_budget", 0)) / 100
+    if token == "__current_spend__":
+        return metrics.spend if metrics is not None else calculate_metric_from_insights(insights, "spend")
+    logger.warning(f"Unknown special value: {token}")
+    return 0
 
-    if isinstance(expected_value, dict) and "base" in expected_value:
-        base = expected_value.get("base")
-        mul = expected_value.get("mul", 1)
-        add = expected_value.get("add", 0)
 
-        try:
-            mul_f = float(mul) if mul is not None and mul != "" else 1.0
-        except (ValueError, TypeError):
-            mul_f = 1.0
+def parse_value_scale(expected_raw: Dict) -> Tuple[float, float]:
+    """(multiplier, offset) of a structured value; missing or malformed parts default to 1 and 0"""
+    mul = expected_raw.get("mul", 1)
+    add = expected_raw.get("add", 0)
 
-        try:
-            add_f = float(add) if add is not None and add != "" else 0.0
-        except (ValueError, TypeError):
-            add_f = 0.0
+    try:
+        mul_f = float(mul) if mul is not None and mul != "" else 1.0
+    except (ValueError, TypeError):
+        mul_f = 1.0
 
-        base_val = 0.0
-        if isinstance(base, str) and base.startswith("__") and base.endswith("__"):
-            base_val = _resolve_special_value_token(base)
-        else:
-            try:
-                base_val = float(base) if base is not None and base != "" else 0.0
-            except (ValueError, TypeError):
-                base_val = 0.0
+    try:
+        add_f = float(add) if add is not None and add != "" else 0.0
+    except (ValueError, TypeError):
+        add_f = 0.0
+
+    return mul_f, add_f
+
+
+def _compile_expected_value(expected_raw: Any) -> Tuple[Callable[[Dict, Dict, Optional[InsightsMetrics]], Any], bool]:
+    """
+    Turn a condition value into a function (item, insights, metrics) -> expected value.
+
+    Supports structured values, e.g. { "base": "__daily_budget__", "mul": 1.2, "add": 0 }, which let
+    the UI express comparisons like DailyBudget * 1.2 without adding many special tokens, and
+    special tokens (__daily_budget__, __lifetime_budget__, __current_spend__). Multipliers, offsets
+    and plain values are parsed here, once per rule run.
+
+    Returns:
+        (resolver, True if the value is the same for every item)
+    """
+    if isinstance(expected_raw, dict) and "base" in expected_raw:
+        base = expected_raw.get("base")
+        mul_f, add_f = parse_value_scale(expected_raw)
+
+        if is_special_value_token(base):
+            return lambda item, insights, metrics: (_resolve_special_value_token(base, item, insights, metrics) * mul_f) + add_f, False
 
+        try:
+            base_val = float(base) if base is not None and base != "" else 0.0
+        except (ValueError, TypeError):
+            base_val = 0.0
         expected_value = (base_val * mul_f) + add_f
+        return lambda item, insights, metrics: expected_value, True
 
     # Handle special values (shortcodes like __daily_budget__)
-    if isinstance(expected_value, str) and expected_value.startswith("__") and expected_value.endswith("__"):
-        if expected_value == "__daily_budget__":
-            # Get daily budget from item (in cents, convert to dollars)
-            expected_value = float(item.get("daily_budget", 0)) / 100
-            logger.debug(f"Special value __daily_budget__ resolved to: ${expected_value:.2f}")
-        elif expected_value == "__lifetime_budget__":
-            # Get lifetime budget from item (in cents, convert to dollars)
-            expected_value = float(item.get("lifetime_budget", 0)) / 100
-            logger.debug(f"Special value __lifetime_budget__ resolved to: ${expected_value:.2f}")
-        elif expected_value == "__current_spend__":
-            # Get current spend from insights
-            expected_value = calculate_metric_from_insights(insights, "spend")
-            logger.debug(f"Special value __current_spend__ resolved to: ${expected_value:.2f}")
-        else:
+    if is_special_value_token(expected_raw):
+        if expected_raw in ("__daily_budget__", "__lifetime_budget__", "__current_spend__"):
+            def resolve(item: Dict, insights: Dict, metrics: Optional[InsightsMetrics]) -> float:
+                # Budgets are in cents on the item, resolved to dollars; spend comes from insights
+                value = _resolve_special_value_token(expected_raw, item, insights, metrics)
+                logger.debug(f"Special value {expected_raw} resolved to: ${value:.2f}")
+                return value
+            return resolve, False
+
+        def resolve_unknown(item: Dict, insights: Dict, metrics: Optional[InsightsMetrics]) -> int:
             # Unknown special value, treat as 0
-            logger.warning(f"Unknown special value: {expected_value}")
-            expected_value = 0
-
-    # Build a human-friendly expected expression (as configured)
-    def _format_expected_expression(raw_val) -> str:
-        try:
-            if isinstance(raw_val, dict) and "base" in raw_val:
-                base = raw_val.get("base")
-                mul = raw_val.get("mul", 1)
-                add = raw_val.get("add", 0)
-
-                parts = [str(base)]
-                if mul is not None and mul != "" and float(mul) != 1.0:
-                    parts.append(f"× {mul}")
-                if add is not None and add != "" and float(add) != 0.0:
-                    sign = "+" if float(add) >= 0 else "-"
-                    parts.append(f"{sign} {abs(float(add))}")
-                return " ".join(parts)
-
-            if isinstance(raw_val, str):
-                return raw_val
-
-            # numeric or other types
-            return str(raw_val)
-        except Exception:
-            return str(raw_val)
-
-    evaluation = {
-        "field": field,
-        "operator": operator,
-        "expected_expression": _format_expected_expression(expected_raw),
-        "expected_value": expected_value,
-        "actual_value": None,
-        "passed": False
+            logger.warning(f"Unknown special value: {expected_raw}")
+            return 0
+        return resolve_unknown, False
+
+    return lambda item, insights, metrics: expected_raw, True
+
+
+def _format_expected_expression(raw_val: Any) -> str:
+    """Build a human-friendly expected expression (as configured)"""
+    try:
+        if isinstance(raw_val, dict) and "base" in raw_val:
+            base = raw_val.get("base")
+            mul = raw_val.get("mul", 1)
+            add = raw_val.get("add", 0)
+
+            parts = [str(base)]
+            if mul is not None and mul != "" and float(mul) != 1.0:
+                parts.append(f"× {mul}")
+            if add is not None and add != "" and float(add) != 0.0:
+                sign = "+" if float(add) >= 0 else "-"
+                parts.append(f"{sign} {abs(float(add))}")
+            return " ".join(parts)
+
+        if isinstance(raw_val, str):
+            return raw_val
+
+        # numeric or other types
+        return str(raw_val)
+    except Exception:
+        return str(raw_val)
+
+
+def _media_margin_volume_details(metrics: InsightsMetrics) -> Tuple[float, Dict]:
+    """Media Margin Volume with the calculation details attached to its evaluation for debugging"""
+    spend = metrics.details_spend
+
+    # Canonical purchase types (avoid double counting)
+    purchase_count, purchase_count_type, purchase_count_by_type = metrics.purchase_counts
+    purchase_value, purchase_value_type, purchase_value_by_type = metrics.purchase_values
+
+    purchase_value_source = "action_values" if purchase_value > 0 else "none"
+    cpp = metrics.cpp
+    aov = (purchase_value / purchase_count) if purchase_count > 0 else None
+
+    # Match the simplified backend definition: MMV = purchase_value - spend
+    mmv = purchase_value - spend
+
+    return mmv, {
+        "metric": "media_margin_volume",
+        "formula": "purchase_value - spend  (equivalent to (AOV - CPP) × Purchases when CPP=spend/purchases and AOV=value/purchases)",
+        "purchase_value": purchase_value,
+        "purchase_value_source": purchase_value_source,
+        "spend": spend,
+        "purchase_count": purchase_count,
+        "purchase_count_action_type_used": purchase_count_type,
+        "purchase_count_by_action_type": purchase_count_by_type,
+        "purchase_value_action_type_used": purchase_value_type,
+        "purchase_value_by_action_type": purchase_value_by_type,
+        "aov": aov,
+        "cpp": cpp,
+        "result": mmv,
+        "note": (
+            "If purchase_value is 0, verify Insights returns action_values for the selected time range/attribution."
+        ),
     }
 
+
+def compile_condition(condition: Dict) -> CompiledCondition:
+    """Compile a condition into a reusable predicate
+
+    Everything that does not depend on the item (the evaluation branch for the field, the
+    operator function, multipliers, offsets and numeric values, the expected expression shown in
+    logs) is resolved once here, so a rule run compiles its conditions once and applies them to
+    every item. The predicate returns exactly what evaluate_condition() returns.
+
+    Args:
+        condition: The condition to compile
+
+    Returns:
+        Function (item, insights, campaign_status_cache=None, metrics=None) -> (passed, evaluation), see
+        evaluate_condition. `metrics` is normalize_insights(insights) when the caller has it already;
+        otherwise metric conditions normalize the insights themselves
+    """
+    field = condition.get("field")
+    operator_name = condition.get("operator")
+    expected_raw = condition.get("value")
+    resolve_expected, is_constant = _compile_expected_value(expected_raw)
+    expected_expression = _format_expected_expression(expected_raw)
+
     # Include threshold for CPP Winning Days
-    if field == "cpp_winning_days" and condition.get("threshold") is not None:
-        evaluation["threshold"] = condition.get("threshold")
+    threshold = condition.get("threshold") if field == "cpp_winning_days" else None
+
+    # Numeric comparisons convert the expected value with float(); for constant values that is
+    # done once, unless it fails, in which case each evaluation raises as before
+    to_number: Callable[[Any], float] = float
+    if is_constant:
+        try:
+            constant_number = float(resolve_expected({}, {}, None))
+            to_number = lambda expected_value: constant_number
+        except (ValueError, TypeError):
+            pass
 
     # Handle status field (from object data)
     if field == "status":
-        actual_value = item.get("status") or item.get("effective_status")
-        evaluation["actual_value"] = actual_value
-        if operator == "=":
-            evaluation["passed"] = str(actual_value) == str(expected_value)
-        elif operator == "!=":
-            evaluation["passed"] = str(actual_value) != str(expected_value)
-
-    # Handle campaign_status field (from campaign data)
+        compare = _STATUS_OPERATORS.get(operator_name)
+
+        def check(item: Dict, insights: Dict, metrics: Optional[InsightsMetrics], expected_value: Any, evaluation: Dict, campaign_status_cache: Dict[str, str]):
+            actual_value = item.get("status") or item.get("effective_status")
+            evaluation["actual_value"] = actual_value
+            if compare:
+                evaluation["passed"] = compare(actual_value, expected_value)
+
+    # Handle campaign_status field (from the campaign{status,effective_status} expansion on the item)
     elif field == "campaign_status":
-        campaign_id = item.get("campaign_id")
-        if campaign_id and campaign_status_cache:
-            actual_value = campaign_status_cache.get(str(campaign_id))
+        compare = _STATUS_OPERATORS.get(operator_name)
+
+        def check(item: Dict, insights: Dict, metrics: Optional[InsightsMetrics], expected_value: Any, evaluation: Dict, campaign_status_cache: Dict[str, str]):
+            actual_value = get_campaign_status(item, campaign_status_cache)
             evaluation["actual_value"] = actual_value
-            if actual_value is not None:
-                if operator == "=":
-                    evaluation["passed"] = str(actual_value) == str(expected_value)
-                elif operator == "!=":
-                    evaluation["passed"] = str(actual_value) != str(expected_value)
-            else:
-                # Campaign status not found in cache, condition fails
-                evaluation["passed"] = False
-        else:
-            # No campaign_id or no cache available, condition fails
-            evaluation["actual_value"] = None
-            evaluation["passed"] = False
+            # No campaign status on the item (or in the cache), condition fails
+            if actual_value is not None and compare:
+                evaluation["passed"] = compare(actual_value, expected_value)
 
     # Handle name_contains field (from object data)
     elif field == "name_contains":
-        actual_value = item.get("name", "")
-        evaluation["actual_value"] = actual_value
-        if operator == "=":
-            evaluation["passed"] = str(expected_value).lower() in actual_value.lower()
-        elif operator == "!=":
-            evaluation["passed"] = str(expected_value).lower() not in actual_value.lower()
+        compare = _NAME_OPERATORS.get(operator_name)
+
+        def check(item: Dict, insights: Dict, metrics: Optional[InsightsMetrics], expected_value: Any, evaluation: Dict, campaign_status_cache: Dict[str, str]):
+            actual_value = item.get("name", "")
+            evaluation["actual_value"] = actual_value
+            if compare:
+                evaluation["passed"] = compare(actual_value, expected_value)
 
     # Handle daily_budget (from object data)
     elif field == "daily_budget":
-        actual_value = item.get("daily_budget")
-        if actual_value is not None:
+        compare = _EXACT_OPERATORS.get(operator_name)
+
+        def check(item: Dict, insights: Dict, metrics: Optional[InsightsMetrics], expected_value: Any, evaluation: Dict, campaign_status_cache: Dict[str, str]):
+            actual_value = item.get("daily_budget")
+            if actual_value is None:
+                return
             actual_value = float(actual_value) / 100  # Convert cents to dollars
             evaluation["actual_value"] = actual_value  # Store converted value (in dollars) for display
-            expected_value = float(expected_value)
-            if operator == ">":
-                evaluation["passed"] = actual_value > expected_value
-            elif operator == ">=":
-                evaluation["passed"] = actual_value >= expected_value
-            elif operator == "<":
-                evaluation["passed"] = actual_value < expected_value
-            elif operator == "<=":
-                evaluation["passed"] = actual_value <= expected_value
-            elif operator == "=":
-                evaluation["passed"] = actual_value == expected_value
-            elif operator == "!=":
-                evaluation["passed"] = actual_value != expected_value
-        else:
-            evaluation["actual_value"] = None
-
-    # Handle cpp_winning_days (calculated from daily insights in service.py)
-    elif field == "cpp_winning_days":
-        # This is calculated in service.py and added to insights as "cpp_winning_days"
-        actual_value = insights.get("cpp_winning_days", 0)
-        if actual_value is None:
-            actual_value = 0
-
-        evaluation["actual_value"] = actual_value
-
-    # Handle amount_of_active_ads (calculated in service.py)
-    elif field == "amount_of_active_ads":
-        # This is calculated in service.py and added to insights as "amount_of_active_ads"
-        actual_value = insights.get("amount_of_active_ads", 0)
-        if actual_value is None:
-            actual_value = 0
-
-        evaluation["actual_value"] = actual_value
-
-        # Compare active ads count with expected value
-        if actual_value is not None:
-            expected_value = float(expected_value)
-            if operator == ">":
-                evaluation["passed"] = actual_value > expected_value
-            elif operator == ">=":
-                evaluation["passed"] = actual_value >= expected_value
-            elif operator == "<":
-                evaluation["passed"] = actual_value < expected_value
-            elif operator == "<=":
-                evaluation["passed"] = actual_value <= expected_value
-            elif operator == "=":
-                evaluation["passed"] = abs(actual_value - expected_value) < 0.01  # Float comparison
-            elif operator == "!=":
-                evaluation["passed"] = abs(actual_value - expected_value) >= 0.01
-        else:
-            evaluation["passed"] = False
+            expected_number = to_number(expected_value)
+            if compare:
+                evaluation["passed"] = compare(actual_value, expected_number)
+
+    # Handle cpp_winning_days and amount_of_active_ads (calculated in service.py and added to insights)
+    elif field in ("cpp_winning_days", "amount_of_active_ads"):
+        compare = _TOLERANT_OPERATORS.get(operator_name) if field == "amount_of_active_ads" else None
+
+        def check(item: Dict, insights: Dict, metrics: Optional[InsightsMetrics], expected_value: Any, evaluation: Dict, campaign_status_cache: Dict[str, str]):
+            actual_value = insights.get(field, 0)
+            if actual_value is None:
+                actual_value = 0
+            evaluation["actual_value"] = actual_value
+            if field == "amount_of_active_ads":
+                # Compare active ads count with expected value
+                expected_number = to_number(expected_value)
+                if compare:
+                    evaluation["passed"] = compare(actual_value, expected_number)
 
-        return evaluation["passed"], evaluation
+    # Handle metrics from insights
+    else:
+        compare = _TOLERANT_OPERATORS.get(operator_name)
 
-        # Compare winning days count with expected value
-        if actual_value is not None:
-            expected_value = float(expected_value)
-            if operator == ">":
-                evaluation["passed"] = actual_value > expected_value
-            elif operator == ">=":
-                evaluation["passed"] = actual_value >= expected_value
-            elif operator == "<":
-                evaluation["passed"] = actual_value < expected_value
-            elif operator == "<=":
-                evaluation["passed"] = actual_value <= expected_value
-            elif operator == "=":
-                evaluation["passed"] = abs(actual_value - expected_value) < 0.01  # Float comparison
-            elif operator == "!=":
-                evaluation["passed"] = abs(actual_value - expected_value) >= 0.01
-        else:
-            evaluation["passed"] = False
+        def check(item: Dict, insights: Dict, metrics: Optional[InsightsMetrics], expected_value: Any, evaluation: Dict, campaign_status_cache: Dict[str, str]):
+            if metrics is None:
+                metrics = normalize_insights(insights)
+            actual_value = metrics.metric(field)
+
+            # Attach detailed calculation for debugging Media Margin Volume
+            if field == "media_margin_volume":
+                actual_value, evaluation["calculation_details"] = _media_margin_volume_details(metrics)
+
+            evaluation["actual_value"] = actual_value
 
+            # Log for debugging when actual_value is 0 or None
+            if actual_value == 0 or actual_value is None:
+                logger.debug(f"Field '{field}' evaluation - actual_value: {actual_value}, insights keys: {list(insights.keys()) if insights else 'empty'}")
+                if insights:
+                    logger.debug(f"Insights data for field '{field}': spend={insights.get('spend')}, impressions={insights.get('impressions')}, clicks={insights.get('clicks')}, actions={insights.get('actions')}")
+
+            if actual_value is not None:
+                expected_number = to_number(expected_value)
+                if compare:
+                    evaluation["passed"] = compare(actual_value, expected_number)
+
+    def evaluate(item: Dict, insights: Dict, campaign_status_cache: Dict[str, str] = None, metrics: InsightsMetrics = None) -> Tuple[bool, Dict]:
+        expected_value = resolve_expected(item, insights, metrics)
+        evaluation = {
+            "field": field,
+            "operator": operator_name,
+            "expected_expression": expected_expression,
+            "expected_value": expected_value,
+            "actual_value": None,
+            "passed": False
+        }
+        if threshold is not None:
+            evaluation["threshold"] = threshold
+        check(item, insights, metrics, expected_value, evaluation, campaign_status_cache)
         return evaluation["passed"], evaluation
 
-    # Handle metrics from insights
-    else:
-        actual_value = calculate_metric_from_insights(insights, field)
-
-        # Attach detailed calculation for debugging Media Margin Volume
-        if field == "media_margin_volume":
-            spend = _safe_float_any(insights.get("spend"), 0.0)
-
-            # Canonical purchase types (avoid double counting)
-            actions = insights.get("actions", [])
-            action_values = insights.get("action_values", [])
-            preferred = [
-                "omni_purchase",
-                "purchase",
-                "offsite_conversion.fb_pixel_purchase",
-                "onsite_web_purchase",
-                "onsite_web_app_purchase",
-                "web_in_store_purchase",
-                "web_app_in_store_purchase",
-            ]
-            purchase_count, purchase_count_type, purchase_count_by_type = _pick_canonical_purchase_action_value(
-                actions, preferred
-            )
-            purchase_value, purchase_value_type, purchase_value_by_type = _pick_canonical_purchase_action_value(
-                action_values, preferred
-            )
-
-            purchase_value_source = "action_values" if purchase_value > 0 else "none"
-            cpp = calculate_metric_from_insights(insights, "cpp")
-            aov = (purchase_value / purchase_count) if purchase_count > 0 else None
-
-            # Match the simplified backend definition: MMV = purchase_value - spend
-            mmv = purchase_value - spend
-            actual_value = mmv
-
-            evaluation["calculation_details"] = {
-                "metric": "media_margin_volume",
-                "formula": "purchase_value - spend  (equivalent to (AOV - CPP) × Purchases when CPP=spend/purchases and AOV=value/purchases)",
-                "purchase_value": purchase_value,
-                "purchase_value_source": purchase_value_source,
-                "spend": spend,
-                "purchase_count": purchase_count,
-                "purchase_count_action_type_used": purchase_count_type,
-                "purchase_count_by_action_type": purchase_count_by_type,
-                "purchase_value_action_type_used": purchase_value_type,
-                "purchase_value_by_action_type": purchase_value_by_type,
-                "aov": aov,
-                "cpp": cpp,
-                "result": mmv,
-                "note": (
-                    "If purchase_value is 0, verify Insights returns action_values for the selected time range/attribution."
-                ),
-            }
-
-        evaluation["actual_value"] = actual_value
-
-        # Log for debugging when actual_value is 0 or None
-        if actual_value == 0 or actual_value is None:
-            logger.debug(f"Field '{field}' evaluation - actual_value: {actual_value}, insights keys: {list(insights.keys()) if insights else 'empty'}")
-            if insights:
-                logger.debug(f"Insights data for field '{field}': spend={insights.get('spend')}, impressions={insights.get('impressions')}, clicks={insights.get('clicks')}, actions={insights.get('actions')}")
-
-        if actual_value is not None:
-            expected_value = float(expected_value)
-            if operator == ">":
-                evaluation["passed"] = actual_value > expected_value
-            elif operator == ">=":
-                evaluation["passed"] = actual_value >= expected_value
-            elif operator == "<":
-                evaluation["passed"] = actual_value < expected_value
-            elif operator == "<=":
-                evaluation["passed"] = actual_value <= expected_value
-            elif operator == "=":
-                evaluation["passed"] = abs(actual_value - expected_value) < 0.01  # Float comparison
-            elif operator == "!=":
-                evaluation["passed"] = abs(actual_value - expected_value) >= 0.01
-
-    return evaluation["passed"], evaluation
+    return evaluate
+
+
+def compile_conditions(conditions: List[Dict]) -> List[CompiledCondition]:
+    """Compile a rule's conditions once per run (see compile_condition), in the same order"""
+    return [compile_condition(condition) for condition in conditions]
+
+
+def evaluate_condition(item: Dict, insights: Dict, condition: Dict, campaign_status_cache: Dict[str, str] = None) -> Tuple[bool, Dict]:
+    """Evaluate a single condition against an item
+
+    Compiles the condition on every call; loops over many items should use compile_conditions()
+    once and call the compiled predicates instead.
+
+    Args:
+        item: The item (ad, adset, or campaign) to evaluate
+        insights: Insights data for the item
+        condition: The condition to evaluate
+        campaign_status_cache: Optional dict mapping campaign_id to campaign status, used when the
+            item has no campaign expansion (entities fetched without the planned fields)
+    """
+    return compile_condition(condition)(item, insights, campaign_status_cache)
 
+
+def is_item_only_condition(condition: Dict) -> bool:
+    """Return True if a condition can be evaluated from the entity fields alone"""
+    if condition.get("field") not in ITEM_FIELD_CONDITIONS:
+        return False
+    value = condition.get("value")
+    if isinstance(value, dict):
+        value = value.get("base")
+    # __current_spend__ compares against insights
+    return value != "__current_spend__"
+
+
+def condition_cost(condition: Dict) -> int:
+    """Return the data cost of a condition: COST_ITEM_FIELDS, COST_AGGREGATE_INSIGHTS or COST_DAILY_INPUTS"""
+    if is_item_only_condition(condition):
+        return COST_ITEM_FIELDS
+    if condition.get("field") in DAILY_INPUT_CONDITIONS:
+        return COST_DAILY_INPUTS
+    return COST_AGGREGATE_INSIGHTS
+
+
+def fails_item_only_conditions(item: Dict, conditions: List[CompiledCondition]) -> bool:
+    """
+    Return True if the item fails any of the given item-only conditions.
+
+    Rule conditions are ANDed, so such an item cannot meet the rule and needs no insights.
+    Conditions that cannot be evaluated (e.g. a malformed value) are left to the full evaluation.
+
+    Args:
+        item: The item to check
+        conditions: Item-only conditions compiled with compile_conditions()
+    """
+    for condition in conditions:
+        try:
+            passed, _ = condition(item, {})
+        except (ValueError, TypeError):
+            continue
+        if not passed:
+            return True
+    return False
+
+
+def skipped_condition_evaluation(condition: Dict, reason: str) -> Dict:
+    """Build the log entry for a condition that was not evaluated because the item already failed"""
+    return {
+        "field": condition.get("field"),
+        "operator": condition.get("operator"),
+        "expected_expression": str(condition.get("value")),
+        "expected_value": condition.get("value"),
+        "actual_value": None,
+        "passed": False,
+        "skipped": True,
+        "skip_reason": reason,
+    }
@@ -0,0 +1,271 @@
+import json
+import logging
+import time
+from typing import Dict, List, Any, Iterator, Optional, Set
+from redis.exceptions import RedisError
+from app.jobs.queues import redis_conn
+from app.features.meta_campaigns.facebook_api_client import iter_facebook_data_pages
+from app.features.meta_campaigns.field_planner import split_fields
+
+logger = logging.getLogger(__name__)
+
+# Fields stored per level: a superset of what rule runs (field_planner.plan_entity_fields), scope
+# filters and the browse endpoints read, plus updated_time for incremental refreshes
+SNAPSHOT_FIELDS = {
+    "campaign": "id,name,status,effective_status,updated_time",
+    "ad_set": "id,name,campaign_id,status,effective_status,daily_budget,lifetime_budget,updated_time,campaign{status,effective_status}",
+    "ad": "id,name,adset_id,campaign_id,status,effective_status,updated_time,campaign{status,effective_status}",
+}
+
+# Parent levels whose changes alter a level's inherited fields (effective_status, the campaign expansion)
+# without touching the child's own updated_time: (level, filtering field on the child)
+PARENT_LEVELS = {
+    "campaign": [],
+    "ad_set": [("campaign", "campaign.id")],
+    "ad": [("campaign", "campaign.id"), ("ad_set", "adset.id")],
+}
+
+# Items with these statuses are left out, like the live fetch does
+EXCLUDED_STATUSES = {"ARCHIVED", "DELETED"}
+
+SNAPSHOT_KEY_PREFIX = "meta:snapshot"
+# Reload everything this often, as a safety net for changes updated_time does not reflect
+SNAPSHOT_FULL_REFRESH_SECONDS = 6 * 3600
+# Re-fetch changes from slightly before the last sync to tolerate clock skew
+SNAPSHOT_SYNC_OVERLAP_SECONDS = 300
+# Runs within this many seconds of the last sync reuse the snapshot without any request
+SNAPSHOT_MIN_SYNC_INTERVAL = 60
+# Snapshots of accounts no rule reads any more expire
+SNAPSHOT_TTL_SECONDS = 7 * 24 * 3600
+# More changed parents than this make a full reload cheaper than re-fetching their children
+MAX_PARENT_REFRESH = 500
+# Parent IDs per filtering IN clause when re-fetching children
+PARENT_FILTER_CHUNK = 50
+# Max seconds one sync may hold (or wait for) the per-account lock
+SYNC_LOCK_TIMEOUT = 600
+# Items per page yielded by iter_entity_pages
+SNAPSHOT_PAGE_SIZE = 2000
+
+
+def _account_key(account_id: str) -> str:
+    return str(account_id).replace("act_", "")
+
+
+def _items_key(account_id: str, level: str) -> str:
+    return f"{SNAPSHOT_KEY_PREFIX}:{_account_key(account_id)}:{level}"
+
+
+def _meta_key(account_id: str, level: str) -> str:
+    return f"{_items_key(account_id, level)}:meta"
+
+
+def _field_names(fields: str) -> Set[str]:
+    """Top-level field names of a fields string ("campaign{status}" -> "campaign")"""
+    return {part.split("{", 1)[0] for part in split_fields(fields)}
+
+
+def covers_fields(level: str, fields: Optional[str]) -> bool:
+    """True if the snapshot of `level` stores every field in `fields` (None = the live fetch's default list)"""
+    if level not in SNAPSHOT_FIELDS:
+        return False
+    if fields is None:
+        return True
+    snapshot_parts = split_fields(SNAPSHOT_FIELDS[level])
+    snapshot_names = _field_names(SNAPSHOT_FIELDS[level])
+    # Expansions must match one stored expansion exactly; plain fields only need to be stored
+    return all(part in snapshot_parts if "{" in part else part in snapshot_names for part in split_fields(fields))
+
+
+def _fetch(account_id: str, access_token: str, level: str, **kwargs) -> List[Dict]:
+    items = []
+    for page in iter_facebook_data_pages(account_id, access_token, level, fields_override=SNAPSHOT_FIELDS[level], **kwargs):
+        items.extend(page)
+    return items
+
+
+def _read_meta(account_id: str, level: str) -> Dict[str, float]:
+    raw = redis_conn.hgetall(_meta_key(account_id, level))
+    return {key.decode(): float(value) for key, value in raw.items()}
+
+
+def _write_items(pipe, key: str, items: List[Dict]):
+    """Queue upserts and evictions of `items` on a pipeline"""
+    upserts = {}
+    evictions = []
+    for item in items:
+        item_id = item.get("id")
+        if not item_id:
+            continue
+        if item.get("effective_status") in EXCLUDED_STATUSES:
+            evictions.append(item_id)
+        else:
+            upserts[item_id] = json.dumps(item, separators=(",", ":"))
+    if upserts:
+        pipe.hset(key, mapping=upserts)
+    if evictions:
+        pipe.hdel(key, *evictions)
+    return len(upserts), len(evictions)
+
+
+def _full_load(account_id: str, access_token: str, level: str, sync_started: float):
+    items = _fetch(account_id, access_token, level)
+    key = _items_key(account_id, level)
+    temp_key = f"{key}:loading"
+    pipe = redis_conn.pipeline()
+    pipe.delete(temp_key)
+    stored, _ = _write_items(pipe, temp_key, items)
+    if stored:
+        pipe.rename(temp_key, key)
+    else:
+        pipe.delete(key)
+    pipe.expire(key, SNAPSHOT_TTL_SECONDS)
+    pipe.hset(_meta_key(account_id, level), mapping={"last_sync": sync_started, "last_full": sync_started})
+    pipe.expire(_meta_key(account_id, level), SNAPSHOT_TTL_SECONDS)
+    pipe.execute()
+    logger.info(f"[SNAPSHOT] Full load of {level} for account {account_id}: {len(items)} items")
+
+
+def _delta_sync(account_id: str, access_token: str, level: str, since: int, sync_started: float) -> bool:
+    """
+    Merge items changed since `since` into the snapshot.
+
+    Returns:
+        False if so many parents changed that a full load is cheaper (nothing is written then)
+    """
+    updated_filter = [{"field": "updated_time", "operator": "GREATER_THAN", "value": since}]
+    changed = _fetch(account_id, access_token, level, include_archived=True, extra_filters=updated_filter)
+
+    # Children inherit effective_status (and the campaign expansion) from their parents
+    changed_parents = []
+    for parent_level, filter_field in PARENT_LEVELS[level]:
+        parent_ids = [
+            item["id"]
+            for page in iter_facebook_data_pages(account_id, access_token, parent_level, fields_override="id", include_archived=True, extra_filters=updated_filter)
+            for item in page
+        ]
+        changed_parents.append((filter_field, parent_ids))
+    parent_count = sum(len(parent_ids) for _, parent_ids in changed_parents)
+    if parent_count > MAX_PARENT_REFRESH:
+        logger.info(f"[SNAPSHOT] {parent_count} parents of {level} changed for account {account_id}, reloading instead of refreshing their children")
+        return False
+
+    for filter_field, parent_ids in changed_parents:
+        for start in range(0, len(parent_ids), PARENT_FILTER_CHUNK):
+            parent_filter = [{"field": filter_field, "operator": "IN", "value": parent_ids[start:start + PARENT_FILTER_CHUNK]}]
+            changed.extend(_fetch(account_id, access_token, level, include_archived=True, extra_filters=parent_filter))
+
+    key = _items_key(account_id, level)
+    pipe = redis_conn.pipeline()
+    upserted, evicted = _write_items(pipe, key, changed)
+    pipe.expire(key, SNAPSHOT_TTL_SECONDS)
+    pipe.hset(_meta_key(account_id, level), "last_sync", sync_started)
+    pipe.expire(_meta_key(account_id, level), SNAPSHOT_TTL_SECONDS)
+    pipe.execute()
+    logger.info(
+        f"[SNAPSHOT] Delta sync of {level} for account {account_id}: {upserted} updated, {evicted} removed "
+        f"({parent_count} changed parent(s)) in {time.time() - sync_started:.2f}s"
+    )
+    return True
+
+
+def sync_snapshot(account_id: str, access_token: str, level: str, load_if_missing: bool = True) -> bool:
+    """
+    Bring the snapshot of one level up to date.
+
+    A missing (or SNAPSHOT_FULL_REFRESH_SECONDS old) snapshot is loaded in full; otherwise only
+    items with updated_time after the last sync, and the children of changed parents, are fetched
+    and merged. Syncs of the same account and level are serialized with a Redis lock, so rules
+    running together share one refresh.
+
+    Args:
+        account_id: Meta Ad Account ID
+        access_token: Meta Access Token
+        level: "campaign", "ad_set", or "ad"
+        load_if_missing: If False, a missing snapshot is not loaded (returns False)
+
+    Returns:
+        True if a snapshot is available
+
+    Raises:
+        redis.exceptions.RedisError: Redis unavailable
+        requests.exceptions.RequestException: Graph API errors
+    """
+    with redis_conn.lock(f"{_items_key(account_id, level)}:lock", timeout=SYNC_LOCK_TIMEOUT, blocking_timeout=SYNC_LOCK_TIMEOUT):
+        meta = _read_meta(account_id, level)
+        now = time.time()
+        last_sync = meta.get("last_sync")
+        if last_sync and now - last_sync < SNAPSHOT_MIN_SYNC_INTERVAL:
+            return True
+        if not last_sync and not load_if_missing:
+            return False
+        if last_sync and now - meta.get("last_full", 0) < SNAPSHOT_FULL_REFRESH_SECONDS:
+            if _delta_sync(account_id, access_token, level, int(last_sync - SNAPSHOT_SYNC_OVERLAP_SECONDS), now):
+                return True
+        _full_load(account_id, access_token, level, now)
+        return True
+
+
+def get_snapshot_entities(account_id: str, access_token: str, level: str, load_if_missing: bool = True) -> Optional[List[Dict]]:
+    """
+    Return all non-archived, non-deleted items of a level from the synced snapshot.
+
+    Returns:
+        List of items, or None if no snapshot is available (Redis down, or missing and load_if_missing=False)
+
+    Raises:
+        requests.exceptions.RequestException: Graph API errors while syncing
+    """
+    try:
+        if not sync_snapshot(account_id, access_token, level, load_if_missing=load_if_missing):
+            return None
+        raw_items = redis_conn.hvals(_items_key(account_id, level))
+    except RedisError as e:
+        logger.warning(f"[SNAPSHOT] Redis unavailable ({e}), fetching {level} for account {account_id} live")
+        return None
+    return [json.loads(raw) for raw in raw_items]
+
+
+def _project(item: Dict, field_names: Set[str]) -> Dict:
+    return {key: value for key, value in item.items() if key in field_names}
+
+
+def iter_entity_pages(
+    account_id: str,
+    access_token: str,
+    rule_level: str,
+    scope_filters: Dict[str, Any] = None,
+    effective_status_in: List[str] | None = None,
+    fields_override: str = None,
+) -> Iterator[List[Dict]]:
+    """
+    Drop-in replacement for iter_facebook_data_pages() that reads from the entity snapshot.
+
+    The API-level filters of the live fetch (effective_status IN, campaign_ids) are applied
+    locally and items are projected to the requested fields, so callers see the same pages.
+    Falls back to the live fetch if the snapshot cannot hold the requested fields or Redis is down.
+    """
+    if not covers_fields(rule_level, fields_override):
+        logger.info(f"[SNAPSHOT] {rule_level} snapshot does not store all of {fields_override}, fetching live")
+        yield from iter_facebook_data_pages(account_id, access_token, rule_level, scope_filters=scope_filters, effective_status_in=effective_status_in, fields_override=fields_override)
+        return
+
+    items = get_snapshot_entities(account_id, access_token, rule_level)
+    if items is None:
+        yield from iter_facebook_data_pages(account_id, access_token, rule_level, scope_filters=scope_filters, effective_status_in=effective_status_in, fields_override=fields_override)
+        return
+
+    if effective_status_in:
+        statuses = set(effective_status_in)
+        items = [item for item in items if item.get("effective_status") in statuses]
+    campaign_ids = (scope_filters or {}).get("campaign_ids")
+    if campaign_ids:
+        if isinstance(campaign_ids, str):
+            campaign_ids = [id_val.strip() for id_val in campaign_ids.replace("\n", ",").split(",") if id_val.strip()]
+        campaign_id_set = {str(id_val) for id_val in campaign_ids}
+        campaign_field = "id" if rule_level == "campaign" else "campaign_id"
+        items = [item for item in items if str(item.get(campaign_field)) in campaign_id_set]
+
+    field_names = _field_names(fields_override or SNAPSHOT_FIELDS[rule_level])
+    logger.info(f"[SNAPSHOT] Serving {len(items)} {rule_level} items for account {account_id} from the snapshot")
+    for start in range(0, len(items), SNAPSHOT_PAGE_SIZE):
+        yield [_project(item, field_names) for item in items[start:start + SNAPSHOT_PAGE_SIZE]]
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from redis.exceptions import RedisError
+from app.jobs.queues import redis_conn
+
+logger = logging.getLogger(__name__)
+
+# Redis hash per rule: {item_id: "<input digest>:0"} for items failing the rule, and
+# {item_id: "<input digest>:1:<evaluation record JSON>"} for items meeting it, so the next run can
+# log them without evaluating them again
+EVALUATION_CACHE_KEY_PREFIX = "meta:rule_eval"
+
+# Bump when the meaning of an evaluation changes (condition_evaluator, cpp_winning_days, ...),
+# so outcomes stored by older code are not reused
+EVALUATION_CACHE_VERSION = 1
+
+# Outcomes of rules that stop running disappear after this long (covers daily schedules)
+EVALUATION_CACHE_TTL_SECONDS = 2 * 24 * 3600
+
+
+def _rule_key(rule_id: int) -> str:
+    return f"{EVALUATION_CACHE_KEY_PREFIX}:{rule_id}"
+
+
+def rule_fingerprint(rule_level: str, time_range: Dict[str, Any], rule_conditions: List[Dict]) -> str:
+    """Stable hash of everything about a rule that affects evaluation; editing the rule changes it"""
+    payload = [EVALUATION_CACHE_VERSION, rule_level, time_range, rule_conditions]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def input_digest(fingerprint: str, inputs: Any) -> str:
+    """
+    Compact digest of one item's evaluation inputs for a rule.
+
+    Uses repr() rather than sorted JSON, which is several times faster for insights rows. Equal
+    inputs in a different key order only produce a different digest, so the item is evaluated
+    again; they never produce a false match.
+
+    Args:
+        fingerprint: rule_fingerprint() of the rule
+        inputs: Entity fields, insights, daily rows and active ad counts the rule reads for the item
+    """
+    return hashlib.blake2b(f"{fingerprint}{inputs!r}".encode(), digest_size=12).hexdigest()
+
+
+def load_outcomes(rule_id: int) -> Dict[str, Tuple[str, bool, Optional[Dict]]]:
+    """
+    Read the outcomes stored by the rule's previous run.
+
+    Returns:
+        {item_id: (input digest, all conditions met, evaluation record if met)}; empty if there are
+        none or Redis is unavailable
+    """
+    try:
+        stored = redis_conn.hgetall(_rule_key(rule_id))
+    except RedisError as e:
+        logger.debug(f"[EVALUATION CACHE] Redis unavailable ({e}), evaluating every item of rule {rule_id}")
+        return {}
+
+    outcomes = {}
+    for item_id, value in stored.items():
+        digest, passed, *record = value.decode().split(":", 2)
+        try:
+            outcomes[item_id.decode()] = (digest, passed == "1", json.loads(record[0]) if record else None)
+        except ValueError:
+            continue
+    return outcomes
+
+
+def _encode_outcome(digest: str, passed: bool, record: Optional[Dict]) -> str:
+    if passed and record is not None:
+        return f"{digest}:1:{json.dumps(record, default=str)}"
+    return f"{digest}:{int(passed)}"
+
+
+def store_outcomes(rule_id: int, outcomes: Dict[str, Tuple[str, bool, Optional[Dict]]]):
+    """
+    Replace the rule's stored outcomes with this run's, so items that left the rule's scope are dropped.
+
+    Args:
+        rule_id: Rule ID
+        outcomes: {item_id: (input digest, all conditions met, evaluation record)}; records are kept
+            only for items meeting the conditions
+    """
+    key = _rule_key(rule_id)
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.delete(key)
+        if outcomes:
+            pipe.hset(key, mapping={item_id: _encode_outcome(*outcome) for item_id, outcome in outcomes.items()})
+            pipe.expire(key, EVALUATION_CACHE_TTL_SECONDS)
+        pipe.execute()
+    except RedisError as e:
+        logger.debug(f"[EVALUATION CACHE] Could not store outcomes of rule {rule_id} ({e})")
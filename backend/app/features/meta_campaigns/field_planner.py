@@ -0,0 +1,162 @@
+import logging
+from typing import Dict, List, Any, Optional, Set
+from app.features.meta_campaigns.facebook_api_client import insights_level
+from app.features.meta_campaigns.condition_evaluator import (
+    METRIC_INSIGHTS_FIELDS,
+    ALL_INSIGHTS_METRIC_FIELDS,
+    SPECIAL_VALUE_INSIGHTS_FIELDS,
+    SPECIAL_VALUE_ITEM_FIELDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Condition fields evaluate_condition() handles without aggregate insights
+NON_INSIGHTS_CONDITION_FIELDS = {"status", "campaign_status", "name_contains", "daily_budget", "cpp_winning_days", "amount_of_active_ads"}
+
+# Ratio metrics and the additive fields they are recomputed from when aggregating daily rows locally
+DERIVED_METRIC_INPUTS = {
+    "ctr": {"clicks", "impressions"},
+    "cpc": {"spend", "clicks"},
+    "cpm": {"spend", "impressions"},
+    "cost_per_action_type": {"cost_per_action_type", "spend", "actions"},
+}
+
+# Entity fields always requested: used for logs, notifications and the status prefilter
+BASE_ENTITY_FIELDS = ["id", "name", "status", "effective_status"]
+
+
+def split_fields(fields: str) -> List[str]:
+    """Split a fields string on top-level commas, keeping expansions such as campaign{status,effective_status} whole"""
+    parts, depth, current = [], 0, ""
+    for char in fields:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += char == "{"
+        depth -= char == "}"
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def merge_fields(*fields_list: str) -> str:
+    """Union of comma-separated field lists, keeping first-seen order (expansions like campaign{...} stay whole)"""
+    return ",".join(dict.fromkeys(field for fields in fields_list if fields for field in split_fields(fields)))
+
+
+def _special_value_tokens(condition: Dict) -> Set[str]:
+    """Return the special value tokens (e.g. __daily_budget__) a condition's expected value uses"""
+    value = condition.get("value")
+    if isinstance(value, dict):
+        value = value.get("base")
+    if isinstance(value, str) and value.startswith("__") and value.endswith("__"):
+        return {value}
+    return set()
+
+
+def _ordered(fields: Set[str]) -> List[str]:
+    """Stable field order, so identical plans produce identical requests"""
+    return sorted(fields)
+
+
+def plan_insights_fields(conditions: List[Dict], rule_level: str) -> Optional[str]:
+    """
+    Plan the aggregate insights fields needed to evaluate a group of conditions.
+
+    Args:
+        conditions: Conditions sharing one time range
+        rule_level: "campaign", "ad_set", or "ad"
+
+    Returns:
+        Comma-separated fields including the level's ID field, or None if no condition reads aggregate insights
+    """
+    metric_fields: Set[str] = set()
+    for condition in conditions:
+        field = condition.get("field")
+        if field not in NON_INSIGHTS_CONDITION_FIELDS:
+            metric_fields |= METRIC_INSIGHTS_FIELDS.get(field, ALL_INSIGHTS_METRIC_FIELDS)
+        for token in _special_value_tokens(condition):
+            metric_fields |= SPECIAL_VALUE_INSIGHTS_FIELDS.get(token, set())
+
+    if not metric_fields:
+        return None
+    return ",".join([f"{insights_level(rule_level)}_id"] + _ordered(metric_fields))
+
+
+def plan_daily_insights_fields(conditions: List[Dict], rule_level: str) -> Optional[str]:
+    """
+    Plan the daily (time_increment=1) insights fields for a group of conditions.
+
+    Only cpp_winning_days reads daily rows: it computes CPP per day and logs spend, actions
+    and cost_per_action_type in the daily breakdown. The group's aggregate metrics are then
+    derived from the same daily rows (see insights_aggregation), so their inputs are included
+    too; ratios (ctr, cpc, cpm) are requested as the counts they are computed from.
+
+    Returns:
+        Comma-separated fields, or None if no condition needs daily insights
+    """
+    if not any(condition.get("field") == "cpp_winning_days" for condition in conditions):
+        return None
+    return plan_daily_fields_for_aggregates(plan_insights_fields(conditions, rule_level), rule_level, METRIC_INSIGHTS_FIELDS["cpp"])
+
+
+def plan_daily_fields_for_aggregates(aggregate_fields: Optional[str], rule_level: str, extra_fields: Set[str] = None) -> str:
+    """
+    Plan the daily insights fields from which aggregate fields can be recomputed locally.
+
+    Args:
+        aggregate_fields: Comma-separated aggregate fields as returned by plan_insights_fields (or None)
+        rule_level: "campaign", "ad_set", or "ad"
+        extra_fields: Daily fields needed on their own (e.g. cpp_winning_days inputs)
+
+    Returns:
+        Comma-separated fields including the level's ID field and the date fields
+    """
+    daily_fields = set(extra_fields or ())
+    if aggregate_fields:
+        for field in aggregate_fields.split(",")[1:]:
+            daily_fields |= DERIVED_METRIC_INPUTS.get(field, {field})
+    return ",".join([f"{insights_level(rule_level)}_id"] + _ordered(daily_fields) + ["date_start", "date_stop"])
+
+
+def plan_entity_fields(rule_level: str, conditions: List[Dict], scope_filters: Dict[str, Any] = None) -> str:
+    """
+    Plan the entity fields to request for a rule's campaigns, ad sets, or ads.
+
+    Args:
+        rule_level: "campaign", "ad_set", or "ad"
+        conditions: Rule conditions
+        scope_filters: Rule scope filters (campaign filters need campaign_id below campaign level)
+
+    Returns:
+        Comma-separated fields
+    """
+    scope_filters = scope_filters or {}
+    fields = list(BASE_ENTITY_FIELDS)
+    condition_fields = {condition.get("field") for condition in conditions}
+    tokens: Set[str] = set()
+    for condition in conditions:
+        tokens |= _special_value_tokens(condition)
+
+    if rule_level in ("ad", "ad_set"):
+        if scope_filters.get("campaign_ids") or scope_filters.get("campaign_name_contains") or "campaign_status" in condition_fields:
+            fields.append("campaign_id")
+        if "campaign_status" in condition_fields:
+            # Parent campaign status inline, instead of a separate /campaigns fetch
+            fields.append("campaign{status,effective_status}")
+    if rule_level == "ad" and "amount_of_active_ads" in condition_fields:
+        # Active ads are counted in the ad's parent ad set
+        fields.append("adset_id")
+
+    if rule_level == "ad_set":
+        # Budgets are only fetched at ad set level (as before the planner)
+        budget_fields: Set[str] = set()
+        if "daily_budget" in condition_fields:
+            budget_fields.add("daily_budget")
+        for token in tokens:
+            budget_fields |= SPECIAL_VALUE_ITEM_FIELDS.get(token, set())
+        fields.extend(_ordered(budget_fields))
+
+    return ",".join(fields)
@@ -0,0 +1,211 @@
+import requests
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from app.features.meta_campaigns.rate_limit_tracker import check_rate_limit_headers
+from app.features.meta_campaigns.request_pacer import pace
+from app.features.meta_campaigns.rate_limiter import acquire, update_budgets
+from app.features.meta_campaigns.graph_retry import GRAPH_MAX_RETRIES, PERMANENT, classify_graph_error, compute_retry_delay, parse_error_info
+
+logger = logging.getLogger(__name__)
+
+GRAPH_API_BASE_URL = "https://graph.facebook.com/v21.0"
+
+# Connection pool sizing. Almost all traffic goes to a single host (graph.facebook.com),
+# so pool_maxsize is what bounds how many requests can share warm connections at once.
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# One session per process. RQ forks a work horse per job, so the session is keyed by PID
+# and rebuilt in the child instead of sharing sockets inherited from the parent.
+_session: Optional[requests.Session] = None
+_session_pid: Optional[int] = None
+_session_lock = threading.Lock()
+
+# Per-process call statistics: {api_type: {"calls": int, "errors": int, "total_time": float, "bytes": int, "wire_bytes": int}}
+_call_stats: Dict[str, Dict[str, Any]] = {}
+_stats_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Return the pooled keep-alive session for the current process.
+
+    The session keeps TCP+TLS connections to graph.facebook.com open between calls,
+    so paginated fetches, insights batches and writes skip the handshake after the first request.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            })
+            _session = session
+            _session_pid = pid
+            logger.info(f"[TRANSPORT] Created pooled Graph API session for process {pid} (pool_maxsize={POOL_MAXSIZE})")
+    return _session
+
+
+def _strip_query(url: str) -> str:
+    """Strip the query string (which carries the access token) from a URL for logging"""
+    return url.split("?", 1)[0]
+
+
+def _record_call(api_type: str, elapsed: float, body_bytes: int, wire_bytes: int, is_error: bool):
+    with _stats_lock:
+        stats = _call_stats.setdefault(api_type, {"calls": 0, "errors": 0, "total_time": 0.0, "bytes": 0, "wire_bytes": 0})
+        stats["calls"] += 1
+        stats["total_time"] += elapsed
+        stats["bytes"] += body_bytes
+        stats["wire_bytes"] += wire_bytes
+        if is_error:
+            stats["errors"] += 1
+
+
+def _send_once(
+    method: str, url: str, params: Dict[str, Any], data: Dict[str, Any], timeout: int, api_type: str, account_id: Optional[str], cost: int = 1
+) -> requests.Response:
+    """Acquire budget (or pace locally without Redis), send and record a single Graph API request"""
+    if acquire(account_id, api_type, cost) is None:
+        pace(account_id, api_type)
+
+    session = get_session()
+    start_time = time.time()
+    try:
+        response = session.request(method, url, params=params, data=data, timeout=timeout)
+    except requests.exceptions.RequestException:
+        _record_call(api_type, time.time() - start_time, 0, 0, True)
+        raise
+    elapsed = time.time() - start_time
+
+    body_bytes = len(response.content)
+    # Content-Length is the compressed size when the body was gzip-encoded
+    try:
+        wire_bytes = int(response.headers.get("Content-Length") or body_bytes)
+    except ValueError:
+        wire_bytes = body_bytes
+    _record_call(api_type, elapsed, body_bytes, wire_bytes, response.status_code >= 400)
+
+    logger.debug(
+        f"[TRANSPORT] {method} {_strip_query(url)} -> {response.status_code} in {elapsed:.3f}s "
+        f"({body_bytes} bytes, {wire_bytes} on the wire, encoding={response.headers.get('Content-Encoding', 'identity')})"
+    )
+
+    rate_limit_headers = check_rate_limit_headers(response, api_type, account_id=account_id)
+    if any(rate_limit_headers.values()):
+        update_budgets(account_id)
+    return response
+
+
+def graph_request(
+    method: str,
+    url: str,
+    params: Dict[str, Any] = None,
+    data: Dict[str, Any] = None,
+    timeout: int = 30,
+    api_type: str = "read",
+    account_id: Optional[str] = None,
+    max_retries: int = GRAPH_MAX_RETRIES,
+    cost: int = 1,
+) -> requests.Response:
+    """
+    Send a request to the Graph API through the shared pooled session.
+
+    Rate limit headers are checked on every response (see rate_limit_tracker), so callers
+    no longer need to call check_rate_limit_headers themselves. Before sending, the call takes
+    its cost from the app and ad account budgets shared by all workers in Redis (see
+    rate_limiter), whose refill rate follows the latest usage Meta reported; without Redis it is
+    paced locally (see request_pacer). Callers should not add their own fixed sleeps between calls.
+
+    Failed calls go through the retry policy (see graph_retry): throttling errors wait for
+    estimated_time_to_regain_access and transient errors (5xx, connection failures) back off
+    exponentially, both with jitter; permanent errors (auth, bad parameters) return at once.
+
+    Args:
+        method: HTTP method ("GET" or "POST")
+        url: Full Graph API URL (may already contain a query string, e.g. paging.next)
+        params: Optional query parameters
+        data: Optional form body (used by batch requests)
+        timeout: Request timeout in seconds
+        api_type: Type of API call ("read", "write", "insights") used for stats and rate limit tracking
+        account_id: Optional ad account ID for rate limit tracking
+        max_retries: Retries after the first attempt for throttled or transient failures
+        cost: Calls Meta counts for this request (number of sub-requests for a batch call)
+
+    Returns:
+        requests.Response of the last attempt (raise_for_status is left to the caller)
+    """
+    attempt = 0
+    while True:
+        try:
+            response = _send_once(method, url, params, data, timeout, api_type, account_id, cost)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= max_retries:
+                raise
+            delay = compute_retry_delay(classify_graph_error(None), attempt, account_id)
+            logger.warning(f"[RETRY] {method} {_strip_query(url)} failed ({type(e).__name__}), retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+        else:
+            if response.status_code < 400:
+                return response
+            error_info = parse_error_info(response)
+            kind = classify_graph_error(response.status_code, error_info)
+            if kind == PERMANENT or attempt >= max_retries:
+                if kind != PERMANENT:
+                    logger.error(f"[RETRY] {method} {_strip_query(url)} still {kind} after {max_retries} retries (code {error_info.get('code')})")
+                return response
+            delay = compute_retry_delay(kind, attempt, account_id)
+            logger.warning(
+                f"[RETRY] {method} {_strip_query(url)} -> {response.status_code} {kind} "
+                f"(code {error_info.get('code')}, subcode {error_info.get('error_subcode')}), retry {attempt + 1}/{max_retries} in {delay:.1f}s"
+            )
+        time.sleep(delay)
+        attempt += 1
+
+
+def graph_get(url: str, params: Dict[str, Any] = None, timeout: int = 30, api_type: str = "read", account_id: Optional[str] = None) -> requests.Response:
+    """GET a Graph API URL through the shared session"""
+    return graph_request("GET", url, params=params, timeout=timeout, api_type=api_type, account_id=account_id)
+
+
+def graph_post(
+    url: str, params: Dict[str, Any] = None, data: Dict[str, Any] = None, timeout: int = 30, api_type: str = "write", account_id: Optional[str] = None, cost: int = 1
+) -> requests.Response:
+    """POST to a Graph API URL through the shared session"""
+    return graph_request("POST", url, params=params, data=data, timeout=timeout, api_type=api_type, account_id=account_id, cost=cost)
+
+
+def get_transport_stats() -> Dict[str, Dict[str, Any]]:
+    """Return a copy of the per-process call statistics, keyed by api_type"""
+    with _stats_lock:
+        return {api_type: dict(stats) for api_type, stats in _call_stats.items()}
+
+
+def stats_since(snapshot: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Return call statistics accumulated since `snapshot` (taken with get_transport_stats()).
+
+    Used by rule runs to report their own traffic without resetting the process-wide counters,
+    which other threads may be updating at the same time.
+    """
+    current = get_transport_stats()
+    delta = {}
+    for api_type, stats in current.items():
+        before = snapshot.get(api_type, {})
+        diff = {key: value - before.get(key, 0) for key, value in stats.items()}
+        if diff["calls"] > 0:
+            diff["total_time"] = round(diff["total_time"], 3)
+            delta[api_type] = diff
+    return delta
@@ -0,0 +1,144 @@
+import requests
+import logging
+import time
+import json
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlencode
+from app.features.meta_campaigns.graph_api_transport import GRAPH_API_BASE_URL, graph_post
+from app.features.meta_campaigns.graph_retry import PERMANENT, TRANSIENT, THROTTLED, classify_graph_error, compute_retry_delay, parse_error_info
+
+logger = logging.getLogger(__name__)
+
+# Meta accepts at most 50 sub-requests per batch call
+MAX_BATCH_SIZE = 50
+
+# How many times a failed sub-request is re-sent before giving up.
+# Sub-requests failing with throttling or transient errors are retried (see graph_retry);
+# anything else (bad parameters, permissions, ...) fails the same way on retry, so it is returned as-is.
+MAX_SUB_REQUEST_RETRIES = 2
+
+
+def build_relative_url(path: str, params: Dict[str, Any] = None) -> str:
+    """
+    Build a relative_url for a batch sub-request.
+
+    Args:
+        path: Graph path without version prefix (e.g., "act_123/insights" or "1234567890")
+        params: Query parameters (JSON values must already be serialized to strings)
+    """
+    path = path.lstrip("/")
+    if not params:
+        return path
+    return f"{path}?{urlencode(params)}"
+
+
+def _parse_sub_response(sub_response: Optional[Dict]) -> Dict[str, Any]:
+    """Turn one element of the batch response array into {success, code, body, error, kind}"""
+    if sub_response is None:
+        # Meta returns null for sub-requests that did not complete within the batch timeout
+        return {"success": False, "code": None, "body": None, "error": "Sub-request timed out", "kind": TRANSIENT}
+
+    code = sub_response.get("code")
+    raw_body = sub_response.get("body")
+    try:
+        body = json.loads(raw_body) if isinstance(raw_body, str) and raw_body else raw_body
+    except (json.JSONDecodeError, ValueError):
+        body = {"raw": raw_body}
+
+    if code == 200:
+        return {"success": True, "code": code, "body": body, "error": None, "kind": None}
+
+    error_info = body.get("error", {}) if isinstance(body, dict) else {}
+    error_message = error_info.get("message") or f"HTTP {code}"
+    return {"success": False, "code": code, "body": body, "error": error_message, "kind": classify_graph_error(code, error_info)}
+
+
+def _send_batch(access_token: str, sub_requests: List[Dict], account_id: Optional[str], api_type: str, timeout: int) -> List[Dict]:
+    """Send one batch call (<= MAX_BATCH_SIZE sub-requests) and return parsed sub-responses in order"""
+    data = {
+        "access_token": access_token,
+        "batch": json.dumps(sub_requests),
+        "include_headers": "false",
+    }
+    try:
+        response = graph_post(f"{GRAPH_API_BASE_URL}/", data=data, timeout=timeout, api_type=api_type, account_id=account_id, cost=len(sub_requests))
+        response.raise_for_status()
+        payload = response.json()
+    except requests.exceptions.RequestException as e:
+        error_msg = str(e)
+        kind = TRANSIENT
+        if hasattr(e, 'response') and e.response is not None:
+            error_info = parse_error_info(e.response)
+            error_msg = error_info.get("message") or e.response.text or error_msg
+            kind = classify_graph_error(e.response.status_code, error_info)
+        logger.error(f"[BATCH] Batch call with {len(sub_requests)} sub-request(s) failed ({kind}): {error_msg}")
+        # The whole HTTP call failed, so every sub-request shares its error kind
+        return [{"success": False, "code": None, "body": None, "error": error_msg, "kind": kind} for _ in sub_requests]
+
+    if not isinstance(payload, list) or len(payload) != len(sub_requests):
+        logger.error(f"[BATCH] Unexpected batch response shape: {str(payload)[:500]}")
+        return [{"success": False, "code": None, "body": None, "error": "Unexpected batch response", "kind": TRANSIENT} for _ in sub_requests]
+
+    return [_parse_sub_response(sub_response) for sub_response in payload]
+
+
+def execute_batch(
+    access_token: str,
+    sub_requests: List[Dict],
+    account_id: Optional[str] = None,
+    api_type: str = "read",
+    max_retries: int = MAX_SUB_REQUEST_RETRIES,
+    timeout: int = 120,
+) -> List[Dict]:
+    """
+    Execute Graph API sub-requests through the batch endpoint, up to 50 per HTTP round trip.
+
+    Sub-requests that fail with a transient or throttling error are re-sent on their own
+    (only the failed ones, not the whole batch) up to `max_retries` times.
+
+    Args:
+        access_token: Meta Access Token (applies to every sub-request)
+        sub_requests: List of {"method": "GET"|"POST", "relative_url": str, optional "body": str}
+        account_id: Optional ad account ID for rate limit tracking
+        api_type: Type of API call ("read", "write", "insights")
+        max_retries: Number of retry rounds for failed sub-requests
+        timeout: HTTP timeout per batch call in seconds
+
+    Returns:
+        List aligned with `sub_requests`, each {"success": bool, "code": int|None, "body": dict|None, "error": str|None,
+        "kind": None on success, else the graph_retry error kind (THROTTLED, TRANSIENT or PERMANENT)}
+    """
+    results: List[Optional[Dict]] = [None] * len(sub_requests)
+    pending = list(range(len(sub_requests)))
+    attempt = 0
+    batch_calls = 0
+
+    while pending:
+        if attempt > 0:
+            # Throttled sub-requests wait for the account to regain access; otherwise a short backoff
+            kind = THROTTLED if any(results[i]["kind"] == THROTTLED for i in pending) else TRANSIENT
+            delay = compute_retry_delay(kind, attempt - 1, account_id)
+            logger.info(f"[BATCH] Retrying {len(pending)} failed sub-request(s) in {delay:.1f}s ({kind}, attempt {attempt + 1}/{max_retries + 1})")
+            time.sleep(delay)
+
+        still_failing = []
+        for chunk_start in range(0, len(pending), MAX_BATCH_SIZE):
+            chunk = pending[chunk_start:chunk_start + MAX_BATCH_SIZE]
+            batch_calls += 1
+
+            batch_start_time = time.time()
+            parsed = _send_batch(access_token, [sub_requests[i] for i in chunk], account_id, api_type, timeout)
+            ok_count = sum(1 for p in parsed if p["success"])
+            logger.info(f"[BATCH] Batch call {batch_calls}: {ok_count}/{len(chunk)} sub-request(s) succeeded in {time.time() - batch_start_time:.2f}s")
+
+            for index, result in zip(chunk, parsed):
+                results[index] = result
+                if not result["success"] and result["kind"] != PERMANENT:
+                    still_failing.append(index)
+
+        attempt += 1
+        if attempt > max_retries:
+            break
+        pending = still_failing
+
+    return results
@@ -0,0 +1,136 @@
+import logging
+import random
+import time
+import requests
+from typing import Dict, Any, Optional
+from app.features.meta_campaigns.rate_limit_tracker import get_latest_usage
+
+logger = logging.getLogger(__name__)
+
+# Error kinds returned by classify_graph_error()
+THROTTLED = "throttled"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+# Meta error codes for rate limiting: app (4), user (17), API (32, 613) and business use case / ads
+# management throttling (80000-80014). Subcode 2446079 is "too many calls to this ad account".
+THROTTLING_ERROR_CODES = {4, 17, 32, 613} | set(range(80000, 80015))
+THROTTLING_ERROR_SUBCODES = {2446079}
+
+# Codes Meta documents as temporary server-side failures
+TRANSIENT_ERROR_CODES = {1, 2, 341}
+
+# Invalid/expired token (190, 102) and missing permissions (10, 200-299): retrying cannot help
+AUTH_ERROR_CODES = {10, 102, 190} | set(range(200, 300))
+
+# Message Meta returns (code 1) when a page or filter asks for more data than it will return at once.
+# Retrying the same request cannot succeed; callers shrink the page or batch instead (see page_size_tuner).
+DATA_TOO_LARGE_MESSAGE = "reduce the amount of data"
+
+# Retries per Graph call after the first attempt
+GRAPH_MAX_RETRIES = 3
+
+# Backoff before retry n is BASE * 2**n seconds (capped), plus jitter
+TRANSIENT_BASE_DELAY = 1.0
+THROTTLED_BASE_DELAY = 15.0
+MAX_BACKOFF_DELAY = 120.0
+
+# Never wait longer than this for estimated_time_to_regain_access before a retry
+MAX_THROTTLE_WAIT = 600.0
+
+# Random extra delay (fraction of the computed delay) so parallel workers do not retry in lockstep
+JITTER_RATIO = 0.25
+
+
+class GraphAPIError(requests.exceptions.HTTPError):
+    """
+    A Graph API call that failed after the retry policy gave up.
+
+    Subclasses HTTPError, so existing `except requests.exceptions.RequestException` handlers still apply.
+    """
+
+    def __init__(self, message: str, code: Optional[int] = None, subcode: Optional[int] = None, kind: str = PERMANENT, response: requests.Response = None):
+        super().__init__(message, response=response)
+        self.code = code
+        self.subcode = subcode
+        self.kind = kind
+
+    @property
+    def is_throttled(self) -> bool:
+        return self.kind == THROTTLED
+
+
+def parse_error_info(response: requests.Response) -> Dict[str, Any]:
+    """Return the `error` object of a Graph API error response ({} if the body is not JSON)"""
+    try:
+        payload = response.json()
+    except ValueError:
+        return {}
+    error_info = payload.get("error") if isinstance(payload, dict) else None
+    return error_info if isinstance(error_info, dict) else {}
+
+
+def is_data_too_large_error(error_info: Dict[str, Any] = None) -> bool:
+    """True if Meta rejected the request as asking for too much data ("Please reduce the amount of data...")"""
+    message = (error_info or {}).get("message") or ""
+    return DATA_TOO_LARGE_MESSAGE in message.lower()
+
+
+def classify_graph_error(status_code: Optional[int], error_info: Dict[str, Any] = None) -> str:
+    """
+    Classify a failed Graph API call as THROTTLED, TRANSIENT or PERMANENT.
+
+    Args:
+        status_code: HTTP status (None when the request never got a response)
+        error_info: The response's `error` object, if any
+
+    Returns:
+        THROTTLED and TRANSIENT failures are worth retrying; PERMANENT ones are not
+    """
+    error_info = error_info or {}
+    code = error_info.get("code")
+    subcode = error_info.get("error_subcode")
+
+    if code in THROTTLING_ERROR_CODES or subcode in THROTTLING_ERROR_SUBCODES or status_code == 429:
+        return THROTTLED
+    if code in AUTH_ERROR_CODES or status_code in (401, 403) or is_data_too_large_error(error_info):
+        return PERMANENT
+    if status_code is None or status_code >= 500 or code in TRANSIENT_ERROR_CODES or error_info.get("is_transient"):
+        return TRANSIENT
+    return PERMANENT
+
+
+def compute_retry_delay(kind: str, attempt: int, account_id: Optional[str] = None) -> float:
+    """
+    Return how long to wait before retry number `attempt` (0-based).
+
+    Throttled calls wait at least until Meta's estimated_time_to_regain_access for the account
+    (recorded by rate_limit_tracker from the failed response's headers), capped at MAX_THROTTLE_WAIT.
+    Both kinds back off exponentially and get up to JITTER_RATIO extra random delay.
+    """
+    base = THROTTLED_BASE_DELAY if kind == THROTTLED else TRANSIENT_BASE_DELAY
+    delay = min(MAX_BACKOFF_DELAY, base * (2 ** attempt))
+    if kind == THROTTLED:
+        regain_wait = get_latest_usage(account_id)["blocked_until"] - time.time()
+        delay = max(delay, min(regain_wait, MAX_THROTTLE_WAIT))
+    return delay + random.uniform(0, delay * JITTER_RATIO)
+
+
+def raise_for_graph_error(response: requests.Response):
+    """
+    Raise GraphAPIError (with Meta's code, subcode and error kind) for an error response.
+
+    Use instead of response.raise_for_status() where callers need to tell throttling apart.
+    """
+    if response.status_code < 400:
+        return
+    error_info = parse_error_info(response)
+    kind = classify_graph_error(response.status_code, error_info)
+    message = error_info.get("message") or f"HTTP {response.status_code}"
+    raise GraphAPIError(
+        f"Graph API {kind} error (code {error_info.get('code')}, subcode {error_info.get('error_subcode')}): {message}",
+        code=error_info.get("code"),
+        subcode=error_info.get("error_subcode"),
+        kind=kind,
+        response=response,
+    )
@@ -0,0 +1,121 @@
+import json
+import logging
+from typing import Dict, List, Any, Iterable
+from app.features.meta_campaigns.facebook_api_client import build_time_range_string, safe_float_any
+
+logger = logging.getLogger(__name__)
+
+# Additive fields: the aggregate is the sum of the daily values
+SUMMED_FIELDS = ("spend", "impressions", "clicks")
+COUNT_FIELDS = {"impressions", "clicks"}
+
+# Per-action-type lists: the aggregate sums each action_type's value across days
+ACTION_LIST_FIELDS = ("actions", "action_values")
+
+
+def format_number(value: float, integer: bool = False) -> str:
+    """Format a number the way Meta returns insights values (strings, no trailing zeros)"""
+    if integer:
+        return str(int(round(value)))
+    formatted = f"{value:.6f}".rstrip("0").rstrip(".")
+    return formatted or "0"
+
+
+def _sum_action_list(rows: List[Dict], field: str) -> List[Dict]:
+    """Sum an actions-style list ([{action_type, value}]) per action_type, keeping first-seen order"""
+    totals: Dict[str, float] = {}
+    for row in rows:
+        for entry in row.get(field) or []:
+            if not isinstance(entry, dict) or not entry.get("action_type"):
+                continue
+            action_type = entry["action_type"]
+            totals[action_type] = totals.get(action_type, 0.0) + safe_float_any(entry.get("value"), 0.0)
+    is_count = field == "actions"
+    return [{"action_type": action_type, "value": format_number(total, integer=is_count and total.is_integer())} for action_type, total in totals.items()]
+
+
+def aggregate_daily_rows(rows: List[Dict], fields: Iterable[str], date_start: str, date_stop: str) -> Dict[str, Any]:
+    """
+    Combine one object's daily insights rows into the row Meta returns for the whole range.
+
+    Additive metrics and per-action-type lists are summed; ratios are recomputed from the
+    sums the same way Meta defines them (ctr = clicks / impressions * 100, cpc = spend / clicks,
+    cpm = spend / impressions * 1000, cost per action = spend / action count), so they are not
+    averages of daily ratios.
+
+    Args:
+        rows: Daily rows (time_increment=1) for one object
+        fields: Aggregate fields to produce (requested insights fields)
+        date_start: Range start (YYYY-MM-DD)
+        date_stop: Range end (YYYY-MM-DD)
+
+    Returns:
+        Aggregate row, or {} when there are no daily rows (Meta returns no row without delivery)
+    """
+    if not rows:
+        return {}
+    fields = set(fields)
+    aggregate: Dict[str, Any] = {"date_start": date_start, "date_stop": date_stop}
+
+    # Carry over ID fields (campaign_id, adset_id, ad_id) from the daily rows
+    for key, value in rows[0].items():
+        if key.endswith("_id"):
+            aggregate[key] = value
+
+    totals = {field: sum(safe_float_any(row.get(field), 0.0) for row in rows) for field in SUMMED_FIELDS}
+    spend, impressions, clicks = totals["spend"], totals["impressions"], totals["clicks"]
+    for field in SUMMED_FIELDS:
+        if field in fields:
+            aggregate[field] = format_number(totals[field], integer=field in COUNT_FIELDS)
+
+    actions = _sum_action_list(rows, "actions")
+    if "actions" in fields and actions:
+        aggregate["actions"] = actions
+    if "action_values" in fields:
+        action_values = _sum_action_list(rows, "action_values")
+        if action_values:
+            aggregate["action_values"] = action_values
+    if "cost_per_action_type" in fields:
+        cost_per_action_type = [
+            {"action_type": entry["action_type"], "value": format_number(spend / float(entry["value"]))}
+            for entry in actions
+            if float(entry["value"]) > 0
+        ]
+        if cost_per_action_type:
+            aggregate["cost_per_action_type"] = cost_per_action_type
+
+    if "ctr" in fields and impressions > 0:
+        aggregate["ctr"] = format_number(clicks / impressions * 100)
+    if "cpc" in fields and clicks > 0:
+        aggregate["cpc"] = format_number(spend / clicks)
+    if "cpm" in fields and impressions > 0:
+        aggregate["cpm"] = format_number(spend / impressions * 1000)
+
+    return aggregate
+
+
+def aggregate_daily_insights(
+    daily_insights: Dict[str, List[Dict]],
+    ids: Iterable[str],
+    time_range: Dict[str, Any],
+    fields: str,
+) -> Dict[str, Dict]:
+    """
+    Build fetch_insights()-shaped results from fetch_daily_insights() results for the same range.
+
+    Args:
+        daily_insights: {object_id: [daily rows]} as returned by fetch_daily_insights
+        ids: All requested object IDs (objects without rows map to {} like fetch_insights)
+        time_range: Rule time range dict the daily rows were fetched for
+        fields: Comma-separated aggregate fields to produce
+
+    Returns:
+        {object_id: aggregate row or {}}
+    """
+    window = json.loads(build_time_range_string(time_range))
+    field_list = fields.split(",")
+    result = {}
+    for obj_id in ids:
+        result[obj_id] = aggregate_daily_rows(daily_insights.get(obj_id) or [], field_list, window["since"], window["until"])
+    logger.info(f"[AGGREGATE] Derived aggregate insights for {len(result)} objects from daily rows ({window['since']} - {window['until']})")
+    return result
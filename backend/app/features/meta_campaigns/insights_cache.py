@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Tuple
+from redis.exceptions import RedisError
+from app.jobs.queues import redis_conn
+from app.features.meta_campaigns.facebook_api_client import DEFAULT_DAILY_INSIGHTS_FIELDS, build_time_range_string, fetch_daily_insights, insights_level
+from app.features.meta_campaigns.async_insights_report import estimate_time_range_days
+
+logger = logging.getLogger(__name__)
+
+# Redis hash per (account, level, field set, day): {object_id: json {"fetched_at": ts, "row": daily row or null}}
+INSIGHTS_CACHE_KEY_PREFIX = "meta:insights"
+
+# Meta keeps attributing conversions to a day for up to 7 days after it (default 7-day click window).
+# A day is "closed" once that window has passed; its rows no longer change.
+ATTRIBUTION_WINDOW_DAYS = 7
+
+# How long a cached row is trusted, by age of the day it belongs to
+TODAY_TTL_SECONDS = 300  # Today: spend moves all the time, only reuse within one scheduler cycle
+RECENT_DAY_TTL_SECONDS = 3600  # Inside the attribution window: late conversions still arrive
+CLOSED_DAY_TTL_SECONDS = 35 * 24 * 3600  # Closed: fetched once after closing, kept while rules can still ask for it
+
+# Windows longer than this bypass the cache (rarely used, and would keep too many days in Redis)
+INSIGHTS_CACHE_MAX_DAYS = 90
+
+# Above this many distinct missing-day spans, uncached IDs are fetched in one span covering all of them
+MAX_FETCH_SPANS = 4
+
+
+def _fields_hash(fields: str) -> str:
+    """Short stable hash of a field set (order-insensitive)"""
+    normalized = ",".join(sorted(set(fields.split(","))))
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+def _day_key(account_id: str, level: str, fields: str, day: date) -> str:
+    account = str(account_id or "").replace("act_", "")
+    return f"{INSIGHTS_CACHE_KEY_PREFIX}:{account}:{level}:{_fields_hash(fields)}:{day.isoformat()}"
+
+
+def window_days(time_range: Dict[str, Any]) -> List[date]:
+    """Days covered by a rule time range, using the same dates build_time_range_string sends to Meta"""
+    window = json.loads(build_time_range_string(time_range))
+    since = datetime.strptime(window["since"], "%Y-%m-%d").date()
+    until = datetime.strptime(window["until"], "%Y-%m-%d").date()
+    return [since + timedelta(days=offset) for offset in range((until - since).days + 1)]
+
+
+def is_fresh(day: date, fetched_at: float, now: float) -> bool:
+    """
+    True if a row fetched at `fetched_at` can still be used for `day`.
+
+    Rows fetched after the day closed never go stale; anything fetched earlier
+    (including rows cached while the day was still recent) expires after the short TTL.
+    """
+    today = datetime.fromtimestamp(now).date()
+    if day >= today:
+        return now - fetched_at < TODAY_TTL_SECONDS
+    closed_at = datetime.combine(day + timedelta(days=ATTRIBUTION_WINDOW_DAYS + 1), datetime.min.time()).timestamp()
+    if now >= closed_at and fetched_at >= closed_at:
+        return True
+    return now - fetched_at < RECENT_DAY_TTL_SECONDS
+
+
+def serves_aggregates_from_cache(time_range: Dict[str, Any]) -> bool:
+    """
+    True if a time range's aggregate insights should be derived from cached daily rows.
+
+    Only windows longer than the attribution window benefit: shorter ones consist of recent
+    days only, which are refetched anyway, and one aggregate call is cheaper than daily rows.
+    """
+    days = estimate_time_range_days(time_range)
+    return ATTRIBUTION_WINDOW_DAYS < days <= INSIGHTS_CACHE_MAX_DAYS
+
+
+def _read_cached_rows(
+    account_id: str, level: str, fields: str, ids: List[str], days: List[date]
+) -> Tuple[Dict[str, List[Dict]], Dict[str, List[date]]]:
+    """
+    Returns:
+        ({object_id: cached daily rows}, {object_id: days without a fresh cache entry})
+    """
+    cached: Dict[str, List[Dict]] = {}
+    missing: Dict[str, List[date]] = {}
+    try:
+        pipe = redis_conn.pipeline()
+        for day in days:
+            pipe.hmget(_day_key(account_id, level, fields, day), ids)
+        day_values = pipe.execute()
+    except RedisError as e:
+        logger.warning(f"[INSIGHTS CACHE] Redis unavailable ({e}), fetching all {len(days)} day(s) from Meta")
+        return {}, {obj_id: list(days) for obj_id in ids}
+
+    now = time.time()
+    for day, values in zip(days, day_values):
+        for obj_id, raw in zip(ids, values):
+            entry = None
+            if raw:
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    entry = None
+            if not entry or not is_fresh(day, entry.get("fetched_at", 0), now):
+                missing.setdefault(obj_id, []).append(day)
+            elif entry.get("row"):
+                cached.setdefault(obj_id, []).append(entry["row"])
+    return cached, missing
+
+
+def _write_rows(account_id: str, level: str, fields: str, ids: List[str], since: date, until: date, rows_by_id: Dict[str, List[Dict]]):
+    """Store fetched daily rows; days without a row are stored as empty so they are not refetched"""
+    fetched_at = time.time()
+    rows_by_day: Dict[str, Dict[str, Dict]] = {}
+    for obj_id, rows in rows_by_id.items():
+        for row in rows:
+            rows_by_day.setdefault(row.get("date_start"), {})[obj_id] = row
+
+    try:
+        pipe = redis_conn.pipeline()
+        day = since
+        while day <= until:
+            day_rows = rows_by_day.get(day.isoformat(), {})
+            key = _day_key(account_id, level, fields, day)
+            pipe.hset(key, mapping={
+                obj_id: json.dumps({"fetched_at": fetched_at, "row": day_rows.get(obj_id)})
+                for obj_id in ids
+            })
+            pipe.expire(key, CLOSED_DAY_TTL_SECONDS)
+            day += timedelta(days=1)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning(f"[INSIGHTS CACHE] Could not store daily insights in Redis ({e})")
+
+
+def _plan_fetch_spans(missing: Dict[str, List[date]]) -> List[Tuple[date, date, List[str]]]:
+    """
+    Group IDs with uncached days into (since, until, ids) fetches.
+
+    IDs sharing the same first and last missing day are fetched together; cached days
+    between them are refetched rather than split into several requests.
+    """
+    spans: Dict[Tuple[date, date], List[str]] = {}
+    for obj_id, days in missing.items():
+        spans.setdefault((min(days), max(days)), []).append(obj_id)
+    if len(spans) > MAX_FETCH_SPANS:
+        since = min(span[0] for span in spans)
+        until = max(span[1] for span in spans)
+        return [(since, until, [obj_id for span_ids in spans.values() for obj_id in span_ids])]
+    return [(since, until, span_ids) for (since, until), span_ids in spans.items()]
+
+
+def fetch_daily_insights_cached(
+    account_id: str,
+    access_token: str,
+    rule_level: str,
+    ids: List[str],
+    time_range: Dict[str, Any],
+    max_concurrency: int = None,
+    fields: str = None,
+    account_item_count: int = None,
+) -> Dict[str, List[Dict]]:
+    """
+    fetch_daily_insights() that only asks Meta for days without a fresh cached row.
+
+    Rows are cached per account, level, field set, day and object ID. Days whose attribution
+    window has closed are kept for CLOSED_DAY_TTL_SECONDS; today and recent days expire after
+    TODAY_TTL_SECONDS / RECENT_DAY_TTL_SECONDS. A rule with a 30-day window then fetches only
+    the last few days on each run instead of all 30.
+
+    Args:
+        Same as fetch_daily_insights
+
+    Returns:
+        {object_id: [daily rows sorted by date]}, like fetch_daily_insights
+
+    Raises:
+        InsightsIncompleteError: if some IDs' daily insights could not be fetched (nothing is cached for them)
+    """
+    fields = fields or DEFAULT_DAILY_INSIGHTS_FIELDS
+    days = window_days(time_range)
+    if not ids or len(days) > INSIGHTS_CACHE_MAX_DAYS:
+        return fetch_daily_insights(
+            account_id, access_token, rule_level, ids, time_range,
+            max_concurrency=max_concurrency, fields=fields, account_item_count=account_item_count,
+        )
+
+    level = insights_level(rule_level)
+    daily_insights, missing = _read_cached_rows(account_id, level, fields, ids, days)
+    cached_count = len(ids) * len(days) - sum(len(missing_days) for missing_days in missing.values())
+    logger.info(f"[INSIGHTS CACHE] {cached_count} of {len(ids) * len(days)} ID-days cached for {level} {days[0]} - {days[-1]}")
+
+    for since, until, span_ids in _plan_fetch_spans(missing):
+        logger.info(f"[INSIGHTS CACHE] Fetching {since} - {until} for {len(span_ids)} IDs")
+        fetched = fetch_daily_insights(
+            account_id, access_token, rule_level, span_ids, {"since": since.isoformat(), "until": until.isoformat()},
+            max_concurrency=max_concurrency, fields=fields, account_item_count=account_item_count,
+        )
+        _write_rows(account_id, level, fields, span_ids, since, until, fetched)
+
+        # Fetched rows replace whatever was cached inside the span; cached rows outside it are kept
+        since_str, until_str = since.isoformat(), until.isoformat()
+        for obj_id in span_ids:
+            kept = [row for row in daily_insights.get(obj_id, []) if not since_str <= (row.get("date_start") or "") <= until_str]
+            daily_insights[obj_id] = kept + fetched.get(obj_id, [])
+
+    return {
+        obj_id: sorted(rows, key=lambda row: row.get("date_start") or "")
+        for obj_id, rows in daily_insights.items()
+        if rows
+    }
@@ -0,0 +1,195 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Any, Hashable, Iterable, Optional, Tuple
+from app.features.meta_campaigns.facebook_api_client import ACCOUNT_LEVEL_MIN_COVERAGE, INSIGHTS_BATCH_SIZE, fetch_insights_for_time_ranges
+from app.features.meta_campaigns.async_insights_report import ASYNC_MIN_ESTIMATED_ROWS, estimate_insights_rows
+from app.features.meta_campaigns.insights_aggregation import aggregate_daily_insights
+from app.features.meta_campaigns.insights_warehouse import fetch_daily_insights_local_first
+
+logger = logging.getLogger(__name__)
+
+# IDs collected before a chunk of insights is started (a multiple of the 50-ID filtering slice)
+PREFETCH_CHUNK_SIZE = INSIGHTS_BATCH_SIZE * 10
+
+
+class InsightsPrefetcher:
+    """
+    Start insights fetches for entities while later entity pages are still downloading.
+
+    IDs are added page by page; every PREFETCH_CHUNK_SIZE IDs a background fetch is started that
+    covers all aggregate time ranges in one pass (see fetch_insights_for_time_ranges), plus one
+    daily fetch per time range with daily rows. Daily rows come from the Postgres warehouse and
+    the per-day cache where possible (see insights_warehouse, insights_cache), and aggregates for
+    time ranges that have daily rows are computed locally from them (see insights_aggregation).
+    The chunks run one after another on a single background thread, and each chunk fans out over
+    parallel batch calls itself, so the account's concurrency limit is respected.
+
+    Once the IDs seen so far are enough for an async report run (see async_insights_report), or
+    cover most of the items seen so far (a broad rule), streaming stops and finish() fetches the
+    remaining IDs in one call. Knowing the account's item count by then, that call can use the
+    async report or one account-level insights call instead of many 50-ID slices.
+    """
+
+    def __init__(
+        self,
+        account_id: str,
+        access_token: str,
+        rule_level: str,
+        time_ranges: Dict[Hashable, Dict[str, Any]],
+        insights_fields: Dict[Hashable, str],
+        daily_fields: Dict[Hashable, str] = None,
+        local_aggregate_fields: Dict[Hashable, str] = None,
+        max_concurrency: int = None,
+        chunk_size: int = PREFETCH_CHUNK_SIZE,
+    ):
+        """
+        Args:
+            account_id: Meta Ad Account ID
+            access_token: Meta Access Token
+            rule_level: Rule level (campaign, ad_set, or ad)
+            time_ranges: {time range key: time range dict}
+            insights_fields: {time range key: aggregate insights fields}; time ranges missing here get no aggregate fetch
+            daily_fields: {time range key: daily insights fields} for time ranges that need daily rows (cpp_winning_days, cached windows)
+            local_aggregate_fields: {time range key: aggregate fields} to derive from that time range's daily rows
+            max_concurrency: Max parallel insights batch calls (None = default)
+            chunk_size: Number of IDs per background fetch
+        """
+        self.account_id = account_id
+        self.access_token = access_token
+        self.rule_level = rule_level
+        self.time_ranges = time_ranges
+        self.insights_fields = insights_fields
+        self.daily_fields = daily_fields or {}
+        self.local_aggregate_fields = local_aggregate_fields or {}
+        # One multi-window request asks for the union of the fields each time range needs
+        self._aggregate_fields = ",".join(dict.fromkeys(
+            field for fields in insights_fields.values() for field in fields.split(",")
+        ))
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+
+        self._pending_ids: List[str] = []
+        self._submitted_ids: List[str] = []
+        self._seen_item_count = 0
+        self._streaming = bool(self.insights_fields or self.daily_fields)
+        self._futures: List[Tuple[str, Hashable, Future]] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._first_submit_time: Optional[float] = None
+
+    def _async_report_likely(self, item_count: int) -> bool:
+        """True if a single fetch for item_count IDs would use an async report run for any time range"""
+        aggregate_rows = sum(estimate_insights_rows(item_count, self.time_ranges[tr_key]) for tr_key in self.insights_fields)
+        if aggregate_rows >= ASYNC_MIN_ESTIMATED_ROWS:
+            return True
+        for tr_key in self.daily_fields:
+            if estimate_insights_rows(item_count, self.time_ranges[tr_key], daily=True) >= ASYNC_MIN_ESTIMATED_ROWS:
+                return True
+        return False
+
+    def _submit(self, ids: List[str], account_item_count: int = None):
+        if not ids or not (self.insights_fields or self.daily_fields):
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="insights-prefetch")
+            self._first_submit_time = time.time()
+        if self.insights_fields:
+            self._futures.append((
+                "aggregate",
+                None,
+                self._executor.submit(
+                    fetch_insights_for_time_ranges, self.account_id, self.access_token, self.rule_level, ids,
+                    {tr_key: self.time_ranges[tr_key] for tr_key in self.insights_fields},
+                    max_concurrency=self.max_concurrency, fields=self._aggregate_fields, account_item_count=account_item_count,
+                ),
+            ))
+        for tr_key, fields in self.daily_fields.items():
+            self._futures.append((
+                "daily",
+                tr_key,
+                self._executor.submit(
+                    fetch_daily_insights_local_first, self.account_id, self.access_token, self.rule_level, ids, self.time_ranges[tr_key],
+                    max_concurrency=self.max_concurrency, fields=fields, account_item_count=account_item_count,
+                ),
+            ))
+        self._submitted_ids.extend(ids)
+
+    def add(self, ids: Iterable[str], page_item_count: int = None):
+        """
+        Queue IDs from one page; starts a background fetch once a chunk is full.
+
+        Args:
+            ids: IDs from the page that need insights
+            page_item_count: Number of items on the page before filtering (for the coverage estimate)
+        """
+        ids = [item_id for item_id in ids if item_id]
+        self._pending_ids.extend(ids)
+        self._seen_item_count += page_item_count if page_item_count is not None else len(ids)
+        if not self._streaming or len(self._pending_ids) < self.chunk_size:
+            return
+
+        wanted_count = len(self._submitted_ids) + len(self._pending_ids)
+        if self._seen_item_count and wanted_count / self._seen_item_count >= ACCOUNT_LEVEL_MIN_COVERAGE:
+            logger.info(
+                f"[PREFETCH] {wanted_count} of {self._seen_item_count} items seen need insights - "
+                f"broad rule, deciding between account-level and filtered insights after the last page"
+            )
+            self._streaming = False
+            return
+
+        if self._async_report_likely(wanted_count):
+            logger.info(
+                f"[PREFETCH] {len(self._submitted_ids) + len(self._pending_ids)} IDs seen, enough for an async report run - "
+                f"remaining insights will be fetched after the last page"
+            )
+            self._streaming = False
+            return
+
+        while len(self._pending_ids) >= self.chunk_size:
+            chunk = self._pending_ids[:self.chunk_size]
+            self._pending_ids = self._pending_ids[self.chunk_size:]
+            logger.info(f"[PREFETCH] Starting insights for {len(chunk)} IDs while entity pages are still loading ({len(self._submitted_ids)} already started)")
+            self._submit(chunk)
+
+    def finish(self, account_item_count: int = None) -> Tuple[Dict[Hashable, Dict[str, Dict]], Dict[Hashable, Dict[str, List[Dict]]]]:
+        """
+        Fetch the remaining IDs, wait for all background fetches and merge their results.
+
+        Args:
+            account_item_count: Total items fetched for the rule, lets the remaining fetch pick the account-level strategy
+
+        Returns:
+            (insights_by_time_range, daily_insights_by_time_range), keyed by time range key
+        """
+        if self._pending_ids:
+            self._submit(self._pending_ids, account_item_count=account_item_count)
+            self._pending_ids = []
+
+        insights_by_time_range: Dict[Hashable, Dict[str, Dict]] = {tr_key: {} for tr_key in self.insights_fields}
+        daily_insights_by_time_range: Dict[Hashable, Dict[str, List[Dict]]] = {tr_key: {} for tr_key in self.daily_fields}
+        for kind, tr_key, future in self._futures:
+            result = future.result()
+            if kind == "aggregate":
+                for result_key, result_insights in result.items():
+                    insights_by_time_range[result_key].update(result_insights)
+            else:
+                daily_insights_by_time_range[tr_key].update(result)
+
+        for tr_key, fields in self.local_aggregate_fields.items():
+            insights_by_time_range[tr_key] = aggregate_daily_insights(
+                daily_insights_by_time_range.get(tr_key, {}), self._submitted_ids, self.time_ranges[tr_key], fields
+            )
+
+        if self._futures:
+            logger.info(
+                f"[PREFETCH] Insights for {len(self._submitted_ids)} IDs ready in {len(self._futures)} fetch(es), "
+                f"{time.time() - self._first_submit_time:.2f}s after the first one started"
+            )
+        self.close()
+        return insights_by_time_range, daily_insights_by_time_range
+
+    def close(self):
+        """Stop the background thread; fetches that have not started yet are cancelled"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
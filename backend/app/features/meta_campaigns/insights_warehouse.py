@@ -0,0 +1,326 @@
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Any, Set, Tuple
+import requests
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from app.core.db import SessionLocal
+from app.features.meta_campaigns import models
+from app.features.meta_campaigns.facebook_api_client import (
+    build_time_range_string,
+    fetch_account_level_insights,
+    insights_level,
+    safe_float_any,
+)
+from app.features.meta_campaigns.async_insights_report import AsyncInsightsReportError, run_async_insights_report
+from app.features.meta_campaigns.insights_aggregation import format_number
+from app.features.meta_campaigns.insights_cache import INSIGHTS_CACHE_MAX_DAYS, fetch_daily_insights_cached, is_fresh, window_days
+
+logger = logging.getLogger(__name__)
+
+# Days behind today the backfill keeps loaded (covers 30-day rule windows plus a margin)
+WAREHOUSE_BACKFILL_DAYS = 35
+# Days per report run when loading
+WAREHOUSE_LOAD_CHUNK_DAYS = 7
+# Monthly partitions older than this many months are dropped
+WAREHOUSE_RETENTION_MONTHS = 3
+# How often the backfill job runs per ad account (seconds); matches the cache's recent-day TTL
+WAREHOUSE_BACKFILL_INTERVAL = 3600
+# Job timeout of one backfill run (seconds): room for several async report runs, ending before the next run
+WAREHOUSE_BACKFILL_TIMEOUT = 3000
+
+# Metrics stored per object and day; ratios and cost_per_action_type are recomputed when reading
+WAREHOUSE_METRIC_FIELDS = ["spend", "impressions", "clicks", "actions", "action_values"]
+# Daily fields a rule can ask for that warehouse rows can answer (besides the level's ID field)
+WAREHOUSE_SERVABLE_FIELDS = set(WAREHOUSE_METRIC_FIELDS) | {"cost_per_action_type", "date_start", "date_stop"}
+
+PARTITION_PREFIX = f"{models.DailyInsight.__tablename__}_p"
+
+
+def _account_key(account_id: str) -> str:
+    return str(account_id or "").replace("act_", "")
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def ensure_partitions(db: Session, since: date, until: date):
+    """Create the monthly daily_insights partitions covering since..until (Postgres only)"""
+    if not _is_postgres(db):
+        return
+    month = _month_start(since)
+    while month <= until:
+        next_month = _next_month(month)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {PARTITION_PREFIX}{month:%Y_%m} PARTITION OF {models.DailyInsight.__tablename__} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        ))
+        month = next_month
+
+
+def drop_expired_partitions(db: Session, today: date):
+    """Drop partitions (and load records) older than WAREHOUSE_RETENTION_MONTHS"""
+    cutoff = _month_start(today)
+    for _ in range(WAREHOUSE_RETENTION_MONTHS):
+        cutoff = _month_start(cutoff - timedelta(days=1))
+    db.query(models.DailyInsightLoad).filter(models.DailyInsightLoad.date < cutoff).delete(synchronize_session=False)
+    if not _is_postgres(db):
+        return
+    partitions = db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :parent"
+    ), {"parent": models.DailyInsight.__tablename__}).scalars().all()
+    expired_before = f"{PARTITION_PREFIX}{cutoff:%Y_%m}"
+    for name in partitions:
+        if name.startswith(PARTITION_PREFIX) and name < expired_before:
+            logger.info(f"[WAREHOUSE] Dropping expired partition {name}")
+            db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+
+
+def _days_to_load(db: Session, account: str, level: str, today: date) -> List[date]:
+    """Days in the backfill range that were never loaded, or were loaded before they stopped changing"""
+    since = today - timedelta(days=WAREHOUSE_BACKFILL_DAYS)
+    loads = db.query(models.DailyInsightLoad.date, models.DailyInsightLoad.loaded_at).filter(
+        models.DailyInsightLoad.meta_account_id == account,
+        models.DailyInsightLoad.level == level,
+        models.DailyInsightLoad.date >= since,
+    ).all()
+    loaded_at_by_day = {day: loaded_at.timestamp() for day, loaded_at in loads}
+    now = time.time()
+    return [
+        day for day in (since + timedelta(days=offset) for offset in range(WAREHOUSE_BACKFILL_DAYS + 1))
+        if day not in loaded_at_by_day or not is_fresh(day, loaded_at_by_day[day], now)
+    ]
+
+
+def _load_spans(days: List[date]) -> List[Tuple[date, date]]:
+    """Split sorted days into contiguous (since, until) spans of at most WAREHOUSE_LOAD_CHUNK_DAYS days"""
+    spans: List[Tuple[date, date]] = []
+    for day in days:
+        if spans and day == spans[-1][1] + timedelta(days=1) and (day - spans[-1][0]).days < WAREHOUSE_LOAD_CHUNK_DAYS:
+            spans[-1] = (spans[-1][0], day)
+        else:
+            spans.append((day, day))
+    return spans
+
+
+def _fetch_account_daily_rows(account_id: str, access_token: str, level: str, since: date, until: date) -> List[Dict]:
+    """
+    Fetch daily rows for every object of `level` in the account: an async report run,
+    falling back to one paginated account-level call.
+    """
+    params = {
+        "level": level,
+        "fields": ",".join([f"{level}_id"] + WAREHOUSE_METRIC_FIELDS + ["date_start", "date_stop"]),
+        "time_range": build_time_range_string({"since": since.isoformat(), "until": until.isoformat()}),
+        "time_increment": "1",
+        "action_breakdowns": "action_type",
+    }
+    try:
+        return run_async_insights_report(account_id, access_token, params)
+    except (AsyncInsightsReportError, requests.exceptions.RequestException) as e:
+        logger.warning(f"[WAREHOUSE] Async report for {level} {since} - {until} failed ({str(e)}), falling back to an account-level call")
+    return fetch_account_level_insights(account_id, access_token, level, params, label="warehouse daily insights")
+
+
+def _store_span(db: Session, account: str, level: str, since: date, until: date, rows: List[Dict]):
+    """Replace the span's stored rows and mark its days as loaded (one transaction)"""
+    loaded_at = datetime.now(timezone.utc)
+    records = []
+    for row in rows:
+        object_id = row.get(f"{level}_id") or row.get("id")
+        if not object_id or not row.get("date_start"):
+            continue
+        records.append({
+            "meta_account_id": account,
+            "level": level,
+            "object_id": object_id,
+            "date": datetime.strptime(row["date_start"], "%Y-%m-%d").date(),
+            "spend": safe_float_any(row.get("spend"), 0.0),
+            "impressions": int(safe_float_any(row.get("impressions"), 0.0)),
+            "clicks": int(safe_float_any(row.get("clicks"), 0.0)),
+            "actions": row.get("actions"),
+            "action_values": row.get("action_values"),
+            "loaded_at": loaded_at,
+        })
+
+    days = [since + timedelta(days=offset) for offset in range((until - since).days + 1)]
+    db.query(models.DailyInsight).filter(
+        models.DailyInsight.meta_account_id == account,
+        models.DailyInsight.level == level,
+        models.DailyInsight.date.between(since, until),
+    ).delete(synchronize_session=False)
+    db.query(models.DailyInsightLoad).filter(
+        models.DailyInsightLoad.meta_account_id == account,
+        models.DailyInsightLoad.level == level,
+        models.DailyInsightLoad.date.between(since, until),
+    ).delete(synchronize_session=False)
+    if records:
+        db.bulk_insert_mappings(models.DailyInsight, records)
+    db.bulk_insert_mappings(models.DailyInsightLoad, [
+        {"meta_account_id": account, "level": level, "date": day, "loaded_at": loaded_at} for day in days
+    ])
+    db.commit()
+
+
+def backfill_daily_insights(db: Session, account_id: str, access_token: str, rule_level: str) -> int:
+    """
+    Load the days the warehouse is missing for one account and level.
+
+    Days already loaded after their attribution window closed are never requested again; recent
+    days and today are reloaded once their load is older than the insights cache would accept.
+
+    Args:
+        db: Database session
+        account_id: Meta Ad Account ID
+        access_token: Meta Access Token
+        rule_level: "campaign", "ad_set", or "ad"
+
+    Returns:
+        Number of days loaded
+    """
+    if not account_id.startswith("act_"):
+        account_id = f"act_{account_id}"
+    account = _account_key(account_id)
+    level = insights_level(rule_level)
+    today = datetime.now().date()
+
+    days = _days_to_load(db, account, level, today)
+    if not days:
+        logger.info(f"[WAREHOUSE] {level} insights for account {account} are up to date")
+        return 0
+
+    ensure_partitions(db, days[0], days[-1])
+    db.commit()
+    for since, until in _load_spans(days):
+        start_time = time.time()
+        rows = _fetch_account_daily_rows(account_id, access_token, level, since, until)
+        _store_span(db, account, level, since, until, rows)
+        logger.info(f"[WAREHOUSE] Loaded {len(rows)} {level} rows for account {account}, {since} - {until} in {time.time() - start_time:.2f}s")
+
+    drop_expired_partitions(db, today)
+    db.commit()
+    return len(days)
+
+
+def _to_insights_row(record: models.DailyInsight, level: str) -> Dict[str, Any]:
+    """Rebuild the daily row Meta would return (fetch_daily_insights shape) from a stored record"""
+    day = record.date.isoformat()
+    actions = record.actions or []
+    return {
+        f"{level}_id": record.object_id,
+        "date_start": day,
+        "date_stop": day,
+        "spend": format_number(record.spend),
+        "impressions": str(record.impressions),
+        "clicks": str(record.clicks),
+        "actions": actions,
+        "action_values": record.action_values or [],
+        "cost_per_action_type": [
+            {"action_type": entry["action_type"], "value": format_number(record.spend / safe_float_any(entry.get("value")))}
+            for entry in actions
+            if isinstance(entry, dict) and entry.get("action_type") and safe_float_any(entry.get("value")) > 0
+        ],
+    }
+
+
+def _read_warehouse_rows(account: str, level: str, ids: List[str], days: List[date]) -> Tuple[Dict[str, List[Dict]], Set[date]]:
+    """
+    Returns:
+        ({object_id: stored daily rows}, days whose stored load is fresh enough to use)
+    """
+    db = SessionLocal()
+    try:
+        loads = db.query(models.DailyInsightLoad.date, models.DailyInsightLoad.loaded_at).filter(
+            models.DailyInsightLoad.meta_account_id == account,
+            models.DailyInsightLoad.level == level,
+            models.DailyInsightLoad.date.between(days[0], days[-1]),
+        ).all()
+        now = time.time()
+        covered = {day for day, loaded_at in loads if is_fresh(day, loaded_at.timestamp(), now)}
+        if not covered:
+            return {}, covered
+
+        records = db.query(models.DailyInsight).filter(
+            models.DailyInsight.meta_account_id == account,
+            models.DailyInsight.level == level,
+            models.DailyInsight.date.between(min(covered), max(covered)),
+            models.DailyInsight.object_id.in_(ids),
+        ).all()
+        rows_by_id: Dict[str, List[Dict]] = {}
+        for record in records:
+            if record.date in covered:
+                rows_by_id.setdefault(record.object_id, []).append(_to_insights_row(record, level))
+        return rows_by_id, covered
+    finally:
+        db.close()
+
+
+def fetch_daily_insights_local_first(
+    account_id: str,
+    access_token: str,
+    rule_level: str,
+    ids: List[str],
+    time_range: Dict[str, Any],
+    max_concurrency: int = None,
+    fields: str = None,
+    account_item_count: int = None,
+) -> Dict[str, List[Dict]]:
+    """
+    fetch_daily_insights() that reads days loaded by the warehouse backfill from Postgres.
+
+    Only days the warehouse does not cover (typically today) go through the insights cache
+    and, if not cached either, to Meta. Field sets the warehouse cannot answer (metrics it
+    does not store) skip it.
+
+    Args:
+        Same as fetch_daily_insights
+
+    Returns:
+        {object_id: [daily rows sorted by date]}, like fetch_daily_insights
+    """
+    level = insights_level(rule_level)
+    days = window_days(time_range)
+    requested = set((fields or "").split(",")) - {f"{level}_id"}
+    if not ids or not fields or not requested <= WAREHOUSE_SERVABLE_FIELDS or len(days) > INSIGHTS_CACHE_MAX_DAYS:
+        return fetch_daily_insights_cached(
+            account_id, access_token, rule_level, ids, time_range,
+            max_concurrency=max_concurrency, fields=fields, account_item_count=account_item_count,
+        )
+
+    try:
+        daily_insights, covered = _read_warehouse_rows(_account_key(account_id), level, ids, days)
+    except SQLAlchemyError as e:
+        logger.warning(f"[WAREHOUSE] Could not read daily insights ({str(e)}), using the insights cache")
+        daily_insights, covered = {}, set()
+
+    missing = [day for day in days if day not in covered]
+    logger.info(f"[WAREHOUSE] {len(days) - len(missing)} of {len(days)} day(s) read from the warehouse for {len(ids)} {level} IDs")
+    if missing:
+        since, until = missing[0].isoformat(), missing[-1].isoformat()
+        fetched = fetch_daily_insights_cached(
+            account_id, access_token, rule_level, ids, {"since": since, "until": until},
+            max_concurrency=max_concurrency, fields=fields, account_item_count=account_item_count,
+        )
+        for obj_id in ids:
+            kept = [row for row in daily_insights.get(obj_id, []) if not since <= row["date_start"] <= until]
+            daily_insights[obj_id] = kept + fetched.get(obj_id, [])
+
+    return {
+        obj_id: sorted(rows, key=lambda row: row.get("date_start") or "")
+        for obj_id, rows in daily_insights.items()
+        if rows
+    }
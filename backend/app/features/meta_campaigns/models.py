@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Boolean, Date, DateTime, JSON, Text, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.db import Base
@@ -13,6 +13,7 @@ class AdAccount(Base):
     meta_account_id = Column(String, nullable=True)
     meta_access_token = Column(String, nullable=True)  # Encrypted in production
     slack_webhook_url = Column(String, nullable=True)  # Slack webhook URL for notifications
+    insights_concurrency = Column(Integer, nullable=True)  # Max parallel insights requests (None = default)
     is_default = Column(Boolean, default=False)
     connection_status = Column(Boolean, nullable=True)  # True if connection is active, False if failed, None if not tested
     connection_last_checked = Column(DateTime(timezone=True), nullable=True)  # Last time connection was tested
@@ -55,3 +56,33 @@ class RuleLog(Base):
     details = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+
+class DailyInsight(Base):
+    """
+    One object's insights for one day, loaded by the insights warehouse backfill (see insights_warehouse).
+
+    Range-partitioned by month on `date` (Postgres); partitions are created by the backfill.
+    """
+    __tablename__ = "daily_insights"
+    __table_args__ = {"postgresql_partition_by": "RANGE (date)"}
+
+    meta_account_id = Column(String, primary_key=True)  # Without the act_ prefix
+    level = Column(String, primary_key=True)  # Insights level: campaign, adset, or ad
+    object_id = Column(String, primary_key=True)
+    date = Column(Date, primary_key=True)
+    spend = Column(Float, nullable=False, default=0)
+    impressions = Column(BigInteger, nullable=False, default=0)
+    clicks = Column(BigInteger, nullable=False, default=0)
+    actions = Column(JSON, nullable=True)  # Raw actions list, for conditions reading other action types
+    action_values = Column(JSON, nullable=True)  # Raw action_values list
+    loaded_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class DailyInsightLoad(Base):
+    """Days the warehouse backfill has loaded per account and level (days without delivery have no DailyInsight rows)"""
+    __tablename__ = "daily_insight_loads"
+
+    meta_account_id = Column(String, primary_key=True)
+    level = Column(String, primary_key=True)
+    date = Column(Date, primary_key=True)
+    loaded_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,106 @@
+import logging
+import threading
+from typing import Dict, Optional
+from redis.exceptions import RedisError
+from app.jobs.queues import redis_conn
+
+logger = logging.getLogger(__name__)
+
+# Redis hash per (account, request kind): {"size": int, "successes": int}
+PAGE_SIZE_KEY_PREFIX = "meta:page_size"
+# Forget a learned size after a month without use, so accounts are re-probed at the default eventually
+PAGE_SIZE_TTL_SECONDS = 30 * 24 * 3600
+
+# After this many successful requests in a row at the current size, the size grows again
+GROWTH_AFTER_SUCCESSES = 5
+# Growth step as a fraction of the current size (halving on errors, +25% on recovery)
+GROWTH_FACTOR = 1.25
+
+# Fallback when Redis is unreachable: sizes are still adapted, but only for this process
+_local_state: Dict[str, Dict[str, int]] = {}
+_local_lock = threading.Lock()
+
+
+def _state_key(account_id: Optional[str], kind: str) -> str:
+    account = str(account_id or "").replace("act_", "")
+    return f"{PAGE_SIZE_KEY_PREFIX}:{account}:{kind}"
+
+
+def _load_state(key: str) -> Optional[Dict[str, int]]:
+    try:
+        raw = redis_conn.hgetall(key)
+    except RedisError as e:
+        logger.debug(f"[PAGE SIZE] Redis unavailable ({e}), using process-local page sizes")
+        with _local_lock:
+            state = _local_state.get(key)
+            return dict(state) if state else None
+    if not raw:
+        return None
+    try:
+        return {"size": int(raw.get(b"size", 0)), "successes": int(raw.get(b"successes", 0))}
+    except (TypeError, ValueError):
+        return None
+
+
+def _save_state(key: str, size: int, successes: int):
+    with _local_lock:
+        _local_state[key] = {"size": size, "successes": successes}
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.hset(key, mapping={"size": size, "successes": successes})
+        pipe.expire(key, PAGE_SIZE_TTL_SECONDS)
+        pipe.execute()
+    except RedisError as e:
+        logger.debug(f"[PAGE SIZE] Could not store page size in Redis ({e})")
+
+
+def get_page_size(account_id: Optional[str], kind: str, default: int, minimum: int = 1) -> int:
+    """
+    Return the page (or batch) size to use for an account and request kind.
+
+    Args:
+        account_id: Meta Ad Account ID
+        kind: Request kind, e.g. "entities:ad" or "insights_slice:adset"
+        default: Size to use when nothing was learned yet; also the upper bound
+        minimum: Lower bound
+
+    Returns:
+        Learned size clamped to [minimum, default]
+    """
+    state = _load_state(_state_key(account_id, kind))
+    if not state or state["size"] <= 0:
+        return default
+    return max(minimum, min(default, state["size"]))
+
+
+def record_too_large(account_id: Optional[str], kind: str, size: int, minimum: int = 1) -> int:
+    """
+    Halve the size after Meta rejected a request as asking for too much data.
+
+    Returns:
+        The new size (equal to `size` when it is already at `minimum`)
+    """
+    new_size = max(minimum, size // 2)
+    _save_state(_state_key(account_id, kind), new_size, 0)
+    logger.warning(f"[PAGE SIZE] {kind} for account {account_id}: Meta asked for less data at size {size}, using {new_size}")
+    return new_size
+
+
+def record_success(account_id: Optional[str], kind: str, size: int, default: int):
+    """
+    Count a successful request at `size`; every GROWTH_AFTER_SUCCESSES successes the size grows back
+    by GROWTH_FACTOR (up to `default`), so accounts settle on the largest size Meta accepts.
+    """
+    key = _state_key(account_id, kind)
+    state = _load_state(key)
+    if not state or size >= default:
+        # Nothing learned (or already back at the default): nothing to grow back
+        return
+
+    successes = state["successes"] + 1 if state["size"] == size else 1
+    if successes >= GROWTH_AFTER_SUCCESSES:
+        new_size = min(default, max(size + 1, int(size * GROWTH_FACTOR)))
+        logger.info(f"[PAGE SIZE] {kind} for account {account_id}: {successes} successful requests at size {size}, growing to {new_size}")
+        _save_state(key, new_size, 0)
+    else:
+        _save_state(key, size, successes)
@@ -10,6 +10,11 @@ logger = logging.getLogger(__name__)
 _rate_limit_history = {}  # {account_id: [{"timestamp": time, "usage": {...}}, ...]}
 _MAX_HISTORY = 10  # Keep last 10 readings per account
 
+# Latest usage snapshot per account, read by request_pacer to decide how fast to send
+# {account_key: {"timestamp": float, "app_pct": float, "account_pct": float, "buc_pct": float, "blocked_until": float}}
+_latest_usage = {}
+_APP_USAGE_KEY = "__app__"  # X-App-Usage is app-wide, not per account
+
 
 def track_rate_limit_usage(account_id: str, rate_limit_headers: dict, api_type: str = "read"):
     """
@@ -117,6 +122,114 @@ def track_rate_limit_usage(account_id: str, rate_limit_headers: dict, api_type:
                         logger.info(f"[RATE_LIMIT_TRACK] {header_name} - Reset time duration: {reset_duration} seconds ({reset_duration/60:.1f} minutes)")
 
 
+def account_key(account_id: Optional[str]) -> Optional[str]:
+    """Normalize account IDs so "act_123" and "123" share one usage entry"""
+    if not account_id:
+        return None
+    account_id = str(account_id)
+    return account_id[4:] if account_id.startswith("act_") else account_id
+
+
+def _max_pct(*values) -> float:
+    """Highest numeric percentage among the given values (missing/invalid values count as 0)"""
+    best = 0.0
+    for value in values:
+        try:
+            best = max(best, float(value or 0))
+        except (ValueError, TypeError):
+            continue
+    return best
+
+
+def record_latest_usage(account_id: Optional[str], rate_limit_headers: dict):
+    """
+    Store the latest utilisation percentages parsed from Meta's usage headers.
+
+    - X-App-Usage: call_count / total_cputime / total_time (percent of app limit)
+    - X-Ad-Account-Usage: acc_id_util_pct (percent of ad account limit)
+    - X-Business-Use-Case-Usage: per business use case call_count / total_cputime / total_time,
+      plus estimated_time_to_regain_access (minutes) when a limit has been hit
+
+    Args:
+        account_id: Ad account ID the response belongs to (None for app-wide usage only)
+        rate_limit_headers: Dict of rate limit headers
+    """
+    now = time.time()
+    parsed = {}
+    for header_name, header_value in rate_limit_headers.items():
+        if header_value:
+            try:
+                parsed[header_name] = json.loads(header_value)
+            except (json.JSONDecodeError, ValueError):
+                pass
+    if not parsed:
+        return
+
+    app_usage = parsed.get("X-App-Usage")
+    if isinstance(app_usage, dict):
+        _latest_usage[_APP_USAGE_KEY] = {
+            "timestamp": now,
+            "app_pct": _max_pct(app_usage.get("call_count"), app_usage.get("total_cputime"), app_usage.get("total_time")),
+            "account_pct": 0.0,
+            "buc_pct": 0.0,
+            "blocked_until": 0.0,
+        }
+
+    key = account_key(account_id)
+    if not key:
+        return
+
+    entry = {"timestamp": now, "app_pct": 0.0, "account_pct": 0.0, "buc_pct": 0.0, "blocked_until": 0.0}
+
+    account_usage = parsed.get("X-Ad-Account-Usage")
+    if isinstance(account_usage, dict):
+        entry["account_pct"] = _max_pct(account_usage.get("acc_id_util_pct"))
+
+    buc_usage = parsed.get("X-Business-Use-Case-Usage")
+    if isinstance(buc_usage, dict):
+        regain_minutes = 0.0
+        for usage_list in buc_usage.values():
+            if not isinstance(usage_list, list):
+                continue
+            for usage_item in usage_list:
+                if isinstance(usage_item, dict):
+                    entry["buc_pct"] = max(entry["buc_pct"], _max_pct(
+                        usage_item.get("call_count"), usage_item.get("total_cputime"), usage_item.get("total_time")
+                    ))
+                    regain_minutes = max(regain_minutes, _max_pct(usage_item.get("estimated_time_to_regain_access")))
+        if regain_minutes > 0:
+            entry["blocked_until"] = now + regain_minutes * 60
+
+    # Keep an earlier block deadline if it has not passed yet
+    previous = _latest_usage.get(key)
+    if previous and previous.get("blocked_until", 0) > entry["blocked_until"]:
+        entry["blocked_until"] = previous["blocked_until"]
+
+    _latest_usage[key] = entry
+
+
+def get_latest_usage(account_id: Optional[str] = None) -> Dict:
+    """
+    Return the latest usage snapshot for an account, merged with app-wide usage.
+
+    Returns:
+        {"timestamp", "app_pct", "account_pct", "buc_pct", "blocked_until"}; percentages are 0 when unknown
+    """
+    usage = {"timestamp": 0.0, "app_pct": 0.0, "account_pct": 0.0, "buc_pct": 0.0, "blocked_until": 0.0}
+    app_entry = _latest_usage.get(_APP_USAGE_KEY)
+    if app_entry:
+        usage["app_pct"] = app_entry["app_pct"]
+        usage["timestamp"] = app_entry["timestamp"]
+    key = account_key(account_id)
+    account_entry = _latest_usage.get(key) if key else None
+    if account_entry:
+        usage["account_pct"] = account_entry["account_pct"]
+        usage["buc_pct"] = account_entry["buc_pct"]
+        usage["blocked_until"] = account_entry["blocked_until"]
+        usage["timestamp"] = max(usage["timestamp"], account_entry["timestamp"])
+    return usage
+
+
 def check_rate_limit_headers(response: requests.Response, api_type: str = "read", account_id: Optional[str] = None):
     """
     Check and log Meta API rate limiting headers to monitor usage.
@@ -143,6 +256,9 @@ def check_rate_limit_headers(response: requests.Response, api_type: str = "read"
     if account_id:
         track_rate_limit_usage(account_id, rate_limit_headers, api_type)
 
+    # Keep the latest utilisation for request pacing
+    record_latest_usage(account_id, rate_limit_headers)
+
     # Only log if we have rate limit headers
     if any(rate_limit_headers.values()):
         usage_info = {}
@@ -0,0 +1,223 @@
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+from redis.exceptions import RedisError, WatchError
+from app.jobs.queues import redis_conn
+from app.features.meta_campaigns.rate_limit_tracker import account_key, get_latest_usage
+from app.features.meta_campaigns.request_pacer import MAX_REGAIN_WAIT, PACING_FREE_THRESHOLD, USAGE_STALE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Redis hash per bucket: {"tokens", "updated_at", "rate", "usage_pct", "rate_until", "blocked_until"}
+RATE_LIMIT_KEY_PREFIX = "meta:ratelimit"
+_APP_BUCKET = "app"  # One bucket for the whole Meta app, shared by every account
+
+# Burst size and steady refill rate (calls per second) once reported usage passes
+# PACING_FREE_THRESHOLD; below it (or with no recent reading) buckets do not meter calls at all
+APP_BUCKET_CAPACITY = 40
+APP_BUCKET_RATE = 20.0
+ACCOUNT_BUCKET_CAPACITY = 10
+ACCOUNT_BUCKET_RATE = 5.0
+
+# Refill never drops below this fraction of the base rate (one read every few seconds near 100%),
+# so the usage headers that would lift the rate again keep arriving
+MIN_RATE_FACTOR = 0.04
+
+# Idle buckets disappear after this long and start again full
+BUCKET_TTL_SECONDS = 3600
+
+# Concurrent acquirers retry the Redis transaction this many times before waiting briefly
+MAX_TRANSACTION_RETRIES = 5
+CONTENTION_WAIT = 0.05
+
+# Shortfalls below this count as covered, so float rounding in the refill never causes a near-zero wait
+TOKEN_EPSILON = 1e-6
+
+
+def _bucket_key(name: str) -> str:
+    return f"{RATE_LIMIT_KEY_PREFIX}:{name}"
+
+
+def _buckets(account_id: Optional[str]) -> List[Tuple[str, int, float]]:
+    """(key, capacity, base rate) of every bucket a call for this account draws from"""
+    buckets = [(_bucket_key(_APP_BUCKET), APP_BUCKET_CAPACITY, APP_BUCKET_RATE)]
+    key = account_key(account_id)
+    if key:
+        buckets.append((_bucket_key(f"account:{key}"), ACCOUNT_BUCKET_CAPACITY, ACCOUNT_BUCKET_RATE))
+    return buckets
+
+
+def _rate_factor(usage_pct: float) -> float:
+    """
+    Fraction of the base refill rate allowed at a utilisation percentage.
+
+    Full rate up to PACING_FREE_THRESHOLD, then a quadratic fall-off towards MIN_RATE_FACTOR
+    at 100%, mirroring the delay ramp in request_pacer.compute_delay.
+    """
+    if usage_pct <= PACING_FREE_THRESHOLD:
+        return 1.0
+    headroom = max(0.0, (100.0 - usage_pct) / (100.0 - PACING_FREE_THRESHOLD))
+    return max(MIN_RATE_FACTOR, headroom * headroom)
+
+
+def _field(state: Dict[bytes, bytes], name: str, default: float) -> float:
+    try:
+        return float(state[name.encode()])
+    except (KeyError, ValueError):
+        return default
+
+
+def _metered(state: Dict[bytes, bytes], now: float) -> bool:
+    """
+    Whether a bucket limits calls right now.
+
+    Only while Meta's latest reading for it (published by update_budgets) is above
+    PACING_FREE_THRESHOLD or an estimated_time_to_regain_access deadline is pending, so
+    calls at low usage never wait, like request_pacer.compute_delay.
+    """
+    if _field(state, "blocked_until", 0.0) > now:
+        return True
+    return _field(state, "rate_until", 0.0) > now and _field(state, "usage_pct", 0.0) > PACING_FREE_THRESHOLD
+
+
+def _refill(state: Dict[bytes, bytes], capacity: int, base_rate: float, now: float) -> Tuple[float, float]:
+    """
+    Returns:
+        (tokens available now, current refill rate)
+    """
+    rate = base_rate
+    if _field(state, "rate_until", 0.0) > now:
+        rate = _field(state, "rate", base_rate)
+    tokens = _field(state, "tokens", float(capacity))
+    elapsed = max(0.0, now - _field(state, "updated_at", now))
+    return min(float(capacity), tokens + elapsed * rate), rate
+
+
+def _try_acquire(buckets: List[Tuple[str, int, float]], cost: int) -> float:
+    """
+    Take `cost` tokens from every metered bucket at once, or none if any of them is short.
+
+    Buckets that are not metered (see _metered) are neither checked nor charged, and any
+    debt they carry is dropped so they start full when metering resumes. A call larger than a bucket's capacity (a big batch) only needs a full bucket and leaves
+    it in debt, which later calls pay off by waiting.
+
+    Returns:
+        0 if the tokens were taken, otherwise seconds until the scarcest bucket can serve the call
+    """
+    keys = [key for key, _, _ in buckets]
+    with redis_conn.pipeline() as pipe:
+        for _ in range(MAX_TRANSACTION_RETRIES):
+            try:
+                pipe.watch(*keys)
+                now = time.time()
+                wait = 0.0
+                available = []
+                reset = []
+                for key, capacity, base_rate in buckets:
+                    state = pipe.hgetall(key)
+                    if not _metered(state, now):
+                        if b"tokens" in state:
+                            reset.append(key)
+                        continue
+                    tokens, rate = _refill(state, capacity, base_rate, now)
+                    available.append((key, tokens))
+                    blocked_for = _field(state, "blocked_until", 0.0) - now
+                    needed = min(cost, capacity)
+                    if blocked_for > 0:
+                        wait = max(wait, blocked_for)
+                    elif needed - tokens > TOKEN_EPSILON:
+                        wait = max(wait, (needed - tokens) / rate)
+                if wait > 0:
+                    pipe.unwatch()
+                    return wait
+
+                if not available and not reset:
+                    pipe.unwatch()
+                    return 0.0
+
+                pipe.multi()
+                for key in reset:
+                    pipe.hdel(key, "tokens", "updated_at")
+                for key, tokens in available:
+                    pipe.hset(key, mapping={"tokens": tokens - cost, "updated_at": now})
+                    pipe.expire(key, BUCKET_TTL_SECONDS)
+                pipe.execute()
+                return 0.0
+            except WatchError:
+                continue
+    return CONTENTION_WAIT
+
+
+def acquire(account_id: Optional[str] = None, api_type: str = "read", cost: int = 1) -> Optional[float]:
+    """
+    Block until the shared app and ad account budgets allow a Graph API call.
+
+    Budgets are token buckets in Redis, so every worker process draws from the same ones.
+    They only meter calls while the latest usage Meta reported to any worker is above
+    PACING_FREE_THRESHOLD (see update_budgets), their refill rate then follows that usage, and while Meta reports estimated_time_to_regain_access for the
+    account nobody sends until the deadline.
+
+    Args:
+        account_id: Ad account the call is made for (None for app-level calls only)
+        api_type: Type of API call, for logs
+        cost: Calls Meta counts for this request (number of sub-requests for a batch)
+
+    Returns:
+        Seconds waited, or None if Redis is unavailable (the caller should fall back to request_pacer.pace)
+    """
+    buckets = _buckets(account_id)
+    waited = 0.0
+    while True:
+        try:
+            wait = _try_acquire(buckets, max(1, int(cost)))
+        except RedisError as e:
+            logger.debug(f"[RATE LIMITER] Redis unavailable ({e}), falling back to local pacing")
+            return None
+        if wait <= 0:
+            return waited
+        wait = min(wait, MAX_REGAIN_WAIT)
+        if wait >= 1:
+            logger.info(f"[RATE LIMITER] Budget for account {account_id} exhausted, waiting {wait:.2f}s before {api_type} call")
+        time.sleep(wait)
+        waited += wait
+
+
+def update_budgets(account_id: Optional[str] = None):
+    """
+    Publish the refill rates derived from the latest usage headers to the shared buckets.
+
+    The app bucket follows X-App-Usage; the account bucket follows the tighter of
+    X-Ad-Account-Usage and X-Business-Use-Case-Usage and carries the account's
+    estimated_time_to_regain_access deadline. Once the reading is USAGE_STALE_SECONDS old
+    the buckets stop metering until a new one arrives.
+
+    Args:
+        account_id: Ad account the response belonged to
+    """
+    usage = get_latest_usage(account_id)
+    now = time.time()
+    if not usage["timestamp"] or now - usage["timestamp"] > USAGE_STALE_SECONDS:
+        return
+    rate_until = usage["timestamp"] + USAGE_STALE_SECONDS
+
+    app_key, _, app_rate = _buckets(None)[0]
+    try:
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.hset(app_key, mapping={
+            "rate": app_rate * _rate_factor(usage["app_pct"]),
+            "usage_pct": usage["app_pct"],
+            "rate_until": rate_until,
+        })
+        pipe.expire(app_key, BUCKET_TTL_SECONDS)
+        for key, _, base_rate in _buckets(account_id)[1:]:
+            account_pct = max(usage["account_pct"], usage["buc_pct"])
+            pipe.hset(key, mapping={
+                "rate": base_rate * _rate_factor(account_pct),
+                "usage_pct": account_pct,
+                "rate_until": rate_until,
+                "blocked_until": usage["blocked_until"],
+            })
+            pipe.expire(key, BUCKET_TTL_SECONDS)
+        pipe.execute()
+    except RedisError as e:
+        logger.debug(f"[RATE LIMITER] Could not update shared budgets ({e})")
@@ -0,0 +1,103 @@
+import logging
+import time
+from typing import Optional
+from app.features.meta_campaigns.rate_limit_tracker import get_latest_usage
+
+logger = logging.getLogger(__name__)
+
+# Below this utilisation (percent of the tightest Meta limit) calls are sent without any delay
+PACING_FREE_THRESHOLD = 50.0
+
+# Delay applied just before hitting 100% utilisation, per call type (seconds).
+# Between PACING_FREE_THRESHOLD and 100% the delay grows quadratically, so pacing
+# barely kicks in at 60% and approaches these values only near the limit.
+PACING_MAX_DELAY = {
+    "read": 5.0,
+    "write": 8.0,
+    "insights": 10.0,
+}
+
+# Usage readings older than this are ignored: Meta's windows roll over, and the next
+# response refreshes the reading anyway.
+USAGE_STALE_SECONDS = 300
+
+# Utilisation at which concurrent fetchers are reduced to a single worker
+CONCURRENCY_FLOOR_PCT = 90.0
+
+# Never sleep longer than this for estimated_time_to_regain_access in one go
+MAX_REGAIN_WAIT = 600
+
+
+def current_usage_pct(account_id: Optional[str] = None) -> float:
+    """
+    Return the tightest known utilisation (0-100) for an account.
+
+    Takes the maximum of app usage (X-App-Usage), ad account usage (acc_id_util_pct)
+    and business use case usage (X-Business-Use-Case-Usage). Returns 0 when nothing
+    recent is known.
+    """
+    usage = get_latest_usage(account_id)
+    if not usage["timestamp"] or time.time() - usage["timestamp"] > USAGE_STALE_SECONDS:
+        return 0.0
+    return max(usage["app_pct"], usage["account_pct"], usage["buc_pct"])
+
+
+def compute_delay(usage_pct: float, api_type: str = "read") -> float:
+    """
+    Map a utilisation percentage to a delay before the next call.
+
+    0 below PACING_FREE_THRESHOLD, then a smooth quadratic ramp up to PACING_MAX_DELAY[api_type] at 100%.
+    """
+    if usage_pct <= PACING_FREE_THRESHOLD:
+        return 0.0
+    max_delay = PACING_MAX_DELAY.get(api_type, PACING_MAX_DELAY["read"])
+    ratio = min(1.0, (usage_pct - PACING_FREE_THRESHOLD) / (100.0 - PACING_FREE_THRESHOLD))
+    return max_delay * ratio * ratio
+
+
+def pace(account_id: Optional[str] = None, api_type: str = "read") -> float:
+    """
+    Wait as long as current usage requires before sending a Graph API call.
+
+    If Meta reported estimated_time_to_regain_access for the account, waits until that
+    deadline (capped at MAX_REGAIN_WAIT); otherwise applies compute_delay() to the latest
+    utilisation. Returns the number of seconds slept.
+    """
+    usage = get_latest_usage(account_id)
+    now = time.time()
+
+    blocked_for = usage["blocked_until"] - now
+    if blocked_for > 0:
+        wait = min(blocked_for, MAX_REGAIN_WAIT)
+        logger.warning(f"[PACING] Account {account_id} is throttled by Meta, waiting {wait:.1f}s (estimated_time_to_regain_access)")
+        time.sleep(wait)
+        return wait
+
+    usage_pct = current_usage_pct(account_id)
+    delay = compute_delay(usage_pct, api_type)
+    if delay > 0:
+        logger.info(f"[PACING] Usage at {usage_pct:.0f}% for account {account_id}, waiting {delay:.2f}s before {api_type} call")
+        time.sleep(delay)
+    return delay
+
+
+def effective_concurrency(account_id: Optional[str], configured: int) -> int:
+    """
+    Shrink a configured parallelism as utilisation rises.
+
+    Full `configured` parallelism up to PACING_FREE_THRESHOLD, then linearly fewer
+    workers down to a single one at CONCURRENCY_FLOOR_PCT. While Meta reports a block
+    (estimated_time_to_regain_access), only one request is allowed at a time.
+    """
+    configured = max(1, int(configured or 1))
+    usage = get_latest_usage(account_id)
+    if usage["blocked_until"] > time.time():
+        return 1
+
+    usage_pct = current_usage_pct(account_id)
+    if usage_pct <= PACING_FREE_THRESHOLD:
+        return configured
+    if usage_pct >= CONCURRENCY_FLOOR_PCT:
+        return 1
+    ratio = (CONCURRENCY_FLOOR_PCT - usage_pct) / (CONCURRENCY_FLOOR_PCT - PACING_FREE_THRESHOLD)
+    return max(1, int(round(1 + (configured - 1) * ratio)))
@@ -4,7 +4,7 @@ from app.core.db import get_db
 from app.dependencies import get_current_active_user
 from app.auth.models import User
 from app.features.meta_campaigns import schemas, service
-from app.features.meta_campaigns.scheduler_service import schedule_rule, unschedule_rule
+from app.features.meta_campaigns.scheduler_service import schedule_rule, unschedule_insights_backfill, unschedule_rule
 from typing import Optional
 
 router = APIRouter(prefix="/meta-campaigns", tags=["meta-campaigns"])
@@ -57,6 +57,9 @@ def update_rule(
     current_user: User = Depends(get_current_active_user)
 ):
     """Update a campaign rule"""
+    existing_rule = service.get_rule(db, rule_id)
+    previous_ad_account_id = existing_rule.ad_account_id if existing_rule else None
+
     # Unschedule the old rule first
     unschedule_rule(rule_id)
 
@@ -73,6 +76,10 @@ def update_rule(
     elif rule.enabled and rule.schedule_cron:
         schedule_rule(rule)
 
+    # The account's insights backfill stops once none of its rules is scheduled
+    if previous_ad_account_id is not None:
+        unschedule_insights_backfill(previous_ad_account_id)
+
     return rule
 
 
@@ -83,12 +90,17 @@ def delete_rule(
     current_user: User = Depends(get_current_active_user)
 ):
     """Delete a campaign rule"""
+    existing_rule = service.get_rule(db, rule_id)
+    ad_account_id = existing_rule.ad_account_id if existing_rule else None
+
     # Unschedule the rule first
     unschedule_rule(rule_id)
 
     success = service.delete_rule(db, rule_id)
     if not success:
         raise HTTPException(status_code=404, detail="Rule not found")
+    if ad_account_id is not None:
+        unschedule_insights_backfill(ad_account_id)
     return {"message": "Rule deleted successfully"}
 
 
@@ -4,6 +4,7 @@ from croniter import croniter
 from app.core.config import settings
 from app.jobs.queues import redis_conn
 from app.features.meta_campaigns import models, worker
+from app.features.meta_campaigns.insights_warehouse import WAREHOUSE_BACKFILL_INTERVAL, WAREHOUSE_BACKFILL_TIMEOUT
 from app.core.db import SessionLocal
 import logging
 import json
@@ -94,6 +95,8 @@ def schedule_rule(rule: models.CampaignRule):
             db.close()
         return None
 
+    schedule_insights_backfill(rule.ad_account_id)
+
     try:
         # Check if it's a JSON-wrapped schedule (all schedule types now support timezone)
         schedule_cron_str = rule.schedule_cron
@@ -307,6 +310,65 @@ def unschedule_rule(rule_id: int):
         return False
 
 
+def _insights_backfill_job_id(ad_account_id: int) -> str:
+    return f"insights_backfill_{ad_account_id}"
+
+
+def schedule_insights_backfill(ad_account_id: int):
+    """
+    Schedule the recurring daily insights warehouse backfill for an ad account (first run now).
+
+    Scheduled once per ad account: if the job already exists (another rule of the account, or a
+    restart), its schedule is kept, so saving rules does not start extra backfills.
+    """
+    job_id = _insights_backfill_job_id(ad_account_id)
+    try:
+        if job_id in scheduler:
+            return job_id
+        job = scheduler.schedule(
+            scheduled_time=datetime.utcnow(),
+            func=worker.backfill_account_insights,
+            args=[ad_account_id],
+            interval=WAREHOUSE_BACKFILL_INTERVAL,
+            repeat=None,  # Repeat indefinitely
+            timeout=WAREHOUSE_BACKFILL_TIMEOUT,
+            id=job_id
+        )
+        return job.id
+    except Exception as e:
+        logger.error(f"Error scheduling insights backfill for ad account {ad_account_id}: {str(e)}", exc_info=True)
+        return None
+
+
+def unschedule_insights_backfill(ad_account_id: int, only_if_unused: bool = True):
+    """
+    Remove an ad account's insights backfill job.
+
+    Args:
+        ad_account_id: Ad account ID
+        only_if_unused: Keep the job while the account still has an enabled, scheduled rule
+    """
+    if only_if_unused:
+        db = SessionLocal()
+        try:
+            in_use = db.query(models.CampaignRule).filter(
+                models.CampaignRule.ad_account_id == ad_account_id,
+                models.CampaignRule.enabled == True,
+                models.CampaignRule.schedule_cron.isnot(None)
+            ).first() is not None
+        finally:
+            db.close()
+        if in_use:
+            return False
+    try:
+        scheduler.cancel(_insights_backfill_job_id(ad_account_id))
+        logger.info(f"Unscheduled insights backfill for ad account {ad_account_id}")
+        return True
+    except Exception as e:
+        logger.error(f"Error unscheduling insights backfill for ad account {ad_account_id}: {str(e)}")
+        return False
+
+
 def reschedule_all_rules():
     """Load all enabled rules from database and schedule them"""
     db = SessionLocal()
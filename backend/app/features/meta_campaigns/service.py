@@ -1,18 +1,33 @@
 from sqlalchemy.orm import Session
 from app.features.meta_campaigns import models, schemas
 from datetime import datetime
-import requests
 import logging
 import time
-import json
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # Import from refactored modules
-from app.features.meta_campaigns.facebook_api_client import fetch_facebook_data, fetch_insights, fetch_daily_insights, build_time_range_string, fetch_ads_for_item
-from app.features.meta_campaigns.data_filtering import apply_scope_filters
-from app.features.meta_campaigns.condition_evaluator import calculate_metric_from_insights, evaluate_condition
-from app.features.meta_campaigns.action_executor import execute_action, send_slack_notification
-from app.features.meta_campaigns.rate_limit_tracker import check_rate_limit_headers
+from app.features.meta_campaigns.facebook_api_client import fetch_active_ad_counts
+from app.features.meta_campaigns.entity_snapshot import iter_entity_pages
+from app.features.meta_campaigns.data_filtering import build_scope_predicate
+from app.features.meta_campaigns.condition_evaluator import (
+    calculate_metric_from_insights,
+    COST_AGGREGATE_INSIGHTS,
+    COST_DAILY_INPUTS,
+    compile_conditions,
+    condition_cost,
+    is_item_only_condition,
+    normalize_insights,
+    fails_item_only_conditions,
+    skipped_condition_evaluation,
+)
+from app.features.meta_campaigns.evaluation_cache import input_digest, load_outcomes, rule_fingerprint, store_outcomes
+from app.features.meta_campaigns.columnar_evaluator import COLUMNAR_LOGGED_FAILING_ITEMS, COLUMNAR_MIN_ITEMS, evaluate_columnar
+from app.features.meta_campaigns.insights_prefetcher import InsightsPrefetcher
+from app.features.meta_campaigns.insights_cache import serves_aggregates_from_cache
+from app.features.meta_campaigns.insights_warehouse import fetch_daily_insights_local_first
+from app.features.meta_campaigns.field_planner import merge_fields, plan_entity_fields, plan_insights_fields, plan_daily_insights_fields, plan_daily_fields_for_aggregates
+from app.features.meta_campaigns.action_executor import execute_action
+from app.features.meta_campaigns.graph_api_transport import get_transport_stats, stats_since
 
 logger = logging.getLogger(__name__)
 
@@ -99,15 +114,25 @@ def create_rule_log(db: Session, rule_id: int, status: str, message: str, detail
 # ----------------------------
 # Rule Testing Orchestrator
 # ----------------------------
-def test_rule(db: Session, rule_id: int):
-    """Test a rule by fetching data, applying filters, and evaluating conditions"""
-    rule = get_rule(db, rule_id)
-    if not rule:
-        raise ValueError("Rule not found")
+def _time_range_key(tr):
+    """Create a hashable key from time range dict"""
+    if not tr:
+        return None
+    return (
+        tr.get("unit"),
+        tr.get("amount"),
+        tr.get("exclude_today", True)
+    )
 
-    if not rule.enabled:
-        create_rule_log(db, rule_id, "skipped", "Rule is disabled", {})
-        return {"message": "Rule is disabled", "rule_id": rule_id}
+
+def _plan_rule(db: Session, rule: models.CampaignRule) -> Dict[str, Any]:
+    """
+    Resolve a rule's credentials, conditions and data plan (no Graph API calls).
+
+    Raises:
+        ValueError: if the ad account or the Meta credentials are missing (an error log is written)
+    """
+    rule_id = rule.id
 
     # Get ad account for credentials
     from app.features.meta_campaigns.models import AdAccount
@@ -121,7 +146,6 @@ def test_rule(db: Session, rule_id: int):
 
     account_id = rule.meta_account_id or ad_account.meta_account_id
     access_token = rule.meta_access_token or ad_account.meta_access_token
-    slack_webhook_url = ad_account.slack_webhook_url
 
     if not account_id or not access_token:
         create_rule_log(db, rule_id, "error", "Meta account ID or access token missing", {})
@@ -150,399 +174,869 @@ def test_rule(db: Session, rule_id: int):
         "evaluations": []
     }
 
-    total_start_time = time.time()
-    logger.info(f"[TIMING] === Starting rule execution: rule_id={rule_id} (rule: {rule.name}) ===")
-
-    # Helper function to create a hashable key from time range dict
-    def time_range_key(tr):
-        """Create a hashable key from time range dict"""
-        if not tr:
-            return None
-        return (
-            tr.get("unit"),
-            tr.get("amount"),
-            tr.get("exclude_today", True)
-        )
+    # Group conditions by their time range (or use global if not specified).
+    # Done up front so insights can be fetched while entity pages are still streaming in.
+    condition_groups = {}
+    for idx, condition in enumerate(rule_conditions):
+        # Get time range for this condition (fallback to global)
+        condition_time_range = condition.get("time_range") or time_range
+        tr_key = _time_range_key(condition_time_range)
+
+        if tr_key not in condition_groups:
+            condition_groups[tr_key] = {
+                "time_range": condition_time_range,
+                "condition_indices": []
+            }
+        condition_groups[tr_key]["condition_indices"].append(idx)
+
+    # Ask Meta only for the fields the conditions read. Time ranges whose conditions need no
+    # aggregate insights (status, budget, cpp_winning_days, ...) get no aggregate fetch at all,
+    # and only time ranges with cpp_winning_days get daily rows. When a time range needs both,
+    # its aggregates are derived from the daily rows instead of fetching every ID twice.
+    # Aggregates over windows longer than the attribution window are derived from daily rows
+    # as well, so closed days come from the insights cache instead of being fetched again.
+    insights_fields_by_time_range = {}
+    daily_fields_by_time_range = {}
+    local_aggregate_fields_by_time_range = {}
+    for tr_key, group in condition_groups.items():
+        group_conditions = [rule_conditions[idx] for idx in group["condition_indices"]]
+        group_fields = plan_insights_fields(group_conditions, rule_level)
+        group_daily_fields = plan_daily_insights_fields(group_conditions, rule_level)
+        if group_daily_fields:
+            daily_fields_by_time_range[tr_key] = group_daily_fields
+            if group_fields:
+                local_aggregate_fields_by_time_range[tr_key] = group_fields
+        elif group_fields and serves_aggregates_from_cache(group["time_range"]):
+            daily_fields_by_time_range[tr_key] = plan_daily_fields_for_aggregates(group_fields, rule_level)
+            local_aggregate_fields_by_time_range[tr_key] = group_fields
+        elif group_fields:
+            insights_fields_by_time_range[tr_key] = group_fields
+    entity_fields = plan_entity_fields(rule_level, rule_conditions, scope_filters)
+    log_details["field_plan"] = {
+        "entity_fields": entity_fields,
+        "insights_fields": {str(k): v for k, v in insights_fields_by_time_range.items()},
+        "daily_insights_fields": {str(k): v for k, v in daily_fields_by_time_range.items()},
+        "aggregated_from_daily": [str(k) for k in local_aggregate_fields_by_time_range],
+    }
 
+    # Optimization: if the rule has an explicit status condition like status = ACTIVE/PAUSED,
+    # apply it at API level via effective_status IN [...]
+    status_in = None
     try:
-        # Step 1: Fetch data from Facebook API
-        step_start_time = time.time()
-        logger.info(f"[TIMING] Step 1 - Fetching {rule_level} data for rule {rule_id} (rule: {rule.name})")
-        # Optimization: if the rule has an explicit status condition like status = ACTIVE/PAUSED,
-        # apply it at API level via effective_status IN [...]
+        status_values = []
+        for cond in rule_conditions:
+            if cond.get("field") == "status" and cond.get("operator") == "=":
+                v = cond.get("value")
+                if isinstance(v, str) and v:
+                    status_values.append(v)
+        if status_values:
+            status_in = sorted(set(status_values))
+    except Exception:
         status_in = None
+
+    compiled_conditions = compile_conditions(rule_conditions)
+    condition_costs = [condition_cost(cond) for cond in rule_conditions]
+
+    return {
+        "rule": rule,
+        "account_id": account_id,
+        "access_token": access_token,
+        "slack_webhook_url": ad_account.slack_webhook_url,
+        "insights_concurrency": ad_account.insights_concurrency,
+        "rule_level": rule_level,
+        "scope_filters": scope_filters,
+        "time_range": time_range,
+        "rule_conditions": rule_conditions,
+        # Conditions compiled once per run and applied to every item (same order as rule_conditions)
+        "compiled_conditions": compiled_conditions,
+        "condition_costs": condition_costs,
+        "condition_groups": condition_groups,
+        # Conditions on entity fields (status, name, budget) are checked per page as it arrives;
+        # items failing one of them cannot meet the rule, so no insights are fetched for them
+        "item_only_conditions": compile_conditions([cond for cond in rule_conditions if is_item_only_condition(cond)]),
+        # Conditions on aggregate insights, as (time range key, compiled condition). Daily insights and
+        # active ad counts are only fetched for items passing them (and the item-only conditions)
+        "aggregate_conditions": [
+            (_time_range_key(cond.get("time_range") or time_range), compiled)
+            for cond, compiled, cost in zip(rule_conditions, compiled_conditions, condition_costs)
+            if cost == COST_AGGREGATE_INSIGHTS
+        ],
+        "needs_daily_inputs": COST_DAILY_INPUTS in condition_costs,
+        "insights_fields": insights_fields_by_time_range,
+        "daily_fields": daily_fields_by_time_range,
+        "local_aggregate_fields": local_aggregate_fields_by_time_range,
+        "entity_fields": entity_fields,
+        "status_in": status_in,
+        "log_details": log_details,
+    }
+
+
+def _merge_insights_plans(plans: List[Dict[str, Any]]) -> Tuple[Dict, Dict, Dict, Dict]:
+    """
+    Combine the insights plans of rules fetched together into one plan per time range.
+
+    A time range any rule needs daily rows for is fetched daily for all of them, with the
+    other rules' aggregate fields derived locally from the same rows.
+
+    Returns:
+        (time_ranges, insights_fields, daily_fields, local_aggregate_fields), keyed by time range key
+    """
+    rule_level = plans[0]["rule_level"]
+    time_ranges, aggregate_fields, daily_fields = {}, {}, {}
+    for plan in plans:
+        for tr_key, group in plan["condition_groups"].items():
+            time_ranges.setdefault(tr_key, group["time_range"])
+        for fields_by_time_range in (plan["insights_fields"], plan["local_aggregate_fields"]):
+            for tr_key, fields in fields_by_time_range.items():
+                aggregate_fields[tr_key] = merge_fields(aggregate_fields.get(tr_key), fields)
+        for tr_key, fields in plan["daily_fields"].items():
+            daily_fields[tr_key] = merge_fields(daily_fields.get(tr_key), fields)
+
+    insights_fields, local_aggregate_fields = {}, {}
+    for tr_key, fields in aggregate_fields.items():
+        if tr_key in daily_fields:
+            daily_fields[tr_key] = merge_fields(daily_fields[tr_key], plan_daily_fields_for_aggregates(fields, rule_level))
+            local_aggregate_fields[tr_key] = fields
+        else:
+            insights_fields[tr_key] = fields
+    return time_ranges, insights_fields, daily_fields, local_aggregate_fields
+
+
+def _fails_aggregate_conditions(item: Dict, conditions: List[Tuple[Any, Any]], insights_by_time_range: Dict, metrics_by_time_range: Dict) -> bool:
+    """
+    Return True if the item fails any of a rule's conditions on aggregate insights.
+
+    Conditions that cannot be evaluated (e.g. a malformed value) are left to the full evaluation.
+
+    Args:
+        item: The item to check
+        conditions: The plan's "aggregate_conditions", (time range key, compiled condition)
+        insights_by_time_range: {time range key: {item_id: insights}}
+        metrics_by_time_range: {time range key: {item_id: InsightsMetrics}}
+    """
+    item_id = item.get("id")
+    for tr_key, condition in conditions:
         try:
-            status_values = []
-            for cond in rule_conditions:
-                if cond.get("field") == "status" and cond.get("operator") == "=":
-                    v = cond.get("value")
-                    if isinstance(v, str) and v:
-                        status_values.append(v)
-            if status_values:
-                status_in = sorted(set(status_values))
-        except Exception:
-            status_in = None
-
-        all_data = fetch_facebook_data(
+            passed, _ = condition(
+                item,
+                insights_by_time_range.get(tr_key, {}).get(item_id, {}),
+                metrics=metrics_by_time_range.get(tr_key, {}).get(item_id),
+            )
+        except (ValueError, TypeError):
+            continue
+        if not passed:
+            return True
+    return False
+
+
+def _fetch_rules_data(plans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Fetch entities, insights and active ad counts once for rules sharing an account, token and level.
+
+    Entities are streamed once with the union of the rules' fields; each page is filtered per rule
+    (status prefilter, scope filters, item-only conditions), and insights are prefetched for the
+    union of the IDs any rule still needs. Inputs are fetched cheapest first (see condition_cost):
+    daily insights only cpp_winning_days reads and active ad counts are fetched after the aggregate
+    insights, for the items that passed the rule's conditions on them.
+
+    Returns:
+        {"per_rule": {rule_id: {"filtered_data", "failed_item_conditions_ids", "failed_insights_conditions_ids", "requested_ids"}},
+         "insights_by_time_range", "metrics_by_time_range", "daily_insights_by_time_range",
+         "active_ad_counts", "data_fetch"}
+    """
+    first = plans[0]
+    account_id, access_token, rule_level = first["account_id"], first["access_token"], first["rule_level"]
+    rule_ids = [plan["rule"].id for plan in plans]
+    time_ranges, insights_fields, daily_fields, local_aggregate_fields = _merge_insights_plans(plans)
+
+    # Step 1: Stream entities (from the synced snapshot, see entity_snapshot), applying scope filters to each page as it arrives
+    step_start_time = time.time()
+    logger.info(f"[TIMING] Step 1 - Streaming {rule_level} data for rule(s) {rule_ids}")
+    # The API-level status prefilter only applies if every rule has one
+    status_in = None
+    if all(plan["status_in"] for plan in plans):
+        status_in = sorted({status for plan in plans for status in plan["status_in"]})
+    entity_fields = merge_fields(*(plan["entity_fields"] for plan in plans))
+
+    # Step 2 (per page): scope filters are resolved once per rule into a predicate
+    scope_predicates = {}
+    for plan in plans:
+        logger.info(f"Scope filters: {plan['scope_filters']}")
+        scope_predicates[plan["rule"].id] = build_scope_predicate(plan["scope_filters"], rule_level, account_id, access_token)
+
+    # Daily rows for cpp_winning_days wait until the conditions on aggregate insights have been checked,
+    # if a rule needing them has any. Aggregates that would have been derived from those rows are then
+    # fetched from Meta, one row per item, unless the window is served from the insights cache anyway.
+    deferred_daily_fields = {}
+    for tr_key, fields in daily_fields.items():
+        if not any(plan["aggregate_conditions"] and tr_key in plan["daily_fields"] for plan in plans):
+            continue
+        if tr_key in local_aggregate_fields:
+            if serves_aggregates_from_cache(time_ranges[tr_key]):
+                continue
+            insights_fields[tr_key] = local_aggregate_fields.pop(tr_key)
+        deferred_daily_fields[tr_key] = fields
+    for plan in plans:
+        field_plan = plan["log_details"]["field_plan"]
+        for tr_key, fields in plan["local_aggregate_fields"].items():
+            if tr_key in insights_fields and str(tr_key) in field_plan["aggregated_from_daily"]:
+                field_plan["aggregated_from_daily"].remove(str(tr_key))
+                field_plan["insights_fields"][str(tr_key)] = fields
+        field_plan["daily_after_aggregate_conditions"] = [str(tr_key) for tr_key in deferred_daily_fields if tr_key in plan["daily_fields"]]
+
+    # Step 3 (per page): insights start in the background as filtered items arrive
+    prefetcher = InsightsPrefetcher(
+        account_id,
+        access_token,
+        rule_level,
+        time_ranges,
+        insights_fields,
+        daily_fields={tr_key: fields for tr_key, fields in daily_fields.items() if tr_key not in deferred_daily_fields},
+        local_aggregate_fields=local_aggregate_fields,
+        max_concurrency=first["insights_concurrency"],
+    )
+    total_items = 0
+    page_count = 0
+    sample_items = []
+    per_rule = {
+        plan["rule"].id: {"filtered_data": [], "failed_item_conditions_ids": set(), "failed_insights_conditions_ids": set(), "requested_ids": set()}
+        for plan in plans
+    }
+    try:
+        for page_items in iter_entity_pages(
             account_id,
             access_token,
             rule_level,
-            scope_filters=scope_filters,
+            scope_filters=first["scope_filters"] if len(plans) == 1 else None,
             effective_status_in=status_in,
-        )
-        step_elapsed = time.time() - step_start_time
-        logger.info(f"[TIMING] Step 1 completed in {step_elapsed:.2f} seconds - Fetched {len(all_data)} total {rule_level} items from Facebook API")
-        log_details["data_fetch"] = {
-            "total_items": len(all_data),
-            "items": all_data[:10]  # Log first 10 for reference
-        }
+            fields_override=entity_fields,
+        ):
+            page_count += 1
+            total_items += len(page_items)
+            if len(sample_items) < 10:
+                sample_items.extend(page_items[:10 - len(sample_items)])
+
+            page_ids = {}
+            for plan in plans:
+                rule_data = per_rule[plan["rule"].id]
+                scope_predicate = scope_predicates[plan["rule"].id]
+                # Rules whose status prefilter is narrower than the shared one apply it themselves
+                rule_status_in = plan["status_in"] if plan["status_in"] != status_in else None
+                for item in page_items:
+                    if rule_status_in and item.get("effective_status") not in rule_status_in:
+                        continue
+                    if not scope_predicate(item):
+                        continue
+                    rule_data["filtered_data"].append(item)
+                    if plan["item_only_conditions"] and fails_item_only_conditions(item, plan["item_only_conditions"]):
+                        rule_data["failed_item_conditions_ids"].add(item.get("id"))
+                    else:
+                        rule_data["requested_ids"].add(item.get("id"))
+                        page_ids[item.get("id")] = True
+            prefetcher.add(list(page_ids), page_item_count=len(page_items))
 
-        # Step 2: Apply scope filters
-        step_start_time = time.time()
-        logger.info(f"[TIMING] Step 2 - Applying scope filters for rule {rule_id}...")
-        logger.info(f"Applying scope filters for {rule_level} level. Starting with {len(all_data)} items.")
-        logger.info(f"Scope filters: {scope_filters}")
-        filtered_data = apply_scope_filters(all_data, scope_filters, rule_level, account_id, access_token)
         step_elapsed = time.time() - step_start_time
-        logger.info(f"[TIMING] Step 2 completed in {step_elapsed:.2f} seconds - After scope filtering: {len(filtered_data)} items remaining (from {len(all_data)} total)")
-        log_details["filtered_data"] = [
-            {
-                "id": item.get("id"),
-                "name": item.get("name"),
-                "status": item.get("status"),
-                "effective_status": item.get("effective_status")
-            }
-            for item in filtered_data
-        ]
+        filtered_count = sum(len(rule_data["filtered_data"]) for rule_data in per_rule.values())
+        failed_count = sum(len(rule_data["failed_item_conditions_ids"]) for rule_data in per_rule.values())
+        logger.info(
+            f"[TIMING] Step 1-2 completed in {step_elapsed:.2f} seconds - Streamed {total_items} {rule_level} items across {page_count} page(s), "
+            f"{filtered_count} passed scope filters, {failed_count} already fail a status/campaign status/name/budget condition"
+        )
 
-        # Step 3: Group conditions by time range and fetch insights
         step_start_time = time.time()
-        logger.info(f"[TIMING] Step 3 - Grouping conditions by time range and fetching insights")
-        filtered_ids = [item.get("id") for item in filtered_data]
-
-        # Group conditions by their time range (or use global if not specified)
-        condition_groups = {}
-        for idx, condition in enumerate(rule_conditions):
-            # Get time range for this condition (fallback to global)
-            condition_time_range = condition.get("time_range") or time_range
-            tr_key = time_range_key(condition_time_range)
-
-            if tr_key not in condition_groups:
-                condition_groups[tr_key] = {
-                    "time_range": condition_time_range,
-                    "condition_indices": []
-                }
-            condition_groups[tr_key]["condition_indices"].append(idx)
-
-        # Check if any condition uses cpp_winning_days (requires daily insights)
-        has_cpp_winning_days = any(
-            cond.get("field") == "cpp_winning_days" for cond in rule_conditions
-        )
+        logger.info(f"[TIMING] Step 3 - Waiting for insights of {len(insights_fields) + len(daily_fields) - len(deferred_daily_fields)} time range(s)")
+        insights_by_time_range, daily_insights_by_time_range = prefetcher.finish(account_item_count=total_items)
+    finally:
+        prefetcher.close()
+
+    for tr_key, group_insights in insights_by_time_range.items():
+        # Log insights summary for this time range
+        insights_with_data = sum(1 for v in group_insights.values() if v and len(v) > 0)
+        logger.info(f"[TIMING] Time range {time_ranges[tr_key]}: {insights_with_data} items have data out of {len(group_insights)} total")
+    step_elapsed = time.time() - step_start_time
+    logger.info(
+        f"[TIMING] Step 3 completed in {step_elapsed:.2f} seconds after the last page - "
+        f"Fetched insights for {len(insights_fields) + len(daily_fields) - len(deferred_daily_fields)} unique time range(s)"
+    )
 
-        # Fetch insights for each unique time range
-        insights_by_time_range = {}
-        daily_insights_by_time_range = {}  # For cpp_winning_days
-        total_insights_fetched = 0
-        for tr_key, group in condition_groups.items():
-            group_time_range = group["time_range"]
-            group_indices = group["condition_indices"]
-            logger.info(f"[TIMING] Fetching insights for {len(group_indices)} condition(s) with time range: {group_time_range}")
-
-            group_insights = fetch_insights(account_id, access_token, rule_level, filtered_ids, group_time_range)
-            insights_by_time_range[tr_key] = group_insights
-            total_insights_fetched += len(group_insights)
-
-            # If any condition in this group uses cpp_winning_days, also fetch daily insights
-            group_has_cpp_winning_days = any(
-                rule_conditions[idx].get("field") == "cpp_winning_days" for idx in group_indices
-            )
-            if group_has_cpp_winning_days:
-                logger.info(f"[TIMING] Fetching daily insights for CPP Winning Days calculation with time range: {group_time_range}")
-                group_daily_insights = fetch_daily_insights(account_id, access_token, rule_level, filtered_ids, group_time_range)
-                daily_insights_by_time_range[tr_key] = group_daily_insights
+    # Derive every metric once per item and time range; conditions then read them without rescanning actions
+    metrics_by_time_range = {
+        tr_key: {item_id: normalize_insights(insights) for item_id, insights in group_insights.items()}
+        for tr_key, group_insights in insights_by_time_range.items()
+    }
 
-            # Log insights summary for this time range
-            insights_with_data = sum(1 for v in group_insights.values() if v and len(v) > 0)
-            logger.info(f"[TIMING] Time range {group_time_range}: {insights_with_data} items have data out of {len(group_insights)} total")
+    # Step 3b: Check the conditions on aggregate insights for rules that also need daily insights or
+    # active ad counts; items failing one cannot meet the rule, so neither is fetched for them
+    for plan in plans:
+        if not plan["needs_daily_inputs"] or not plan["aggregate_conditions"]:
+            continue
+        rule_data = per_rule[plan["rule"].id]
+        for item in rule_data["filtered_data"]:
+            if item.get("id") not in rule_data["requested_ids"]:
+                continue
+            if _fails_aggregate_conditions(item, plan["aggregate_conditions"], insights_by_time_range, metrics_by_time_range):
+                rule_data["failed_insights_conditions_ids"].add(item.get("id"))
+        logger.info(
+            f"[TIMING] Rule {plan['rule'].id}: {len(rule_data['failed_insights_conditions_ids'])} of {len(rule_data['requested_ids'])} item(s) "
+            f"fail a condition on aggregate insights, skipping their daily insights and active ad counts"
+        )
 
+    # Step 3c: Daily insights held back above, for the items still able to meet a rule
+    if deferred_daily_fields:
+        step_start_time = time.time()
+        for tr_key, fields in deferred_daily_fields.items():
+            daily_ids = {}
+            for plan in plans:
+                if tr_key not in plan["daily_fields"]:
+                    continue
+                rule_data = per_rule[plan["rule"].id]
+                for item in rule_data["filtered_data"]:
+                    item_id = item.get("id")
+                    if item_id in rule_data["requested_ids"] and item_id not in rule_data["failed_insights_conditions_ids"]:
+                        daily_ids[item_id] = True
+            daily_insights_by_time_range[tr_key] = fetch_daily_insights_local_first(
+                account_id, access_token, rule_level, list(daily_ids), time_ranges[tr_key],
+                max_concurrency=first["insights_concurrency"], fields=fields, account_item_count=total_items,
+            ) if daily_ids else {}
+            logger.info(f"[TIMING] Time range {time_ranges[tr_key]}: daily insights fetched for {len(daily_ids)} item(s) passing the cheaper conditions")
         step_elapsed = time.time() - step_start_time
-        logger.info(f"[TIMING] Step 3 completed in {step_elapsed:.2f} seconds - Fetched insights for {len(condition_groups)} unique time range(s)")
-        log_details["insights_summary"] = {
-            "unique_time_ranges": len(condition_groups),
-            "time_range_groups": {
-                str(k): {
-                    "time_range": v["time_range"],
-                    "condition_count": len(v["condition_indices"])
-                }
-                for k, v in condition_groups.items()
-            },
-            "total_insights_fetched": total_insights_fetched
-        }
-
-        # Step 4: Pre-fetch campaign statuses if needed (for ad/ad_set levels with campaign_status conditions)
+        logger.info(f"[TIMING] Step 3c completed in {step_elapsed:.2f} seconds - Fetched daily insights for {len(deferred_daily_fields)} time range(s)")
+
+    # Step 4: Count active ads in bulk (instead of one ads fetch per item), for items passing every cheaper condition
+    active_ad_counts = {}
+    active_ads_parent_ids = {}
+    for plan in plans:
+        if not any(condition.get("field") == "amount_of_active_ads" for condition in plan["rule_conditions"]):
+            continue
+        rule_data = per_rule[plan["rule"].id]
+        for item in rule_data["filtered_data"]:
+            if item.get("id") in rule_data["failed_item_conditions_ids"] or item.get("id") in rule_data["failed_insights_conditions_ids"]:
+                continue
+            parent_id = item.get("adset_id") if rule_level == "ad" else item.get("id")
+            if parent_id:
+                active_ads_parent_ids[parent_id] = True
+            elif rule_level == "ad":
+                logger.warning(f"Ad {item.get('id')} has no adset_id, cannot count active ads")
+    if active_ads_parent_ids:
         step_start_time = time.time()
-        logger.info(f"[TIMING] Step 4 - Pre-fetching campaign statuses...")
-        campaign_status_cache = {}
-        has_campaign_status_condition = any(
-            cond.get("field") == "campaign_status" for cond in rule_conditions
-        )
-
-        if has_campaign_status_condition and rule_level in ["ad", "ad_set"]:
-            # Collect unique campaign IDs from filtered items
-            campaign_ids = set()
-            for item in filtered_data:
-                campaign_id = item.get("campaign_id")
-                if campaign_id:
-                    campaign_ids.add(str(campaign_id))
-
-            # Fetch campaign statuses if we have campaign IDs
-            if campaign_ids:
-                try:
-                    base_url = "https://graph.facebook.com/v21.0"
-                    if not account_id.startswith("act_"):
-                        account_id_formatted = f"act_{account_id}"
-                    else:
-                        account_id_formatted = account_id
-
-                    # Fetch campaigns in batches using filtering (Facebook API supports up to 50 IDs per filter)
-                    batch_size = 50
-                    campaign_ids_list = list(campaign_ids)
-                    for i in range(0, len(campaign_ids_list), batch_size):
-                        batch_ids = campaign_ids_list[i:i + batch_size]
-                        # Build filtering JSON string for campaign IDs
-                        filtering = f"[{{\"field\":\"campaign.id\",\"operator\":\"IN\",\"value\":[{','.join([f'\"{id_val}\"' for id_val in batch_ids])}]}}]"
-
-                        url = f"{base_url}/{account_id_formatted}/campaigns"
-                        params = {
-                            "fields": "id,status,effective_status",
-                            "filtering": filtering,
-                            "limit": batch_size,
-                            "access_token": access_token
-                        }
-                        response = requests.get(url, params=params, timeout=30)
-                        if response.status_code == 200:
-                            data = response.json()
-                            campaigns_data = data.get("data", [])
-                            for campaign in campaigns_data:
-                                campaign_id = str(campaign.get("id"))
-                                status = campaign.get("status") or campaign.get("effective_status")
-                                campaign_status_cache[campaign_id] = status
-                        else:
-                            logger.warning(f"Error fetching campaign statuses: {response.status_code} - {response.text}")
-                except Exception as e:
-                    logger.warning(f"Error fetching campaign statuses: {str(e)}")
-                    # Continue without campaign status cache - conditions will fail gracefully
+        # Campaigns and ad sets count their own ads; ads count the ads in their parent ad set
+        active_ads_parent_type = "campaign" if rule_level == "campaign" else "adset"
+        active_ad_counts = fetch_active_ad_counts(account_id, access_token, active_ads_parent_type, list(active_ads_parent_ids))
         step_elapsed = time.time() - step_start_time
-        logger.info(f"[TIMING] Step 4 completed in {step_elapsed:.2f} seconds - Campaign statuses cached: {len(campaign_status_cache)} campaigns")
+        logger.info(f"[TIMING] Step 4 completed in {step_elapsed:.2f} seconds - Active ads counted for {len(active_ad_counts)} {active_ads_parent_type}(s)")
+
+    return {
+        "per_rule": per_rule,
+        "insights_by_time_range": insights_by_time_range,
+        "metrics_by_time_range": metrics_by_time_range,
+        "daily_insights_by_time_range": daily_insights_by_time_range,
+        "active_ad_counts": active_ad_counts,
+        "data_fetch": {
+            "total_items": total_items,
+            "pages": page_count,
+            "items": sample_items,  # Log first 10 for reference
+        },
+    }
 
-        # Step 5: Evaluate conditions for each item
-        step_start_time = time.time()
-        logger.info(f"[TIMING] Step 5 - Evaluating conditions for {len(filtered_data)} items...")
-        items_meeting_conditions = []
 
-        for item in filtered_data:
-            item_id = item.get("id")
+def _evaluate_item(
+    item: Dict,
+    condition_specs: List[Dict[str, Any]],
+    failed_item_conditions_ids: set,
+    failed_insights_conditions_ids: set,
+    daily_insights_by_time_range: Dict,
+    active_ad_counts: Dict,
+    rule_level: str,
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Evaluate all of a rule's conditions for one item and build its log record.
+
+    Returns:
+        (evaluation record for log_details["evaluations"], True if all conditions passed)
+    """
+    item_id = item.get("id")
+
+    item_evaluation = {
+        "item_id": item_id,
+        "item_name": item.get("name"),
+        "conditions_evaluated": [],
+        "all_conditions_met": False
+    }
 
-            item_evaluation = {
-                "item_id": item_id,
-                "item_name": item.get("name"),
-                "conditions_evaluated": [],
-                "all_conditions_met": False
+    # Evaluate all conditions
+    all_passed = True
+    item_failed_early = item_id in failed_item_conditions_ids
+    item_failed_insights = item_id in failed_insights_conditions_ids
+    for spec in condition_specs:
+        condition = spec["condition"]
+        if item_failed_early and not spec["item_only"]:
+            # Item already fails a status/name/budget condition, so its insights were never fetched
+            item_evaluation["conditions_evaluated"].append(
+                skipped_condition_evaluation(condition, "Item already fails a status, campaign status, name or budget condition")
+            )
+            all_passed = False
+            continue
+        if item_failed_insights and spec["cost"] == COST_DAILY_INPUTS:
+            # Item already fails a condition on aggregate insights, so its daily insights and active ads were never fetched
+            item_evaluation["conditions_evaluated"].append(
+                skipped_condition_evaluation(condition, "Item already fails a condition on aggregate insights")
+            )
+            all_passed = False
+            continue
+
+        tr_key = spec["tr_key"]
+
+        # Get insights for this condition's time range
+        condition_insights = spec["insights"].get(item_id, {})
+
+        # Initialize variables for CPP winning days breakdown
+        cpp_winning_days_breakdown = []
+        cpp_winning_days_total_days = 0
+
+        # Handle CPP Winning Days - calculate from daily insights
+        if condition.get("field") == "cpp_winning_days":
+            threshold = condition.get("threshold")
+            if threshold is None:
+                logger.warning(f"CPP Winning Days condition missing threshold, skipping")
+                item_evaluation["conditions_evaluated"].append({
+                    "field": "cpp_winning_days",
+                    "operator": condition.get("operator"),
+                    "expected_value": condition.get("value"),
+                    "actual_value": None,
+                    "passed": False,
+                    "error": "Threshold not specified"
+                })
+                all_passed = False
+                continue
+
+            # Get daily insights for this time range
+            daily_insights_list = daily_insights_by_time_range.get(tr_key, {}).get(item_id, [])
+
+            # Calculate winning days (days where CPP < threshold)
+            # A "winning day" is a day where CPP was below the threshold
+            winning_days = 0
+            daily_cpp_breakdown = []  # For detailed logging and UI display
+            for daily_insight in daily_insights_list:
+                # Calculate CPP for this day
+                daily_cpp = calculate_metric_from_insights(daily_insight, "cpp")
+                date_start = daily_insight.get("date_start", "unknown")
+                spend = daily_insight.get("spend", 0)
+                actions = daily_insight.get("actions", [])
+                cost_per_action_type = daily_insight.get("cost_per_action_type", [])
+
+                # Count days where CPP is calculated (not None), greater than 0 (has purchases), and less than threshold
+                # If CPP is 0 or None, it means no purchases occurred, so skip that day
+                # Only count days with actual purchases (CPP > 0) that are below the threshold
+                is_winning = False
+                if daily_cpp is not None and daily_cpp > 0 and daily_cpp < threshold:
+                    winning_days += 1
+                    is_winning = True
+
+                # Store detailed breakdown for logging and evaluation
+                daily_cpp_breakdown.append({
+                    "date": date_start,
+                    "cpp": daily_cpp,
+                    "spend": spend,
+                    "is_winning": is_winning,
+                    "actions": actions,
+                    "cost_per_action_type": cost_per_action_type
+                })
+
+            # Add winning days count to insights as a synthetic metric
+            # Copy: the insights dict is shared by every rule of a batch and digested by evaluation_cache
+            condition_insights = dict(condition_insights or {})
+            condition_insights["cpp_winning_days"] = winning_days
+
+            # Log detailed breakdown
+            breakdown_parts = []
+            for d in daily_cpp_breakdown:
+                cpp_str = f"${d['cpp']:.2f}" if d['cpp'] is not None else "N/A"
+                winning_str = " (WINNING)" if d['is_winning'] else ""
+                breakdown_parts.append(f"{d['date']}: CPP={cpp_str}{winning_str}")
+            breakdown_str = ", ".join(breakdown_parts)
+            logger.info(f"Item {item_id}: Calculated {winning_days} winning days (CPP < {threshold}) from {len(daily_insights_list)} daily insights")
+            logger.info(f"Item {item_id} daily CPP breakdown: {breakdown_str}")
+
+            # Store breakdown for later use in evaluation
+            cpp_winning_days_breakdown = daily_cpp_breakdown
+            cpp_winning_days_total_days = len(daily_insights_list)
+
+        # Handle Amount of Active Ads - use the counts fetched in bulk in Step 4
+        if condition.get("field") == "amount_of_active_ads":
+            parent_id = item.get("adset_id") if rule_level == "ad" else item_id
+            ad_counts = active_ad_counts.get(parent_id, {"active": 0, "total": 0})
+            active_ads_count = ad_counts["active"]
+
+            # Add count to insights as a synthetic metric
+            condition_insights = dict(condition_insights or {})
+            condition_insights["amount_of_active_ads"] = active_ads_count
+            logger.info(f"Item {item_id}: Counted {active_ads_count} active ads out of {ad_counts['total']} total ads")
+
+        passed, evaluation = spec["evaluate"](item, condition_insights, metrics=spec["metrics"].get(item_id))
+        evaluation["time_range_used"] = spec["time_range_used"]
+
+        # Add CPP winning days breakdown to evaluation if this was a cpp_winning_days condition
+        if condition.get("field") == "cpp_winning_days":
+            evaluation["cpp_winning_days_breakdown"] = cpp_winning_days_breakdown
+            evaluation["cpp_winning_days_total_days"] = cpp_winning_days_total_days
+        item_evaluation["conditions_evaluated"].append(evaluation)
+        if not passed:
+            all_passed = False
+
+    item_evaluation["all_conditions_met"] = all_passed
+    return item_evaluation, all_passed
+
+
+def _input_digests(
+    items: List[Dict],
+    condition_specs: List[Dict[str, Any]],
+    daily_insights_by_time_range: Dict,
+    active_ad_counts: Dict,
+    rule_level: str,
+    fingerprint: str,
+) -> Dict[str, str]:
+    """
+    Digest the inputs the rule's conditions read for each item (see evaluation_cache.input_digest).
+
+    Covers the entity fields, the insights of every time range a condition reads, the daily rows
+    behind cpp_winning_days and the active ad count behind amount_of_active_ads.
+
+    Returns:
+        {item_id: digest}
+    """
+    # Each time range's insights and daily rows once, however many conditions read them
+    insights_sources = list({spec["tr_key"]: spec["insights"] for spec in condition_specs if not spec["item_only"]}.values())
+    daily_sources = list({
+        spec["tr_key"]: daily_insights_by_time_range.get(spec["tr_key"], {})
+        for spec in condition_specs if spec["condition"].get("field") == "cpp_winning_days"
+    }.values())
+    uses_active_ads = any(spec["condition"].get("field") == "amount_of_active_ads" for spec in condition_specs)
+
+    digests = {}
+    for item in items:
+        item_id = item.get("id")
+        if not item_id:
+            continue
+        inputs = (
+            item,
+            [source.get(item_id) for source in insights_sources],
+            [source.get(item_id) for source in daily_sources],
+            active_ad_counts.get(item.get("adset_id") if rule_level == "ad" else item_id) if uses_active_ads else None,
+        )
+        digests[item_id] = input_digest(fingerprint, inputs)
+    return digests
+
+
+def _evaluate_rule(db: Session, plan: Dict[str, Any], data: Dict[str, Any], transport_snapshot: Dict, total_start_time: float) -> Dict[str, Any]:
+    """Evaluate one rule against fetched data, execute its actions and write its RuleLog"""
+    rule = plan["rule"]
+    rule_id = rule.id
+    account_id, access_token, rule_level = plan["account_id"], plan["access_token"], plan["rule_level"]
+    time_range = plan["time_range"]
+    rule_conditions = plan["rule_conditions"]
+    condition_groups = plan["condition_groups"]
+    log_details = plan["log_details"]
+    rule_data = data["per_rule"][rule_id]
+    filtered_data = rule_data["filtered_data"]
+    failed_item_conditions_ids = rule_data["failed_item_conditions_ids"]
+    failed_insights_conditions_ids = rule_data["failed_insights_conditions_ids"]
+    insights_by_time_range = data["insights_by_time_range"]
+    daily_insights_by_time_range = data["daily_insights_by_time_range"]
+    active_ad_counts = data["active_ad_counts"]
+
+    log_details["data_fetch"] = dict(
+        data["data_fetch"],
+        failed_item_conditions_count=len(failed_item_conditions_ids),
+        failed_insights_conditions_count=len(failed_insights_conditions_ids),
+    )
+    log_details["filtered_data"] = [
+        {
+            "id": item.get("id"),
+            "name": item.get("name"),
+            "status": item.get("status"),
+            "effective_status": item.get("effective_status")
+        }
+        for item in filtered_data
+    ]
+
+    total_insights_fetched = 0
+    for tr_key in condition_groups:
+        group_insights = insights_by_time_range.get(tr_key, {})
+        total_insights_fetched += sum(1 for item_id in rule_data["requested_ids"] if item_id in group_insights)
+    log_details["insights_summary"] = {
+        "unique_time_ranges": len(condition_groups),
+        "time_range_groups": {
+            str(k): {
+                "time_range": v["time_range"],
+                "condition_count": len(v["condition_indices"])
             }
+            for k, v in condition_groups.items()
+        },
+        "total_insights_fetched": total_insights_fetched
+    }
 
-            # Evaluate all conditions
-            all_passed = True
-            for condition in rule_conditions:
-                # Get the time range for this condition (fallback to global)
-                condition_time_range = condition.get("time_range") or time_range
-                tr_key = time_range_key(condition_time_range)
-
-                # Get insights for this condition's time range
-                condition_insights = insights_by_time_range.get(tr_key, {}).get(item_id, {})
-
-                # Initialize variables for CPP winning days breakdown
-                cpp_winning_days_breakdown = []
-                cpp_winning_days_total_days = 0
-
-                # Handle CPP Winning Days - calculate from daily insights
-                if condition.get("field") == "cpp_winning_days":
-                    threshold = condition.get("threshold")
-                    if threshold is None:
-                        logger.warning(f"CPP Winning Days condition missing threshold, skipping")
-                        item_evaluation["conditions_evaluated"].append({
-                            "field": "cpp_winning_days",
-                            "operator": condition.get("operator"),
-                            "expected_value": condition.get("value"),
-                            "actual_value": None,
-                            "passed": False,
-                            "error": "Threshold not specified"
-                        })
-                        all_passed = False
-                        continue
+    # Step 5: Evaluate conditions for each item
+    step_start_time = time.time()
+    logger.info(f"[TIMING] Step 5 - Evaluating conditions for {len(filtered_data)} items...")
+    items_meeting_conditions = []
+
+    # Per-condition values that do not depend on the item
+    condition_specs = []
+    for condition, compiled_condition, cost in zip(rule_conditions, plan["compiled_conditions"], plan["condition_costs"]):
+        # Get the time range for this condition (fallback to global)
+        condition_time_range = condition.get("time_range") or time_range
+        tr_key = _time_range_key(condition_time_range)
+        condition_specs.append({
+            "condition": condition,
+            "evaluate": compiled_condition,
+            # Insights for this condition's time range, {item_id: insights}, and their metrics (see normalize_insights)
+            "insights": insights_by_time_range.get(tr_key, {}),
+            "metrics": data["metrics_by_time_range"].get(tr_key, {}),
+            "item_only": is_item_only_condition(condition),
+            "cost": cost,
+            "tr_key": tr_key,
+            # Log which time range was used for this condition
+            "time_range_used": condition_time_range if condition.get("time_range") else "global",
+        })
+
+    # Items whose inputs are identical to the previous run's reuse its outcome (see evaluation_cache)
+    digests = _input_digests(
+        filtered_data, condition_specs, daily_insights_by_time_range, active_ad_counts, rule_level,
+        rule_fingerprint(rule_level, time_range, rule_conditions),
+    )
+    reused_outcomes = {
+        item_id: (passed, record) for item_id, (digest, passed, record) in load_outcomes(rule_id).items()
+        if digests.get(item_id) == digest
+    }
+    pending_items = [item for item in filtered_data if item.get("id") not in reused_outcomes]
 
-                    # Get daily insights for this time range
-                    daily_insights_list = daily_insights_by_time_range.get(tr_key, {}).get(item_id, [])
-
-                    # Calculate winning days (days where CPP < threshold)
-                    # A "winning day" is a day where CPP was below the threshold
-                    winning_days = 0
-                    daily_cpp_breakdown = []  # For detailed logging and UI display
-                    for daily_insight in daily_insights_list:
-                        # Calculate CPP for this day
-                        daily_cpp = calculate_metric_from_insights(daily_insight, "cpp")
-                        date_start = daily_insight.get("date_start", "unknown")
-                        spend = daily_insight.get("spend", 0)
-                        actions = daily_insight.get("actions", [])
-                        cost_per_action_type = daily_insight.get("cost_per_action_type", [])
-
-                        # Count days where CPP is calculated (not None), greater than 0 (has purchases), and less than threshold
-                        # If CPP is 0 or None, it means no purchases occurred, so skip that day
-                        # Only count days with actual purchases (CPP > 0) that are below the threshold
-                        is_winning = False
-                        if daily_cpp is not None and daily_cpp > 0 and daily_cpp < threshold:
-                            winning_days += 1
-                            is_winning = True
-
-                        # Store detailed breakdown for logging and evaluation
-                        daily_cpp_breakdown.append({
-                            "date": date_start,
-                            "cpp": daily_cpp,
-                            "spend": spend,
-                            "is_winning": is_winning,
-                            "actions": actions,
-                            "cost_per_action_type": cost_per_action_type
-                        })
-
-                    # Add winning days count to insights as a synthetic metric
-                    if not condition_insights:
-                        condition_insights = {}
-                    condition_insights["cpp_winning_days"] = winning_days
-
-                    # Log detailed breakdown
-                    breakdown_parts = []
-                    for d in daily_cpp_breakdown:
-                        cpp_str = f"${d['cpp']:.2f}" if d['cpp'] is not None else "N/A"
-                        winning_str = " (WINNING)" if d['is_winning'] else ""
-                        breakdown_parts.append(f"{d['date']}: CPP={cpp_str}{winning_str}")
-                    breakdown_str = ", ".join(breakdown_parts)
-                    logger.info(f"Item {item_id}: Calculated {winning_days} winning days (CPP < {threshold}) from {len(daily_insights_list)} daily insights")
-                    logger.info(f"Item {item_id} daily CPP breakdown: {breakdown_str}")
-
-                    # Store breakdown for later use in evaluation
-                    cpp_winning_days_breakdown = daily_cpp_breakdown
-                    cpp_winning_days_total_days = len(daily_insights_list)
-
-                # Handle Amount of Active Ads - fetch and count active ads
-                if condition.get("field") == "amount_of_active_ads":
-                    # Determine what to count based on rule level
-                    if rule_level == "campaign":
-                        # Count ads in this campaign
-                        ads = fetch_ads_for_item(account_id, access_token, item_id, "campaign")
-                    elif rule_level == "ad_set":
-                        # Count ads in this adset
-                        ads = fetch_ads_for_item(account_id, access_token, item_id, "adset")
-                    elif rule_level == "ad":
-                        # Count ads in the parent adset
-                        adset_id = item.get("adset_id")
-                        if adset_id:
-                            ads = fetch_ads_for_item(account_id, access_token, adset_id, "adset")
-                        else:
-                            logger.warning(f"Ad {item_id} has no adset_id, cannot count active ads")
-                            ads = []
-                    else:
-                        ads = []
-
-                    # Count ads with ACTIVE status
-                    active_ads_count = 0
-                    for ad in ads:
-                        status = ad.get("status") or ad.get("effective_status")
-                        if status == "ACTIVE":
-                            active_ads_count += 1
-
-                    # Add count to insights as a synthetic metric
-                    if not condition_insights:
-                        condition_insights = {}
-                    condition_insights["amount_of_active_ads"] = active_ads_count
-                    logger.info(f"Item {item_id}: Counted {active_ads_count} active ads out of {len(ads)} total ads")
-
-                # Log which time range was used for this condition
-                time_range_used = condition_time_range if condition.get("time_range") else "global"
-                evaluation_context = {
-                    "time_range_used": time_range_used,
-                    "time_range_key": str(tr_key) if tr_key else "global"
-                }
-
-                passed, evaluation = evaluate_condition(item, condition_insights, condition, campaign_status_cache)
-                evaluation["time_range_used"] = time_range_used
-
-                # Add CPP winning days breakdown to evaluation if this was a cpp_winning_days condition
-                if condition.get("field") == "cpp_winning_days":
-                    evaluation["cpp_winning_days_breakdown"] = cpp_winning_days_breakdown
-                    evaluation["cpp_winning_days_total_days"] = cpp_winning_days_total_days
-                item_evaluation["conditions_evaluated"].append(evaluation)
-                if not passed:
-                    all_passed = False
-
-            item_evaluation["all_conditions_met"] = all_passed
-            log_details["evaluations"].append(item_evaluation)
+    passed_flags = None
+    if len(pending_items) >= COLUMNAR_MIN_ITEMS:
+        passed_flags = evaluate_columnar(
+            pending_items, condition_specs, failed_item_conditions_ids, active_ad_counts, rule_level,
+            failed_insights_ids=failed_insights_conditions_ids,
+        )
+    pending_flags = iter(passed_flags) if passed_flags is not None else None
+
+    # Full records for every item evaluated one by one. With columnar evaluation, only for items meeting
+    # the conditions and the first COLUMNAR_LOGGED_FAILING_ITEMS others, so large rules do not build
+    # (and store) one per item. Reused items are not evaluated again: those meeting the conditions are
+    # logged with the record stored by the run that evaluated them, the others are only counted.
+    outcomes = {}
+    passing_records = {}
+    failing_logged = 0
+    for item in filtered_data:
+        item_id = item.get("id")
+        if item_id in reused_outcomes:
+            all_passed, stored_record = reused_outcomes[item_id]
+            outcomes[item_id] = all_passed
+            if all_passed and stored_record is not None:
+                log_details["evaluations"].append(stored_record)
+                passing_records[item_id] = stored_record
+                items_meeting_conditions.append(item)
+                continue
+            log_record = all_passed
+        elif pending_flags is not None:
+            all_passed = outcomes[item_id] = next(pending_flags)
+            log_record = all_passed or failing_logged < COLUMNAR_LOGGED_FAILING_ITEMS
+            if not all_passed and log_record:
+                failing_logged += 1
+        else:
+            all_passed = None
+            log_record = True
 
+        if log_record:
+            item_evaluation, evaluated = _evaluate_item(
+                item, condition_specs, failed_item_conditions_ids, failed_insights_conditions_ids,
+                daily_insights_by_time_range, active_ad_counts, rule_level,
+            )
+            log_details["evaluations"].append(item_evaluation)
+            if all_passed is None:
+                all_passed = outcomes[item_id] = evaluated
             if all_passed:
-                items_meeting_conditions.append(item)
-        step_elapsed = time.time() - step_start_time
-        logger.info(f"[TIMING] Step 5 completed in {step_elapsed:.2f} seconds - {len(items_meeting_conditions)} item(s) met all conditions out of {len(filtered_data)} evaluated")
-
-        # Step 6: Determine decision
-        decision = "proceed" if len(items_meeting_conditions) > 0 else "skip"
-        log_details["decision"] = decision
-        log_details["items_meeting_conditions_count"] = len(items_meeting_conditions)
-        log_details["items_meeting_conditions"] = [
-            {"id": item.get("id"), "name": item.get("name")}
-            for item in items_meeting_conditions
-        ]
-
-        # Step 7: Execute actions if conditions are met
-        step_start_time = time.time()
-        logger.info(f"[TIMING] Step 7 - Executing actions on {len(items_meeting_conditions)} items...")
-        actions_executed = []
-        if decision == "proceed" and len(items_meeting_conditions) > 0:
-            rule_actions = rule.actions.get("actions", [])
-            for action in rule_actions:
-                action_results = execute_action(
-                    account_id, access_token, rule_level,
-                    items_meeting_conditions, action,
-                    slack_webhook_url=slack_webhook_url,
-                    rule_name=rule.name
-                )
-                actions_executed.extend(action_results)
-        step_elapsed = time.time() - step_start_time
-        logger.info(f"[TIMING] Step 7 completed in {step_elapsed:.2f} seconds - Executed {len(actions_executed)} action(s)")
+                passing_records[item_id] = item_evaluation
+        if all_passed:
+            items_meeting_conditions.append(item)
+
+    store_outcomes(rule_id, {
+        item_id: (digest, outcomes[item_id], passing_records.get(item_id))
+        for item_id, digest in digests.items()
+    })
+    log_details["evaluation_summary"] = {
+        "engine": "columnar" if passed_flags is not None else "per_item",
+        "items_evaluated": len(pending_items),
+        "items_reused": len(reused_outcomes),
+        "evaluations_logged": len(log_details["evaluations"]),
+        "evaluations_omitted": len(filtered_data) - len(log_details["evaluations"]),
+    }
+    logger.info(f"[EVALUATION CACHE] Rule {rule_id}: {len(reused_outcomes)} item(s) unchanged since the last run, {len(pending_items)} re-evaluated")
+    step_elapsed = time.time() - step_start_time
+    logger.info(f"[TIMING] Step 5 completed in {step_elapsed:.2f} seconds - {len(items_meeting_conditions)} item(s) met all conditions out of {len(filtered_data)} evaluated")
+
+    # Step 6: Determine decision
+    decision = "proceed" if len(items_meeting_conditions) > 0 else "skip"
+    log_details["decision"] = decision
+    log_details["items_meeting_conditions_count"] = len(items_meeting_conditions)
+    log_details["items_meeting_conditions"] = [
+        {"id": item.get("id"), "name": item.get("name")}
+        for item in items_meeting_conditions
+    ]
+
+    # Step 7: Execute actions if conditions are met
+    step_start_time = time.time()
+    logger.info(f"[TIMING] Step 7 - Executing actions on {len(items_meeting_conditions)} items...")
+    actions_executed = []
+    if decision == "proceed" and len(items_meeting_conditions) > 0:
+        rule_actions = rule.actions.get("actions", [])
+        for action in rule_actions:
+            action_results = execute_action(
+                account_id, access_token, rule_level,
+                items_meeting_conditions, action,
+                slack_webhook_url=plan["slack_webhook_url"],
+                rule_name=rule.name
+            )
+            actions_executed.extend(action_results)
+    step_elapsed = time.time() - step_start_time
+    logger.info(f"[TIMING] Step 7 completed in {step_elapsed:.2f} seconds - Executed {len(actions_executed)} action(s)")
+
+    log_details["actions_executed"] = actions_executed
+
+    # Step 8: Log results
+    if actions_executed:
+        success_count = sum(1 for a in actions_executed if a.get("success", False))
+        message = f"Executed actions on {success_count}/{len(actions_executed)} item(s). {len(items_meeting_conditions)} item(s) met all conditions."
+    else:
+        message = f"Test completed: {len(items_meeting_conditions)} item(s) meet all conditions"
+    status = "success" if decision == "proceed" else "skipped"
+
+    total_elapsed = time.time() - total_start_time
+    log_details["http_stats"] = stats_since(transport_snapshot)
+    logger.info(f"[TIMING] === Rule execution completed in {total_elapsed:.2f} seconds total ===")
+    logger.info(f"[TIMING] Graph API traffic for this run: {log_details['http_stats']}")
+
+    create_rule_log(db, rule_id, status, message, log_details)
+
+    return {
+        "message": message,
+        "rule_id": rule_id,
+        "decision": decision,
+        "items_checked": len(filtered_data),
+        "items_meeting_conditions": len(items_meeting_conditions),
+        "log_details": log_details
+    }
 
-        log_details["actions_executed"] = actions_executed
 
-        # Step 8: Log results
-        if actions_executed:
-            success_count = sum(1 for a in actions_executed if a.get("success", False))
-            message = f"Executed actions on {success_count}/{len(actions_executed)} item(s). {len(items_meeting_conditions)} item(s) met all conditions."
-        else:
-            message = f"Test completed: {len(items_meeting_conditions)} item(s) meet all conditions"
-        status = "success" if decision == "proceed" else "skipped"
+def _log_rule_error(db: Session, plan: Dict[str, Any], error: Exception, transport_snapshot: Dict):
+    rule_id = plan["rule"].id
+    logger.error(f"Error testing rule {rule_id}: {str(error)}", exc_info=error)
+    log_details = plan["log_details"]
+    log_details["error"] = str(error)
+    log_details["http_stats"] = stats_since(transport_snapshot)
+    create_rule_log(db, rule_id, "error", f"Error testing rule: {str(error)}", log_details)
 
-        total_elapsed = time.time() - total_start_time
-        logger.info(f"[TIMING] === Rule execution completed in {total_elapsed:.2f} seconds total ===")
 
-        create_rule_log(db, rule_id, status, message, log_details)
+def _run_plans(db: Session, plans: List[Dict[str, Any]], on_result: Optional[Callable[[int, Any], None]] = None) -> Dict[int, Any]:
+    """
+    Fetch data once for rules sharing an account, token and level, then evaluate each rule.
 
-        return {
-            "message": message,
-            "rule_id": rule_id,
-            "decision": decision,
-            "items_checked": len(filtered_data),
-            "items_meeting_conditions": len(items_meeting_conditions),
-            "log_details": log_details
-        }
+    Args:
+        db: Database session
+        plans: Plans from _plan_rule
+        on_result: Called with (rule_id, result) as soon as each rule is done
+
+    Returns:
+        {rule_id: result dict, or the exception the rule failed with (already logged)}
+    """
+    total_start_time = time.time()
+    transport_snapshot = get_transport_stats()
+    rule_ids = [plan["rule"].id for plan in plans]
+    for plan in plans:
+        logger.info(f"[TIMING] === Starting rule execution: rule_id={plan['rule'].id} (rule: {plan['rule'].name}) ===")
+        if len(plans) > 1:
+            plan["log_details"]["batched_rule_ids"] = rule_ids
 
+    try:
+        data = _fetch_rules_data(plans)
     except Exception as e:
-        logger.error(f"Error testing rule {rule_id}: {str(e)}", exc_info=True)
-        log_details["error"] = str(e)
-        create_rule_log(db, rule_id, "error", f"Error testing rule: {str(e)}", log_details)
-        raise
+        results = {}
+        for plan in plans:
+            _log_rule_error(db, plan, e, transport_snapshot)
+            results[plan["rule"].id] = e
+            if on_result:
+                on_result(plan["rule"].id, e)
+        return results
+
+    results = {}
+    for plan in plans:
+        try:
+            results[plan["rule"].id] = _evaluate_rule(db, plan, data, transport_snapshot, total_start_time)
+        except Exception as e:
+            _log_rule_error(db, plan, e, transport_snapshot)
+            results[plan["rule"].id] = e
+        if on_result:
+            on_result(plan["rule"].id, results[plan["rule"].id])
+    return results
+
+
+def test_rule(db: Session, rule_id: int):
+    """Test a rule by fetching data, applying filters, and evaluating conditions"""
+    rule = get_rule(db, rule_id)
+    if not rule:
+        raise ValueError("Rule not found")
+
+    if not rule.enabled:
+        create_rule_log(db, rule_id, "skipped", "Rule is disabled", {})
+        return {"message": "Rule is disabled", "rule_id": rule_id}
+
+    plan = _plan_rule(db, rule)
+    result = _run_plans(db, [plan])[rule_id]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def run_rules_batch(db: Session, rule_ids: List[int], on_result: Optional[Callable[[int, Any], None]] = None) -> Dict[int, Any]:
+    """
+    Run several rules, fetching data once per Meta account, token and rule level.
+
+    Rules of one group share one entity stream, one insights plan (the union of their time ranges
+    and fields) and one active ads count; each rule is still evaluated on its own scope, gets its
+    own RuleLog and executes its own actions.
+
+    Args:
+        db: Database session
+        rule_ids: Rules to run (disabled or missing rules are skipped)
+        on_result: Called with (rule_id, result) as soon as each rule is done, so callers can record
+            finished rules before the rest of the batch completes
+
+    Returns:
+        {rule_id: result dict like test_rule's, or the exception the rule failed with (already logged)}
+    """
+    results = {}
+
+    def finish(rule_id: int, result: Any):
+        results[rule_id] = result
+        if on_result:
+            on_result(rule_id, result)
+
+    groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+    for rule_id in dict.fromkeys(rule_ids):
+        rule = get_rule(db, rule_id)
+        if not rule:
+            finish(rule_id, ValueError("Rule not found"))
+            continue
+        if not rule.enabled:
+            create_rule_log(db, rule_id, "skipped", "Rule is disabled", {})
+            finish(rule_id, {"message": "Rule is disabled", "rule_id": rule_id})
+            continue
+        try:
+            plan = _plan_rule(db, rule)
+        except ValueError as e:
+            finish(rule_id, e)
+            continue
+        groups.setdefault((plan["account_id"], plan["access_token"], plan["rule_level"]), []).append(plan)
+
+    for (account_id, _access_token, rule_level), plans in groups.items():
+        logger.info(f"[BATCH] Running {len(plans)} {rule_level}-level rule(s) on account {account_id} with one data fetch: {[plan['rule'].id for plan in plans]}")
+        results.update(_run_plans(db, plans, on_result=on_result))
+    return results
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import time
+import uuid
+import zlib
+from typing import Any, Callable, Optional, TypeVar
+from redis.exceptions import RedisError
+from app.jobs.queues import redis_conn
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_KEY_PREFIX = "meta:single_flight"
+# Max seconds a leader may take (the async report timeout); followers wait at most this long
+SINGLE_FLIGHT_LOCK_TIMEOUT = 900
+# How long a finished result stays reusable, for rules that start a little later in the same minute
+SINGLE_FLIGHT_RESULT_TTL = 120
+# Followers check for the leader's result this often (seconds)
+SINGLE_FLIGHT_POLL_INTERVAL = 0.5
+
+
+def request_key(*parts: Any) -> str:
+    """Stable key for a request described by JSON-serializable parts (account, level, params, ...)"""
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+    return f"{SINGLE_FLIGHT_KEY_PREFIX}:{digest}"
+
+
+def _encode(result: Any) -> bytes:
+    return zlib.compress(json.dumps(result).encode())
+
+
+def _decode(raw: bytes) -> Any:
+    return json.loads(zlib.decompress(raw))
+
+
+def _release(lock_key: str, token: str):
+    try:
+        if redis_conn.get(lock_key) == token.encode():
+            redis_conn.delete(lock_key)
+    except RedisError as e:
+        logger.debug(f"[SINGLE FLIGHT] Could not release {lock_key} ({e}), it expires on its own")
+
+
+def single_flight(key: str, compute: Callable[[], T], label: str = "request", shareable: Optional[Callable[[T], bool]] = None) -> T:
+    """
+    Run `compute` once across workers for the same key and share its result.
+
+    The first worker takes a Redis lock and computes; workers asking for the same key meanwhile
+    wait for the stored result instead of issuing the same Graph calls. Results are kept for
+    SINGLE_FLIGHT_RESULT_TTL seconds. If the leader fails (or its result is not shareable),
+    waiting workers compute on their own. Without Redis every worker computes on its own.
+
+    Args:
+        key: Key from request_key()
+        compute: Performs the request; its result must be JSON-serializable
+        label: Description for logs
+        shareable: Returns False for results that must not be reused (e.g. partial failures)
+
+    Returns:
+        The result of `compute`, possibly computed by another worker
+    """
+    result_key = f"{key}:result"
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    try:
+        raw = redis_conn.get(result_key)
+        if raw is not None:
+            logger.info(f"[SINGLE FLIGHT] Reusing {label} fetched by another rule")
+            return _decode(raw)
+        is_leader = redis_conn.set(lock_key, token, nx=True, ex=SINGLE_FLIGHT_LOCK_TIMEOUT)
+    except RedisError as e:
+        logger.debug(f"[SINGLE FLIGHT] Redis unavailable ({e}), fetching {label} directly")
+        return compute()
+
+    if is_leader:
+        try:
+            result = compute()
+            if shareable is None or shareable(result):
+                try:
+                    redis_conn.set(result_key, _encode(result), ex=SINGLE_FLIGHT_RESULT_TTL)
+                except RedisError as e:
+                    logger.debug(f"[SINGLE FLIGHT] Could not store {label} result ({e})")
+            return result
+        finally:
+            _release(lock_key, token)
+
+    logger.info(f"[SINGLE FLIGHT] Another rule is fetching the same {label}, waiting for its result")
+    start_time = time.time()
+    while time.time() - start_time < SINGLE_FLIGHT_LOCK_TIMEOUT:
+        time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        try:
+            raw = redis_conn.get(result_key)
+            if raw is None and not redis_conn.exists(lock_key):
+                # The leader finished: either its result landed just now, or it failed
+                raw = redis_conn.get(result_key)
+                if raw is None:
+                    break
+        except RedisError as e:
+            logger.debug(f"[SINGLE FLIGHT] Redis unavailable while waiting ({e})")
+            break
+        if raw is not None:
+            logger.info(f"[SINGLE FLIGHT] Reusing {label} after waiting {time.time() - start_time:.2f}s")
+            return _decode(raw)
+
+    logger.info(f"[SINGLE FLIGHT] No shared result for {label}, fetching it directly")
+    return compute()
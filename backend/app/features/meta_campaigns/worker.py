@@ -1,7 +1,10 @@
-from app.features.meta_campaigns import service
+from app.features.meta_campaigns import models, service, insights_warehouse
+from app.features.meta_campaigns.async_insights_report import ASYNC_POLL_TIMEOUT
+from app.features.meta_campaigns.graph_retry import MAX_THROTTLE_WAIT
 from app.core.db import SessionLocal
-from app.jobs.queues import get_queue
+from app.jobs.queues import get_queue, redis_conn
 from datetime import datetime
+from redis.exceptions import RedisError
 from croniter import croniter
 import logging
 import json
@@ -19,11 +22,152 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Rules due on one ad account are collected here until the account's batch job runs (see run_account_rule_batch)
+RULE_BATCH_KEY_PREFIX = "meta:rule_batch"
+# Pending batch keys expire if no worker ever picks the batch up
+RULE_BATCH_TTL_SECONDS = 3600
+# Marker that a batch job is queued for the account. Kept short: if the job is lost, the account's
+# due rules wait for the next tick's job instead of being skipped for RULE_BATCH_TTL_SECONDS
+RULE_BATCH_SCHEDULED_TTL_SECONDS = 300
+# Batch job timeout: one rule may wait out a throttle and an async report run, and every rule that
+# can join the batch gets what a rule job of its own gets (RQ's default timeout)
+RULE_BATCH_BASE_TIMEOUT = int(MAX_THROTTLE_WAIT + ASYNC_POLL_TIMEOUT)
+RULE_BATCH_TIMEOUT_PER_RULE = 180
+
+
+def _record_rule_run(rule: models.CampaignRule):
+    """Set a rule's last_run_at to now and calculate next_run_at from its schedule (caller commits)"""
+    rule_id = rule.id
+    # Update last_run_at and calculate next_run_at
+    now = datetime.now()
+    rule.last_run_at = now
+
+    # Calculate next run time from cron expression or custom daily schedule
+    if rule.schedule_cron:
+        try:
+            is_custom_daily = False
+            schedule_cron_str = rule.schedule_cron
+            timezone = "UTC"
+            cron_expr = None
+
+            # Check if it's a JSON-wrapped schedule (all schedule types now support timezone)
+            try:
+                schedule_data = json.loads(rule.schedule_cron)
+
+                # Handle custom daily schedule
+                if schedule_data.get("type") == "custom_daily" and schedule_data.get("schedule"):
+                    is_custom_daily = True
+                    # Calculate next run time for custom daily schedule
+                    schedule = schedule_data["schedule"]
+                    timezone = schedule_data.get("timezone", "UTC")
+
+                    # Get timezone object
+                    try:
+                        tz = ZoneInfo(timezone)
+                    except Exception as e:
+                        logger.warning(f"Invalid timezone {timezone}, using UTC: {str(e)}")
+                        tz = ZoneInfo("UTC")
+
+                    # Get current time in the schedule's timezone
+                    now_tz = datetime.now(tz)
+                    next_runs = []
+
+                    for day_str, time_str in schedule.items():
+                        try:
+                            day = int(day_str)
+                            hour, minute = map(int, time_str.split(":"))
+
+                            # Create a cron expression for this specific day and time
+                            # Cron format: minute hour * * dayOfWeek
+                            cron_expr = f"{minute} {hour} * * {day}"
+
+                            # Calculate next run time in the schedule's timezone
+                            # croniter works with naive datetime, so we convert to naive first
+                            now_naive = now_tz.replace(tzinfo=None)
+                            cron = croniter(cron_expr, now_naive)
+                            next_run_naive = cron.get_next(datetime)
+
+                            # Localize to the schedule's timezone, then convert to UTC for storage
+                            # pytz uses localize(), zoneinfo uses replace()
+                            if hasattr(tz, 'localize'):
+                                # pytz timezone
+                                next_run_tz = tz.localize(next_run_naive)
+                            else:
+                                # zoneinfo timezone
+                                next_run_tz = next_run_naive.replace(tzinfo=tz)
+
+                            # Convert to UTC for storage
+                            utc_tz = ZoneInfo("UTC")
+                            next_run_utc = next_run_tz.astimezone(utc_tz)
+
+                            next_runs.append(next_run_utc)
+                        except (ValueError, KeyError) as e:
+                            logger.warning(f"Error parsing day/time for next run calculation: day={day_str}, time={time_str}, error={str(e)}")
+                            continue
+
+                    if next_runs:
+                        rule.next_run_at = min(next_runs)
+                        logger.info(f"Rule {rule_id} next run scheduled for {rule.next_run_at} UTC (custom daily, timezone: {timezone})")
+                    else:
+                        logger.warning(f"Could not calculate next run time for custom daily rule {rule_id}")
+                else:
+                    # Handle other schedule types wrapped in JSON (with timezone support)
+                    if schedule_data.get("type") and schedule_data.get("cron"):
+                        cron_expr = schedule_data.get("cron")
+                        timezone = schedule_data.get("timezone", "UTC")
+            except (json.JSONDecodeError, KeyError, TypeError):
+                # Not JSON, use as-is (legacy format, defaults to UTC)
+                cron_expr = rule.schedule_cron
+
+            # If not custom_daily, calculate next run time for regular cron expression
+            # Always update next_run_at after execution to keep it accurate
+            if not is_custom_daily:
+                # Use extracted cron expression or original if not JSON
+                if cron_expr is None:
+                    cron_expr = rule.schedule_cron
+
+                # Get timezone object
+                try:
+                    tz = ZoneInfo(timezone)
+                except Exception as e:
+                    logger.warning(f"Invalid timezone {timezone}, using UTC: {str(e)}")
+                    tz = ZoneInfo("UTC")
+                    timezone = "UTC"
+
+                # Parse cron expression in the specified timezone
+                # Get current time in the schedule's timezone
+                now_tz = datetime.now(tz)
+                now_naive = now_tz.replace(tzinfo=None)
+
+                # croniter works with naive datetime
+                cron = croniter(cron_expr, now_naive)
+                next_run_naive = cron.get_next(datetime)
+
+                # Localize to the schedule's timezone, then convert to UTC for storage
+                if hasattr(tz, 'localize'):
+                    # pytz timezone
+                    next_run_tz = tz.localize(next_run_naive)
+                else:
+                    # zoneinfo timezone
+                    next_run_tz = next_run_naive.replace(tzinfo=tz)
+
+                # Convert to UTC for storage
+                utc_tz = ZoneInfo("UTC")
+                next_run_utc = next_run_tz.astimezone(utc_tz)
+
+                rule.next_run_at = next_run_utc
+                logger.info(f"Rule {rule_id} next run scheduled for {next_run_utc} UTC (timezone: {timezone})")
+        except Exception as e:
+            logger.error(f"Error calculating next run time for rule {rule_id}: {str(e)}")
+
 
 def check_campaign_rule(rule_id: int):
     """
     Worker function to check and execute a campaign rule.
     This will be called by RQ scheduler.
+
+    The rule joins its ad account's pending batch (see run_account_rule_batch), so rules due in the
+    same tick share one data fetch. If Redis cannot be used for the batch, the rule runs on its own.
     """
     db = SessionLocal()
     try:
@@ -32,6 +176,14 @@ def check_campaign_rule(rule_id: int):
             logger.info(f"Rule {rule_id} is disabled or not found")
             return
 
+        account_rule_count = db.query(models.CampaignRule).filter(
+            models.CampaignRule.ad_account_id == rule.ad_account_id,
+            models.CampaignRule.enabled == True
+        ).count()
+        if _add_to_account_batch(rule, account_rule_count):
+            logger.info(f"Rule {rule_id} queued for the batch of ad account {rule.ad_account_id}")
+            return
+
         logger.info(f"Checking rule {rule_id}: {rule.name}")
 
         # Use the test_rule function which has the full implementation
@@ -43,139 +195,144 @@ def check_campaign_rule(rule_id: int):
 
         logger.info(f"Rule {rule_id} check completed: {result.get('decision', 'unknown')}")
 
-        # Update last_run_at and calculate next_run_at
-        now = datetime.now()
-        rule.last_run_at = now
+        _record_rule_run(rule)
+        db.commit()
 
-        # Calculate next run time from cron expression or custom daily schedule
-        if rule.schedule_cron:
-            try:
-                is_custom_daily = False
-                schedule_cron_str = rule.schedule_cron
-                timezone = "UTC"
-                cron_expr = None
+    except Exception as e:
+        logger.error(f"Error checking rule {rule_id}: {str(e)}", exc_info=True)
+        service.create_rule_log(
+            db,
+            rule_id,
+            "error",
+            f"Error: {str(e)}",
+            {"error": str(e)}
+        )
+    finally:
+        db.close()
 
-                # Check if it's a JSON-wrapped schedule (all schedule types now support timezone)
-                try:
-                    schedule_data = json.loads(rule.schedule_cron)
 
-                    # Handle custom daily schedule
-                    if schedule_data.get("type") == "custom_daily" and schedule_data.get("schedule"):
-                        is_custom_daily = True
-                        # Calculate next run time for custom daily schedule
-                        schedule = schedule_data["schedule"]
-                        timezone = schedule_data.get("timezone", "UTC")
+def _batch_key(ad_account_id: int) -> str:
+    return f"{RULE_BATCH_KEY_PREFIX}:{ad_account_id}"
 
-                        # Get timezone object
-                        try:
-                            tz = ZoneInfo(timezone)
-                        except Exception as e:
-                            logger.warning(f"Invalid timezone {timezone}, using UTC: {str(e)}")
-                            tz = ZoneInfo("UTC")
-
-                        # Get current time in the schedule's timezone
-                        now_tz = datetime.now(tz)
-                        next_runs = []
-
-                        for day_str, time_str in schedule.items():
-                            try:
-                                day = int(day_str)
-                                hour, minute = map(int, time_str.split(":"))
-
-                                # Create a cron expression for this specific day and time
-                                # Cron format: minute hour * * dayOfWeek
-                                cron_expr = f"{minute} {hour} * * {day}"
-
-                                # Calculate next run time in the schedule's timezone
-                                # croniter works with naive datetime, so we convert to naive first
-                                now_naive = now_tz.replace(tzinfo=None)
-                                cron = croniter(cron_expr, now_naive)
-                                next_run_naive = cron.get_next(datetime)
-
-                                # Localize to the schedule's timezone, then convert to UTC for storage
-                                # pytz uses localize(), zoneinfo uses replace()
-                                if hasattr(tz, 'localize'):
-                                    # pytz timezone
-                                    next_run_tz = tz.localize(next_run_naive)
-                                else:
-                                    # zoneinfo timezone
-                                    next_run_tz = next_run_naive.replace(tzinfo=tz)
-
-                                # Convert to UTC for storage
-                                utc_tz = ZoneInfo("UTC")
-                                next_run_utc = next_run_tz.astimezone(utc_tz)
-
-                                next_runs.append(next_run_utc)
-                            except (ValueError, KeyError) as e:
-                                logger.warning(f"Error parsing day/time for next run calculation: day={day_str}, time={time_str}, error={str(e)}")
-                                continue
-
-                        if next_runs:
-                            rule.next_run_at = min(next_runs)
-                            logger.info(f"Rule {rule_id} next run scheduled for {rule.next_run_at} UTC (custom daily, timezone: {timezone})")
-                        else:
-                            logger.warning(f"Could not calculate next run time for custom daily rule {rule_id}")
-                    else:
-                        # Handle other schedule types wrapped in JSON (with timezone support)
-                        if schedule_data.get("type") and schedule_data.get("cron"):
-                            cron_expr = schedule_data.get("cron")
-                            timezone = schedule_data.get("timezone", "UTC")
-                except (json.JSONDecodeError, KeyError, TypeError):
-                    # Not JSON, use as-is (legacy format, defaults to UTC)
-                    cron_expr = rule.schedule_cron
 
-                # If not custom_daily, calculate next run time for regular cron expression
-                # Always update next_run_at after execution to keep it accurate
-                if not is_custom_daily:
-                    # Use extracted cron expression or original if not JSON
-                    if cron_expr is None:
-                        cron_expr = rule.schedule_cron
+def _add_to_account_batch(rule: models.CampaignRule, account_rule_count: int = 1) -> bool:
+    """
+    Add a due rule to its ad account's pending batch; the first rule of a tick enqueues the batch job.
 
-                    # Get timezone object
-                    try:
-                        tz = ZoneInfo(timezone)
-                    except Exception as e:
-                        logger.warning(f"Invalid timezone {timezone}, using UTC: {str(e)}")
-                        tz = ZoneInfo("UTC")
-                        timezone = "UTC"
+    rq-scheduler moves all rules due in a tick to the queue at once, so by the time the batch job
+    (queued behind them) starts, the other rules of the tick have joined the batch. Rules arriving
+    after it started form the next batch.
 
-                    # Parse cron expression in the specified timezone
-                    # Get current time in the schedule's timezone
-                    now_tz = datetime.now(tz)
-                    now_naive = now_tz.replace(tzinfo=None)
+    Args:
+        rule: The due rule
+        account_rule_count: Enabled rules of the ad account, the most that can join the batch (sizes the job timeout)
 
-                    # croniter works with naive datetime
-                    cron = croniter(cron_expr, now_naive)
-                    next_run_naive = cron.get_next(datetime)
+    Returns:
+        False if Redis is unavailable or the batch job could not be enqueued (the caller runs the rule on its own)
+    """
+    key = _batch_key(rule.ad_account_id)
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.sadd(f"{key}:rules", rule.id)
+        pipe.expire(f"{key}:rules", RULE_BATCH_TTL_SECONDS)
+        pipe.set(f"{key}:scheduled", 1, nx=True, ex=RULE_BATCH_SCHEDULED_TTL_SECONDS)
+        _added, _expire, first_in_tick = pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not queue rule {rule.id} for an account batch ({str(e)}), running it on its own")
+        return False
+
+    if first_in_tick:
+        try:
+            get_queue().enqueue(
+                run_account_rule_batch,
+                rule.ad_account_id,
+                job_timeout=RULE_BATCH_BASE_TIMEOUT + RULE_BATCH_TIMEOUT_PER_RULE * max(1, account_rule_count),
+            )
+        except Exception as e:
+            # Without the marker the next due rule enqueues the batch; this one runs on its own
+            logger.warning(f"Could not enqueue the batch of ad account {rule.ad_account_id} ({str(e)}), running rule {rule.id} on its own")
+            try:
+                pipe = redis_conn.pipeline()
+                pipe.srem(f"{key}:rules", rule.id)
+                pipe.delete(f"{key}:scheduled")
+                pipe.execute()
+            except RedisError:
+                pass
+            return False
+    return True
 
-                    # Localize to the schedule's timezone, then convert to UTC for storage
-                    if hasattr(tz, 'localize'):
-                        # pytz timezone
-                        next_run_tz = tz.localize(next_run_naive)
-                    else:
-                        # zoneinfo timezone
-                        next_run_tz = next_run_naive.replace(tzinfo=tz)
 
-                    # Convert to UTC for storage
-                    utc_tz = ZoneInfo("UTC")
-                    next_run_utc = next_run_tz.astimezone(utc_tz)
+def run_account_rule_batch(ad_account_id: int):
+    """
+    Worker function that runs every rule queued for an ad account in the same tick with one data fetch
+    (see service.run_rules_batch). Each rule still gets its own log and actions.
+    """
+    key = _batch_key(ad_account_id)
+    pipe = redis_conn.pipeline()
+    pipe.smembers(f"{key}:rules")
+    pipe.delete(f"{key}:rules", f"{key}:scheduled")
+    members, _deleted = pipe.execute()
+    rule_ids = sorted(int(member) for member in members)
+    if not rule_ids:
+        return
 
-                    rule.next_run_at = next_run_utc
-                    logger.info(f"Rule {rule_id} next run scheduled for {next_run_utc} UTC (timezone: {timezone})")
-            except Exception as e:
-                logger.error(f"Error calculating next run time for rule {rule_id}: {str(e)}")
+    db = SessionLocal()
 
-        db.commit()
+    def record_result(rule_id: int, result):
+        # Recorded as each rule finishes, so a batch cut short keeps the runs already done
+        if isinstance(result, Exception):
+            logger.error(f"Rule {rule_id} check failed: {str(result)}")
+        else:
+            logger.info(f"Rule {rule_id} check completed: {result.get('decision', 'unknown')}")
+        rule = service.get_rule(db, rule_id)
+        if rule:
+            _record_rule_run(rule)
+            db.commit()
 
+    try:
+        logger.info(f"Checking {len(rule_ids)} rule(s) of ad account {ad_account_id} together: {rule_ids}")
+        service.run_rules_batch(db, rule_ids, on_result=record_result)
     except Exception as e:
-        logger.error(f"Error checking rule {rule_id}: {str(e)}", exc_info=True)
-        service.create_rule_log(
-            db,
-            rule_id,
-            "error",
-            f"Error: {str(e)}",
-            {"error": str(e)}
-        )
+        logger.error(f"Error checking rules {rule_ids} of ad account {ad_account_id}: {str(e)}", exc_info=True)
+    finally:
+        db.close()
+
+
+def backfill_account_insights(ad_account_id: int):
+    """
+    Worker function to load missing days into the daily insights warehouse for an ad account.
+    Scheduled per ad account by scheduler_service.schedule_insights_backfill.
+
+    Loads the levels of the account's enabled rules, once per Meta account/token the rules use.
+    """
+    db = SessionLocal()
+    try:
+        ad_account = db.query(models.AdAccount).filter(models.AdAccount.id == ad_account_id).first()
+        if not ad_account:
+            logger.info(f"Ad account {ad_account_id} not found, skipping insights backfill")
+            return
+
+        rules = db.query(models.CampaignRule).filter(
+            models.CampaignRule.ad_account_id == ad_account_id,
+            models.CampaignRule.enabled == True
+        ).all()
+        levels_by_account = {}
+        for rule in rules:
+            account_id = rule.meta_account_id or ad_account.meta_account_id
+            access_token = rule.meta_access_token or ad_account.meta_access_token
+            if not account_id or not access_token:
+                continue
+            rule_level = (rule.conditions or {}).get("rule_level", "ad")
+            levels_by_account.setdefault((account_id, access_token), set()).add(rule_level)
+
+        for (account_id, access_token), levels in levels_by_account.items():
+            for rule_level in sorted(levels):
+                days = insights_warehouse.backfill_daily_insights(db, account_id, access_token, rule_level)
+                logger.info(f"Insights backfill for account {account_id} ({rule_level}): {days} day(s) loaded")
+
+    except Exception as e:
+        logger.error(f"Error backfilling insights for ad account {ad_account_id}: {str(e)}", exc_info=True)
+        db.rollback()
     finally:
         db.close()
 
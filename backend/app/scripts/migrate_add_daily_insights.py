@@ -0,0 +1,34 @@
+"""
+Script to create the daily insights warehouse tables (daily_insights, partitioned by month, and daily_insight_loads).
+"""
+import sys
+from datetime import datetime, timedelta
+from app.core.db import engine, SessionLocal
+from app.features.meta_campaigns.models import DailyInsight, DailyInsightLoad
+from app.features.meta_campaigns.insights_warehouse import WAREHOUSE_BACKFILL_DAYS, ensure_partitions
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_add_daily_insights():
+    """Create the warehouse tables and the partitions for the backfill range"""
+    logger.info("Creating daily insights warehouse tables...")
+    DailyInsight.__table__.create(bind=engine, checkfirst=True)
+    DailyInsightLoad.__table__.create(bind=engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        today = datetime.now().date()
+        ensure_partitions(db, today - timedelta(days=WAREHOUSE_BACKFILL_DAYS), today)
+        db.commit()
+        logger.info("Migration completed successfully!")
+    except Exception as e:
+        logger.error(f"Error during migration: {str(e)}", exc_info=True)
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_add_daily_insights()
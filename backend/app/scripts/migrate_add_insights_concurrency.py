@@ -0,0 +1,43 @@
+"""
+Script to add insights_concurrency column to ad_accounts table.
+"""
+import sys
+from sqlalchemy import text
+from app.core.db import engine
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_add_insights_concurrency():
+    """Add insights_concurrency column to ad_accounts table"""
+    logger.info("Adding insights_concurrency column to ad_accounts table...")
+
+    with engine.connect() as conn:
+        try:
+            # Check if column already exists
+            result = conn.execute(text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_name = 'ad_accounts'
+                AND column_name = 'insights_concurrency'
+            """))
+
+            row = result.fetchone()
+            if row:
+                logger.info("Column insights_concurrency already exists. No migration needed.")
+                return
+
+            # Add the column
+            logger.info("Adding insights_concurrency column...")
+            conn.execute(text("ALTER TABLE ad_accounts ADD COLUMN insights_concurrency INTEGER"))
+            conn.commit()
+            logger.info("Migration completed successfully!")
+
+        except Exception as e:
+            logger.error(f"Error during migration: {str(e)}", exc_info=True)
+            conn.rollback()
+            raise
+
+if __name__ == "__main__":
+    migrate_add_insights_concurrency()
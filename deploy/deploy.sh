@@ -24,6 +24,8 @@ sleep 10
 
 # Run database migrations if needed
 # docker compose -f docker-compose.prod.yml exec backend python -m app.scripts.migrate_schedule_cron_nullable || true
+docker compose -f docker-compose.prod.yml exec backend python -m app.scripts.migrate_add_insights_concurrency
+docker compose -f docker-compose.prod.yml exec backend python -m app.scripts.migrate_add_daily_insights
 
 echo "Deployment complete!"
 echo "Services restarted. Check status with: docker compose -f docker-compose.prod.yml ps"
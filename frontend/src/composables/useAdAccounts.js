@@ -30,6 +30,7 @@ export function useAdAccounts() {
         meta_account_id: "",
         meta_access_token: "",
         slack_webhook_url: "",
+        insights_concurrency: null,
         is_default: false,
     });
 
@@ -72,6 +73,7 @@ export function useAdAccounts() {
             meta_account_id: "",
             meta_access_token: "",
             slack_webhook_url: "",
+            insights_concurrency: null,
             is_default: false,
         };
         showAdAccountDialog.value = true;
@@ -85,6 +87,7 @@ export function useAdAccounts() {
             meta_account_id: account.meta_account_id || "",
             meta_access_token: account.meta_access_token || "",
             slack_webhook_url: account.slack_webhook_url || "",
+            insights_concurrency: account.insights_concurrency ?? null,
             is_default: account.is_default || false,
         };
         showAdAccountDialog.value = true;
@@ -99,6 +102,7 @@ export function useAdAccounts() {
             meta_account_id: "",
             meta_access_token: "",
             slack_webhook_url: "",
+            insights_concurrency: null,
             is_default: false,
         };
     }